@@ -1,29 +1,53 @@
+import time
+_script_start = time.perf_counter()  # 每次 rerun 的起点 (首次运行还包含模块导入耗时)
 import streamlit as st
-import random
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as fm
+import numpy as np
 import os
 import platform
-from openai import OpenAI
+import sys
+from season_config import SEASON_CONFIG
+from simulator import compare_scenarios, iter_simulation, make_process_pool, prepare_params, run_simulation, summarize_result
+from background import SimulationJob
+from result_cache import ResultCache, make_cache_key
+from lookup_table import ScenarioTable, config_fingerprint, sweep_levels
+from instrumentation import RunTimer, StreamStats, log_event
+from policy import DEFAULT_WAIT_RISK, MAX_HORIZON, describe_action, recommend_action
+from lobby import NUM_PLAYERS, OPPONENT_STRATEGIES, compare_contested
+from multi_target import run_joint
+from coach import DEFAULT_BASE_URL, CoachBackend, make_coach_cache
+_import_ms = (time.perf_counter() - _script_start) * 1000
+
 
 # --- 0. 基础环境配置 & 字体修复 ---
-# 尝试修复中文乱码 (兼容云端/本地)
-system_name = platform.system()
 current_dir = os.path.dirname(os.path.abspath(__file__))
-font_path = os.path.join(current_dir, 'SimHei.ttf')
-
-if os.path.exists(font_path):
-    fm.fontManager.addfont(font_path)
-    plt.rcParams['font.family'] = fm.FontProperties(fname=font_path).get_name()
-else:
-    if system_name == 'Windows':
-        plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei']
-    elif system_name == 'Darwin':
-        plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'Heiti TC']
+
+# matplotlib 第一次画图时才导入，字体注册整个进程只做一次 (不再每次 rerun 都跑)
+@st.cache_resource
+def get_pyplot():
+    import matplotlib.pyplot as plt
+    import matplotlib.font_manager as fm
+
+    # 尝试修复中文乱码 (兼容云端/本地)
+    system_name = platform.system()
+    font_path = os.path.join(current_dir, 'SimHei.ttf')
+
+    if os.path.exists(font_path):
+        fm.fontManager.addfont(font_path)
+        plt.rcParams['font.family'] = fm.FontProperties(fname=font_path).get_name()
     else:
-        plt.rcParams['font.sans-serif'] = ['WenQuanYi Zen Hei']
-plt.rcParams['axes.unicode_minus'] = False
+        if system_name == 'Windows':
+            plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei']
+        elif system_name == 'Darwin':
+            plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'Heiti TC']
+        else:
+            plt.rcParams['font.sans-serif'] = ['WenQuanYi Zen Hei']
+    plt.rcParams['axes.unicode_minus'] = False
+    return plt
+
+# 进程级统计：区分冷启动 (进程内第一次运行) 和普通 rerun
+@st.cache_resource
+def get_process_stats():
+    return {"started": time.time(), "reruns": 0}
 
 st.set_page_config(page_title="金铲铲/云顶 D牌概率计算器 S16/S10", page_icon="🎲", layout="wide")
 
@@ -37,176 +61,30 @@ def open_manual():
 def close_manual():
     st.session_state.show_manual = False
 
-# --- 1. 赛季核心数据配置  ---
-SEASON_CONFIG = {
-    "S16 (英雄联盟传奇)": {
-        "POOL_SIZES": {1: 30, 2: 25, 3: 18, 4: 10, 5: 9},
-        "DISTINCT_CHAMPS": {1: 14, 2: 19, 3: 18, 4: 25, 5: 24}, # 包含未解锁的总数
-        "DEFAULT_LOCKED": {1: 0, 2: 6, 3: 5, 4: 13, 5: 16},    # 默认锁住的数量(来自CSV)
-        "DROP_RATES": {
-            1: {1: 1.00, 2: 0.00, 3: 0.00, 4: 0.00, 5: 0.00},
-            2: {1: 1.00, 2: 0.00, 3: 0.00, 4: 0.00, 5: 0.00},
-            3: {1: 0.75, 2: 0.25, 3: 0.00, 4: 0.00, 5: 0.00},
-            4: {1: 0.55, 2: 0.30, 3: 0.15, 4: 0.00, 5: 0.00},
-            5: {1: 0.45, 2: 0.33, 3: 0.20, 4: 0.02, 5: 0.00},
-            6: {1: 0.30, 2: 0.40, 3: 0.25, 4: 0.05, 5: 0.00},
-            7: {1: 0.19, 2: 0.30, 3: 0.40, 4: 0.10, 5: 0.01},
-            8: {1: 0.15, 2: 0.20, 3: 0.32, 4: 0.30, 5: 0.03},
-            9: {1: 0.12, 2: 0.18, 3: 0.25, 4: 0.33, 5: 0.12},
-            10: {1: 0.05, 2: 0.10, 3: 0.20, 4: 0.40, 5: 0.25},
-        }
-    },
-    "S10 (强音对决)": {
-        "POOL_SIZES": {1: 30, 2: 25, 3: 18, 4: 12, 5: 10},
-        "DISTINCT_CHAMPS": {1: 13, 2: 13, 3: 13, 4: 13, 5: 11},
-        "DEFAULT_LOCKED": {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}, # S10无锁定机制
-        "DROP_RATES": {
-            1: {1: 1.00, 2: 0.00, 3: 0.00, 4: 0.00, 5: 0.00},
-            2: {1: 1.00, 2: 0.00, 3: 0.00, 4: 0.00, 5: 0.00},
-            3: {1: 0.75, 2: 0.25, 3: 0.00, 4: 0.00, 5: 0.00},
-            4: {1: 0.55, 2: 0.30, 3: 0.15, 4: 0.00, 5: 0.00},
-            5: {1: 0.45, 2: 0.33, 3: 0.20, 4: 0.02, 5: 0.00},
-            6: {1: 0.30, 2: 0.40, 3: 0.25, 4: 0.05, 5: 0.00},
-            7: {1: 0.19, 2: 0.35, 3: 0.35, 4: 0.10, 5: 0.01},
-            8: {1: 0.18, 2: 0.25, 3: 0.36, 4: 0.18, 5: 0.03},
-            9: {1: 0.10, 2: 0.20, 3: 0.25, 4: 0.35, 5: 0.10},
-            10: {1: 0.05, 2: 0.10, 3: 0.20, 4: 0.40, 5: 0.25},
-        },
-        "HEADLINER_RATES": { # S10 天选概率表
-            1: {1: 1.00, 2: 0.00, 3: 0.00, 4: 0.00, 5: 0.00},
-            2: {1: 1.00, 2: 0.00, 3: 0.00, 4: 0.00, 5: 0.00},
-            3: {1: 1.00, 2: 0.00, 3: 0.00, 4: 0.00, 5: 0.00},
-            4: {1: 0.80, 2: 0.20, 3: 0.00, 4: 0.00, 5: 0.00},
-            5: {1: 0.30, 2: 0.70, 3: 0.00, 4: 0.00, 5: 0.00},
-            6: {1: 0.00, 2: 0.75, 3: 0.25, 4: 0.00, 5: 0.00},
-            7: {1: 0.00, 2: 0.40, 3: 0.60, 4: 0.00, 5: 0.00},
-            8: {1: 0.00, 2: 0.00, 3: 0.70, 4: 0.30, 5: 0.00}, 
-            9: {1: 0.00, 2: 0.00, 3: 0.00, 4: 0.98, 5: 0.02},
-            10: {1: 0.00, 2: 0.00, 3: 0.00, 4: 0.30, 5: 0.70},
-        }
-    }
-}
+# 模拟结果缓存：整个进程共用一份，落盘到本地目录 (每组结果一个文件)
+@st.cache_resource
+def get_result_cache():
+    return ResultCache(path=os.path.join(current_dir, ".sim_cache"))
 
-# --- 2. 核心模拟逻辑 ---
-def run_simulation(season_data, level, target_cost, start_gold, target_copies, target_taken, other_taken, num_trials, locked_types_count=0, has_headliner=False):
-    
-    rates = season_data["DROP_RATES"].get(level, {})
-    if not rates:
-        return "ERROR_LEVEL"
-    prob_cost_hit = rates.get(target_cost, 0)
-
-    # 获取天选概率
-    prob_hl_cost_hit = 0
-    hl_rates_config = season_data.get("HEADLINER_RATES", {})
-    if hl_rates_config:
-        hl_rates = hl_rates_config.get(level, {})
-        prob_hl_cost_hit = hl_rates.get(target_cost, 0)
-    
-    # 获取该费用基础数据
-    one_card_total = season_data["POOL_SIZES"][target_cost]
-    total_distinct_champs = season_data["DISTINCT_CHAMPS"][target_cost]
-    
-    # S16 机制：有效卡种 = 总种类 - 锁住的种类
-    effective_distinct_champs = total_distinct_champs - locked_types_count
-    
-    if effective_distinct_champs <= 0:
-        return "ERROR_ALL_LOCKED" 
+# 预计算表：memory-map 打开，整个进程共用 (未生成时全部查询落空，退回精确计算)
+@st.cache_resource
+def get_scenario_table():
+    return ScenarioTable()
 
-    # 总卡池大小 (分母) = 单张数量 * 有效种类
-    total_pool_size = one_card_total * effective_distinct_champs
-    
-    # 初始卡池状态检验
-    start_remaining_target = one_card_total - target_taken
-    if start_remaining_target <= 0: # 修正：如果只剩0张也不能搜
-        return "ERROR_TARGET_LIMIT"
-        
-    start_current_pool = total_pool_size - target_taken - other_taken
-    if start_current_pool <= 0:
-        return "ERROR_POOL_LIMIT"
+# AI 教练：每个密钥一个客户端 (复用连接)，回答缓存所有会话共用
+@st.cache_resource
+def get_coach_cache():
+    return make_coach_cache()
 
-    results = []
-    progress_bar = st.progress(0)
-    
-    for i in range(num_trials):
-        if i % (num_trials // 10) == 0:
-            progress_bar.progress(i / num_trials)
-            
-        copies_found = 0
-        cost_spent = 0
-        current_gold = start_gold # 使用传入的初始金币
-        
-        current_remaining_target = start_remaining_target
-        current_pool = start_current_pool
-        rolls_count = 0
-        
-        # ✅ 修复：循环条件增加“买得起卡”的判断
-        # 如果还没搜到卡，至少要有2块钱D牌；如果搜到了，还要有钱买
-        while current_gold >= 2: 
-            
-            # 扣除刷新费用
-            current_gold -= 2
-            cost_spent += 2
-            rolls_count += 1
-            
-            # --- 商店生成逻辑 ---
-            headliner_slot_active = False
-            
-            # 天选逻辑判断
-            if season_data.get("HEADLINER_RATES"): 
-                if has_headliner:
-                    if rolls_count % 4 == 0:
-                        headliner_slot_active = True
-                else:
-                    headliner_slot_active = True
-            
-            normal_slots = 4 if headliner_slot_active else 5
-            
-            # 1. 遍历普通格子
-            for _ in range(normal_slots):
-                if random.random() < prob_cost_hit:
-                    # 命中费率，判断是否是目标卡
-                    real_time_prob = current_remaining_target / max(current_pool, 1)
-                    if random.random() < real_time_prob:
-                        # ✅ 修复：判断是否有钱买卡
-                        if current_gold >= target_cost:
-                            copies_found += 1
-                            current_remaining_target -= 1
-                            current_pool -= 1
-                            current_gold -= target_cost # ✅ 修复：扣除买卡金币
-                            cost_spent += target_cost
-                        else:
-                            # 没钱买卡了，这次模拟实际上已经失败（或者只能看着卡流泪）
-                            # 为了简化模型，这里视为没买到，但循环继续（因为可能还有2块钱D牌）
-                            pass
-            
-            # 2. 遍历天选格子 (S10)
-            if headliner_slot_active:
-                if random.random() < prob_hl_cost_hit:
-                    # 天选卡需卡池剩余 >= 3
-                    if current_remaining_target >= 3:
-                        real_time_prob = current_remaining_target / max(current_pool, 1)
-                        if random.random() < real_time_prob:
-                            # 天选卡价格 = 3 * 单卡价格
-                            hl_price = target_cost * 3
-                            if current_gold >= hl_price:
-                                copies_found += 3 
-                                current_remaining_target -= 3
-                                current_pool -= 3
-                                current_gold -= hl_price # ✅ 修复：扣除天选金币
-                                cost_spent += hl_price
-                            
-            if copies_found >= target_copies:
-                break
-        
-        # 记录是否成功
-        results.append({
-            "success": copies_found >= target_copies, 
-            "cost": cost_spent,
-            "final_copies": copies_found # 可选：用于分析平均搜到几张
-        })
-    
-    progress_bar.empty()
-    return pd.DataFrame(results)
+@st.cache_resource
+def get_coach(api_key, base_url):
+    return CoachBackend(api_key, base_url=base_url, cache=get_coach_cache())
+
+# 进程池：跨 rerun 常驻，避免每次点击都重新启动子进程。
+# 只建一个按 CPU 核数开的池，"并行进程数" 只限制每次同时提交的任务数，调滑块不会再多开一个池
+@st.cache_resource
+def get_process_pool():
+    return make_process_pool(os.cpu_count() or 1)
 
 # --- 3. UI 布局 ---
 st.title("🎲 金铲铲(TFT) D牌概率计算器")
@@ -236,7 +114,8 @@ if st.session_state.show_manual:
             close_manual()
             st.rerun()
 
-st.caption("*> 基于蒙特卡洛算法模拟 1000 次D牌结果，拒绝玄学，相信数学。*")
+# 算法说明随侧边栏选的引擎变化，先占位，侧边栏读完再填
+method_caption = st.empty()
 st.divider()
 
 # 侧边栏
@@ -251,6 +130,11 @@ with st.sidebar:
         st.success("已连接开发者密钥")
     else:
         api_key = st.text_input("DeepSeek API Key", type="password")
+    # 设了 TFT_COACH_BASE_URL 就改连这个地址 (如本地桩服务 coach_stub.py)，不需要真实密钥
+    coach_base_url = os.environ.get("TFT_COACH_BASE_URL") or DEFAULT_BASE_URL
+    if coach_base_url != DEFAULT_BASE_URL:
+        api_key = api_key or "local-stub"
+        st.caption(f"🧪 AI 请求发往 {coach_base_url}")
 
     st.markdown("### 模型选择")
     model_choice = st.radio(
@@ -270,8 +154,9 @@ with st.sidebar:
     current_season_data = SEASON_CONFIG[selected_season_name]
 
     has_headliner = False
-    if "S10" in selected_season_name:
-        st.info("💡 S10 机制：赛季之星 (天选)")
+    # 赛季机制按数据决定：有天选概率表就显示天选选项
+    if current_season_data.get("HEADLINER_RATES"):
+        st.info("💡 S10 机制：赛季之星 (天选)" if "S10" in selected_season_name else "💡 赛季机制：天选")
         has_headliner = st.checkbox("我场上已经有天选/赛季之星了？", value=False, help="没天选=次次刷天选；有天选=每4次刷一次天选。")
     
     col1, col2 = st.columns(2)
@@ -346,37 +231,187 @@ with st.sidebar:
     )
     st.caption("注意：这里的逻辑计算方式尚未完善，因为还涉及到其他玩家的任务卡，但总体影响不大，可以先这样用")
 
-    num_trials = st.selectbox("模拟次数", [500, 1000, 2000], index=1)
+    st.markdown("---")
+    st.header("🧭 决策规划")
+    policy_horizon = st.slider("规划回合数", 1, MAX_HORIZON, 3, help="在接下来几个回合内搜齐就算成功。决策引擎会比较现在 D 牌、先升级、先存钱吃利息，给出成功率最高的打法。")
+    policy_wait_risk = st.slider(
+        "每多等一回合的风险 (%)", 0, 50, int(DEFAULT_WAIT_RISK * 100), step=5,
+        help="等一回合的代价：掉血出局、卡被别人拿走、阵容来不及成型的概率。血量健康可以调低，快死了就调高；设为 0 时存钱吃利息几乎总是最优。"
+    ) / 100
+
+    num_trials = st.selectbox("模拟次数", [500, 1000, 2000, 10000, 100000], index=1)
+    engine_options = {
+        "NumPy 批量 (快速)": "numpy",
+        "多进程并行 (多核)": "parallel",
+        "逐次循环 (原版)": "loop",
+        "精确计算 (马尔可夫链)": "exact",
+        "预计算查表 (秒出)": "table",
+    }
+    engine_choice = st.radio(
+        "模拟引擎",
+        list(engine_options),
+        index=0,
+        help="两种模拟引擎结果同分布，可切换交叉验证；大模拟次数请用 NumPy 批量。精确计算直接给出零误差的概率，忽略模拟次数；查表模式读取离线算好的整张表，表外输入自动改用精确计算。"
+    )
+    sim_engine = engine_options[engine_choice]
+
+    adaptive_tolerance = None
+    if sim_engine == "numpy":
+        if st.checkbox("自适应模拟次数", value=False, help="分批模拟，成功率的 95% 置信区间够窄就停：明显 0% / 100% 的局面很快结束，临界局面会多跑几批。开启后忽略上面的模拟次数。"):
+            adaptive_tolerance = st.slider("允许误差 (±%)", 0.5, 5.0, 1.0, step=0.5) / 100
+
+    sim_workers, sim_seed = 1, None
+    if sim_engine == "parallel":
+        cpu_count = os.cpu_count() or 1
+        sim_workers = st.slider("并行进程数", 1, max(cpu_count, 2), cpu_count)
+        sim_seed = st.number_input("随机种子", min_value=0, value=2024, step=1, help="种子不变时结果逐位一致，与进程数无关。")
+
+    if sim_engine in ("exact", "table"):
+        method_text = "马尔可夫链精确计算成功率" if sim_engine == "exact" else "离线精确计算的整张表直接查出成功率 (表外输入改用精确计算)"
+    elif adaptive_tolerance is not None:
+        method_text = f"蒙特卡洛分批模拟D牌结果，直到成功率误差在 ±{adaptive_tolerance*100:g}% 以内"
+    else:
+        method_text = f"蒙特卡洛{'多进程' if sim_engine == 'parallel' else ''}模拟 {num_trials} 次D牌结果"
+    method_caption.caption(f"*> 基于{method_text}，拒绝玄学，相信数学。*")
+
+    show_diagnostics = st.checkbox("🔧 显示性能诊断", value=False, help="每次模拟后展示各阶段耗时 (模拟 / 图表 / AI 首字延迟与生成速度)。无论是否勾选，每次模拟都会写入 perf_log.jsonl (写满自动轮转)。")
+
+def format_prob(p):
+    # 极小概率用有效数字显示，避免一律显示成 0.0%
+    if p == 0 or p >= 0.001:
+        return f"{p*100:.1f}%"
+    return f"{p*100:.2g}%"
+
+ERROR_MAP = {
+    "ERROR_ALL_LOCKED": "所有该费用的卡都被锁住了，卡池是空的！",
+    "ERROR_TARGET_LIMIT": "卡池里这张卡已经被拿光了！",
+    "ERROR_POOL_LIMIT": "同费卡池已被抽干，请检查场外数据。",
+    "ERROR_LEVEL": "该等级无法D到此费用的卡。",
+    "ERROR_TOO_MANY_TARGETS": "同一费用的目标比卡池里的卡种还多。"
+}
+
+def follow_job(job, poll_seconds=0.2):
+    """等后台模拟结束，期间每 poll_seconds 秒刷新一次中间结果。
+
+    脚本被新的 rerun 打断 (输入变了) 时在轮询处抛出，finally 里取消任务。
+    """
+    status = st.empty()
+    try:
+        while not job.wait(poll_seconds):
+            snap = job.snapshot()
+            with status.container():
+                if snap is None:
+                    st.caption("⏳ 模拟中…")
+                    continue
+                if snap["progress"] is not None:
+                    st.progress(snap["progress"])
+                st.caption(f"⏳ 已模拟 {snap['trials']} 次 · 目前成功率 {format_prob(snap['success_rate'])} · 成功时平均花费 {snap['avg_cost']:.0f} 金币")
+    finally:
+        if not job.done():
+            job.cancel()
+    status.empty()
+    return job.result()
+
+# 上一次 rerun 留下的后台模拟已经过时 (输入变了 / 重新点了按钮)：立即取消
+stale_job = st.session_state.pop("sim_job", None)
+if stale_job is not None:
+    stale_job.cancel()
 
 # 主运行逻辑
+perf_record = None  # 点了开始模拟才有，没跑模拟 / AI 的 rerun 不写日志
 if st.button("🚀 开始模拟", type="primary", use_container_width=True):
-    
-    df = run_simulation(
-        current_season_data, level, target_cost, gold, 
-        target_copies, target_taken, other_taken, num_trials,
-        locked_types_count=locked_types,
-        has_headliner=has_headliner
+    # 各阶段计时，结束时写一行结构化日志
+    timer = RunTimer(
+        season=selected_season_name, engine=sim_engine, level=level, gold=gold, target_cost=target_cost,
+        target_copies=target_copies, num_trials=num_trials, model=selected_model if api_key else None
     )
     
+    # 预计算查表：网格内直接出结果，网格外退回精确计算
+    table_hit = None
+    if sim_engine == "table":
+        with timer.stage("table_lookup"):
+            table_hit = get_scenario_table().lookup(
+                selected_season_name, level, target_cost, gold, target_copies,
+                target_taken, other_taken, locked_types, has_headliner
+            )
+        sim_engine = "exact"
+
+    cached = None
+    if table_hit is not None:
+        sim_result = None
+        summary = {"success_rate": table_hit[0], "avg_cost": table_hit[1], "cost_values": None, "cost_probs": None}
+    else:
+        # 相同输入直接读缓存 (DataFrame 和 KPI 一起缓存)
+        result_cache = get_result_cache()
+        cache_key = make_cache_key(
+            selected_season_name, config_fingerprint({selected_season_name: current_season_data}),
+            level, target_cost, gold, target_copies,
+            target_taken, other_taken, locked_types, has_headliner,
+            num_trials if adaptive_tolerance is None else f"adaptive±{adaptive_tolerance}",
+            sim_engine if sim_engine != "parallel" else f"parallel/{sim_seed}"  # 结果与进程数无关
+        )
+        with timer.stage("cache_lookup"):
+            cached = result_cache.get(cache_key)
+        if cached is not None:
+            sim_result, summary = cached["result"], cached["summary"]
+        else:
+            # 后台分批模拟，页面边等边显示中间结果；输入一变就取消
+            with timer.stage("simulation"):
+                sim_result = iter_simulation(
+                    current_season_data, level, target_cost, gold, 
+                    target_copies, target_taken, other_taken, num_trials,
+                    locked_types_count=locked_types,
+                    has_headliner=has_headliner,
+                    engine=sim_engine,
+                    seed=sim_seed,
+                    tolerance=adaptive_tolerance,
+                    workers=sim_workers,
+                    executor=get_process_pool() if sim_engine == "parallel" else None
+                )
+                if not isinstance(sim_result, str):
+                    st.session_state.sim_job = SimulationJob(sim_result, None if adaptive_tolerance else num_trials)
+                    sim_result = follow_job(st.session_state.sim_job)
+                    st.session_state.pop("sim_job", None)
+            if not isinstance(sim_result, str) and not sim_result.empty:
+                with timer.stage("summarize"):
+                    summary = summarize_result(sim_result)
+                # 蒙特卡洛几乎没搜到 → 自动改用重要性抽样，给出有意义的小概率
+                if summary["num_trials"] and "weight" not in sim_result and summary["success_rate"] * summary["num_trials"] < 5:
+                    with timer.stage("rare_rerun"):
+                        sim_result = run_simulation(
+                            current_season_data, level, target_cost, gold,
+                            target_copies, target_taken, other_taken, num_trials,
+                            locked_types_count=locked_types,
+                            has_headliner=has_headliner,
+                            engine="rare"
+                        )
+                        summary = summarize_result(sim_result)
+                with timer.stage("cache_store"):
+                    result_cache.put(cache_key, {"result": sim_result, "summary": summary})
+    
     # 错误处理
-    if isinstance(df, str):
-        error_map = {
-            "ERROR_ALL_LOCKED": "所有该费用的卡都被锁住了，卡池是空的！",
-            "ERROR_TARGET_LIMIT": "卡池里这张卡已经被拿光了！",
-            "ERROR_POOL_LIMIT": "同费卡池已被抽干，请检查场外数据。",
-            "ERROR_LEVEL": "该等级无法D到此费用的卡。"
-        }
-        st.error(f"❌ {error_map.get(df, '未知错误')}")
+    if isinstance(sim_result, str):
+        st.error(f"❌ {ERROR_MAP.get(sim_result, '未知错误')}")
         
-    elif not df.empty:
-        success_rate = df["success"].mean()
-        avg_cost = df[df["success"]]["cost"].mean() if success_rate > 0 else 0
+    elif sim_result is None or not sim_result.empty:
+        success_rate = summary["success_rate"]
+        avg_cost = summary["avg_cost"]
         
         # 结果展示
         st.subheader("📊 模拟报告")
         kpi1, kpi2, kpi3 = st.columns(3)
-        kpi1.metric("🎯 成功概率", f"{success_rate*100:.1f}%")
+        kpi1.metric("🎯 成功概率", format_prob(success_rate))
         kpi2.metric("💰 预期花费", f"{avg_cost:.0f} 金币")
+        if table_hit is not None:
+            st.caption("📚 命中预计算表")
+        else:
+            cache_stats = result_cache.stats()
+            st.caption(f"{'⚡ 命中缓存' if cached is not None else '🧮 新计算'} · 缓存命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']} · 已缓存 {cache_stats['size']} 组")
+        if summary.get("ci"):
+            ci_low, ci_high = summary["ci"]
+            st.caption(f"📐 成功率 95% 置信区间: {format_prob(ci_low)} ~ {format_prob(ci_high)} · 实际模拟 {summary['num_trials']} 次")
+        if sim_result is not None and "weight" in sim_result:
+            st.caption(f"🔬 普通模拟几乎搜不到，已自动切换重要性抽样 (出卡概率放大 {sim_result.attrs.get('tilt')} 倍后按似然比加权还原)")
         
         # 真实概率计算 (展示给用户看)
         rates = current_season_data["DROP_RATES"][level]
@@ -393,14 +428,43 @@ if st.button("🚀 开始模拟", type="primary", use_container_width=True):
             
         kpi3.metric("🎲 真实出卡率/格", f"{real_prob*100:.2f}%", help=f"基础概率 {base_rate} x 卡池占比修正")
 
-        # 图表
-        if success_rate > 0:
-            fig, ax = plt.subplots(figsize=(10, 3))
-            ax.hist(df[df["success"]]["cost"], bins=20, color='#6c5ce7', alpha=0.8)
-            ax.set_title("资金消耗分布")
-            ax.set_xlabel("花费金币")
-            ax.axvline(gold, color='red', linestyle='--')
-            st.pyplot(fig)
+        # --- 最优策略：未来几个回合 D 牌 / 升级 / 存钱 ---
+        with timer.stage("policy"):
+            policy_rec = recommend_action(
+                selected_season_name, level, gold, target_cost, target_copies, target_taken, other_taken,
+                locked_types_count=locked_types, has_headliner=has_headliner, horizon=policy_horizon,
+                wait_risk=policy_wait_risk
+            )
+        policy_text = None
+        policy_prompt = ""
+        if not isinstance(policy_rec, str):
+            policy_text = describe_action(policy_rec, level, gold)
+            action_probs_text = "，".join(
+                f"{label} {format_prob(policy_rec['action_probs'][name]) if policy_rec['action_probs'].get(name) is not None else '不可选'}"
+                for name, label in (("roll", "现在 D 牌"), ("level", "先升级"), ("save", "先存钱"))
+            )
+            st.subheader(f"🧭 最优策略 (未来 {policy_rec['horizon']} 回合)")
+            st.success(f"**{policy_text}** · 按最优策略搜齐的概率 {format_prob(policy_rec['success_prob'])}")
+            st.caption(f"选这一步之后继续按最优策略走的成功率：{action_probs_text}。每多等一回合按 {policy_rec['wait_risk']*100:.0f}% 的风险折算；每回合收入按 5 + 利息，升级按直接买满经验计价，不计连胜连败。")
+            policy_prompt = f"""
+            【最优策略 (动态规划，未来 {policy_rec['horizon']} 回合)】
+            - 推荐动作：{policy_text}
+            - 按最优策略搜齐的概率：{format_prob(policy_rec['success_prob'])}
+            - 各动作之后继续按最优策略走的成功率：{action_probs_text}
+            - 模型假设每多等一回合有 {policy_rec['wait_risk']*100:.0f}% 的风险 (掉血 / 被抢卡)，没有考虑我的血量和对手阵容。
+            - 概率以这组数字为准；如果我的处境让等待的风险明显更高或更低，可以据此调整建议并说明理由。
+            """
+
+        # 图表 (查表只有概率和均值，没有分布)
+        if success_rate > 0 and summary["cost_values"] is not None:
+            with timer.stage("chart"):
+                plt = get_pyplot()
+                fig, ax = plt.subplots(figsize=(10, 3))
+                ax.hist(summary["cost_values"], bins=20, weights=summary["cost_probs"], color='#6c5ce7', alpha=0.8)
+                ax.set_title("资金消耗分布")
+                ax.set_xlabel("花费金币")
+                ax.axvline(gold, color='red', linestyle='--')
+                st.pyplot(fig)
 
         # --- AI 分析接入 ---
         st.subheader("💡 决策建议")
@@ -433,10 +497,10 @@ if st.button("🚀 开始模拟", type="primary", use_container_width=True):
             - **结论**：如果解锁的卡比较少时，这比正常情况下更容易搜到我要的卡。但一般情况下解锁的卡不会很多，因为需要做任务解锁，通常在不刻意做任务的情况下每一阶卡只会解锁一个左右。S16赛季去掉所有需要解锁的卡的情况下，卡的数量跟其他赛季相差不大，所以相对其他赛季来讲，S16更不容易D牌。请务必将此机制考虑在内。但在输出结论时不要过度强调这个信息。
             
             【量化回测数据】
-            - 模拟成功率：{success_rate*100:.1f}% (指在花光钱之前搜到的概率)
+            - 模拟成功率：{format_prob(success_rate)} (指在花光钱之前搜到的概率)
             - 真实单格概率：{real_prob*100:.2f}% (基础D牌概率: {current_level_probs[target_cost]}) 
             - 预期花费：{avg_cost:.0f} 金币
-    
+            {policy_prompt}
             通常情况下4级或5级D一阶卡，赌一阶卡；6级D二阶卡；7级D三阶卡；8级D四阶卡；9级或10级D五阶卡。可以根据我给出的信息推测我是玩的几阶阵容，然后给出处境和操作建议。
             如：我给出6级，存款50，搜8费卡，缺9张，模拟成功率为0的情况下，应该给出两种结论：
             1. 6级D9张8费是傻逼操作
@@ -449,10 +513,11 @@ if st.button("🚀 开始模拟", type="primary", use_container_width=True):
             回答尽量保持简洁。
             """
         else:
-            # --- S10 Prompt  ---
+            # --- S10 Prompt (其他赛季共用，天选一行按赛季数据决定) ---
             headliner_status = "已有天选" if has_headliner else "暂无天选"
+            headliner_line = f"- **核心机制**：当前场上天选状态：{headliner_status}。(S10天选机制：买入即2星,如果还没天选，每次D牌必出天选位；如果已有天选，每D 4次才出一次天选位。买入即3张)" if current_season_data.get("HEADLINER_RATES") else ""
             prompt = f"""
-            你现在是云顶之弈(TFT) **S10 (强音对决)** 的战术分析师。
+            你现在是云顶之弈(TFT) **{selected_season_name}** 的战术分析师。
             
             【对局数据】
             - 状态：{level} 级，存款 {gold} 金币。
@@ -460,13 +525,13 @@ if st.button("🚀 开始模拟", type="primary", use_container_width=True):
             - 竞争环境：卡池上限 {card_pool_size} 张。
               - 致命伤：外面已经有 {target_taken} 张我的卡被拿走。
               - 干扰项：外面拿走了 {other_taken} 张其他的 {target_cost} 费卡 (帮我清了卡池)。
-            - **核心机制**：当前场上天选状态：{headliner_status}。(S10天选机制：买入即2星,如果还没天选，每次D牌必出天选位；如果已有天选，每D 4次才出一次天选位。买入即3张)
+            {headliner_line}
 
             【量化结果】
-            - 成功率: {success_rate*100:.1f}% 
+            - 成功率: {format_prob(success_rate)} 
             - 真实单格概率: {real_prob*100:.2f}% (基础概率 {current_level_probs[target_cost]})
             - 预期花费: {avg_cost:.0f} 金币
-
+            {policy_prompt}
             通常情况下4级或5级D一阶卡，赌一阶卡；6级D二阶卡；7级D三阶卡；8级D四阶卡；9级或10级D五阶卡。可以根据我给出的信息推测我是玩的几阶阵容，然后给出处境和操作建议。
             如：我给出6级，存款50，搜8费卡，缺9张，模拟成功率为0的情况下，应该给出两种结论：
             1. 6级D9张8费是傻逼操作
@@ -480,7 +545,8 @@ if st.button("🚀 开始模拟", type="primary", use_container_width=True):
         
         if api_key:
             try:
-                client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com")
+                # 相同提示词 + 模型一小时内直接重放缓存的回答
+                coach = get_coach(api_key, coach_base_url)
                 
                 with st.chat_message("assistant", avatar="🧠"):
                     # 动态调整状态栏标题
@@ -498,21 +564,16 @@ if st.button("🚀 开始模拟", type="primary", use_container_width=True):
                     
                     answer_placeholder = st.empty()
                     
-                    # 3. 发起请求 (使用 selected_model)
-                    stream = client.chat.completions.create(
-                        model=selected_model,  # <--- 这里使用了侧边栏选中的变量
-                        messages=[
-                            {"role": "system", "content": "你是一个精通概率和云顶S16机制的职业教练。"},
-                            {"role": "user", "content": prompt}
-                        ],
-                        stream=True
-                    )
+                    # 3. 发起请求 (使用 selected_model)；命中缓存时按同样的分片重放
+                    stream, from_cache = coach.stream(selected_model, prompt)
                     
                     # 4. 处理流式数据
                     reasoning_content = ""
                     final_content = ""
+                    stream_stats = StreamStats()
                     
                     for chunk in stream:
+                        stream_stats.on_chunk(chunk)
                         if chunk.choices:
                             delta = chunk.choices[0].delta
                             
@@ -529,22 +590,222 @@ if st.button("🚀 开始模拟", type="primary", use_container_width=True):
                                 answer_placeholder.markdown(final_content)
                     
                     # 5. 完成
-                    status_container.update(label="分析完毕", state="complete", expanded=False)
+                    stream_stats.finish()
+                    timer.record(**stream_stats.metrics(), llm_cached=from_cache)
+                    status_container.update(label="分析完毕 (缓存的回答)" if from_cache else "分析完毕", state="complete", expanded=False)
         
             except Exception as e:
+                timer.record(llm_error=f"{type(e).__name__}: {e}")
                 st.error(f"AI 连接失败: {e}")
         else:
-             st.info(f"**分析结论：** 当前成功率为 {success_rate*100:.1f}%。{'建议冲刺！' if success_rate > 0.6 else '风险极高，建议观望。'}")
-
-
-
-
-
-
-
-
-
-
-
+             st.info(f"**分析结论：** 当前成功率为 {format_prob(success_rate)}。{'建议冲刺！' if success_rate > 0.6 else '风险极高，建议观望。'}" + (f" 决策引擎建议：{policy_text}。" if policy_text else ""))
 
+    # 性能诊断：日志总是写，面板按需展示
+    if isinstance(sim_result, str):
+        timer.record(result=sim_result)
+    else:
+        timer.record(result="table_hit" if table_hit is not None else "cache_hit" if cached is not None else "computed")
+    perf_record = timer.log()
+    if show_diagnostics:
+        with st.expander("🔧 性能诊断", expanded=True):
+            st.caption(f"本次运行 {perf_record['run_id']} · 总耗时 {perf_record['total_ms']:.0f} ms")
+            # pandas 导入要 0.4 秒左右，只在真的要显示表格时才导入
+            import pandas as pd
+            st.dataframe(
+                pd.DataFrame({"阶段": list(perf_record["stages_ms"]), "耗时 (ms)": list(perf_record["stages_ms"].values())}),
+                hide_index=True, use_container_width=True
+            )
+            if perf_record.get("llm_total_ms") is not None:
+                d1, d2, d3, d4 = st.columns(4)
+                d1.metric("AI 首字延迟", f"{perf_record['llm_ttft_ms']:.0f} ms" if perf_record["llm_ttft_ms"] is not None else "-")
+                d2.metric("生成速度", f"{perf_record['llm_tokens_per_second']} tok/s" if perf_record["llm_tokens_per_second"] else "-")
+                d3.metric("思考 token", perf_record["llm_reasoning_tokens"])
+                d4.metric("回答 token", perf_record["llm_answer_tokens"])
+                if not perf_record["llm_token_counts_exact"]:
+                    st.caption("服务端未返回 token 用量，token 数按流式分片数近似。")
+                if perf_record.get("llm_cached"):
+                    coach_stats = get_coach_cache().stats()
+                    st.caption(f"AI 回答来自缓存 (重放不走网络) · 缓存命中 {coach_stats['hits']} / 未命中 {coach_stats['misses']} · 已缓存 {coach_stats['size']} 条")
+            elif perf_record.get("llm_error"):
+                st.caption(f"AI 调用失败: {perf_record['llm_error']}")
+
+# --- 4. 敏感性分析：等级 × 金币 ---
+st.divider()
+if st.button("📈 生成 等级 × 金币 成功率热力图", use_container_width=True):
+    sweep_check = prepare_params(current_season_data, level, target_cost, target_taken, other_taken, locked_types, has_headliner)
+    if isinstance(sweep_check, str) and sweep_check != "ERROR_LEVEL":
+        st.error(f"❌ {ERROR_MAP.get(sweep_check, '未知错误')}")
+    else:
+        # 每个等级一次递推就得到所有金币预算的成功率
+        curves = sweep_levels(
+            current_season_data, target_cost, target_copies, target_taken, other_taken,
+            locked_types_count=locked_types, has_headliner=has_headliner
+        )
+        sweep_levels_list = sorted(curves)
+        grid = np.array([curves[lv][0] for lv in sweep_levels_list])
+
+        st.subheader("📈 存钱 or 拉人口？")
+        plt = get_pyplot()
+        fig, ax = plt.subplots(figsize=(10, 3.5))
+        im = ax.imshow(
+            grid * 100, aspect="auto", origin="lower", cmap="viridis", vmin=0, vmax=100,
+            extent=(-0.5, grid.shape[1] - 0.5, sweep_levels_list[0] - 0.5, sweep_levels_list[-1] + 0.5)
+        )
+        ax.plot([gold], [level], marker="*", color="red", markersize=14)
+        ax.set_title(f"搜 {target_copies} 张 {target_cost} 费卡的成功率")
+        ax.set_xlabel("金币")
+        ax.set_ylabel("等级")
+        ax.set_yticks(sweep_levels_list)
+        fig.colorbar(im, ax=ax, label="成功率 (%)")
+        st.pyplot(fig)
+
+        # 当前金币下各等级对比
+        import pandas as pd
+        st.dataframe(
+            pd.DataFrame({
+                "等级": sweep_levels_list,
+                f"{gold} 金币成功率": [f"{curves[lv][0][min(gold, grid.shape[1] - 1)]*100:.1f}%" for lv in sweep_levels_list],
+                "成功时平均花费": [f"{curves[lv][1][min(gold, grid.shape[1] - 1)]:.0f}" for lv in sweep_levels_list],
+            }),
+            hide_index=True, use_container_width=True
+        )
 
+# --- 5. 场景对比：公共随机数 ---
+with st.expander("⚖️ 场景对比 (同一套随机数，少量模拟即可看出差别)"):
+    variant_options = ["等级 +1", "等级 -1", "金币 +10"]
+    if current_season_data.get("HEADLINER_RATES"):
+        variant_options.append("切换天选状态")
+    variants = st.multiselect("和当前局面对比", variant_options, default=["等级 +1"])
+
+    if st.button("⚖️ 开始对比", use_container_width=True):
+        scenario_inputs = [("当前局面", level, gold, has_headliner)]
+        for variant in variants:
+            if variant == "等级 +1":
+                scenario_inputs.append((variant, level + 1, gold, has_headliner))
+            elif variant == "等级 -1":
+                scenario_inputs.append((variant, level - 1, gold, has_headliner))
+            elif variant == "金币 +10":
+                scenario_inputs.append((variant, level, gold + 10, has_headliner))
+            elif variant == "切换天选状态":
+                scenario_inputs.append((variant, level, gold, not has_headliner))
+
+        scenarios = []
+        for name, sc_level, sc_gold, sc_headliner in scenario_inputs:
+            sc_params = prepare_params(current_season_data, sc_level, target_cost, target_taken, other_taken, locked_types, sc_headliner)
+            if isinstance(sc_params, str):
+                st.warning(f"{name}：{ERROR_MAP.get(sc_params, '未知错误')}")
+                if not scenarios:
+                    break  # 当前局面本身不合法，没有基准
+                continue
+            scenarios.append((name, sc_params, sc_gold, target_copies))
+
+        if len(scenarios) > 1:
+            comparison = compare_scenarios(scenarios, num_trials)
+            import pandas as pd
+            st.dataframe(
+                pd.DataFrame({
+                    "场景": comparison["scenario"],
+                    "成功概率": [f"{v*100:.1f}%" for v in comparison["success_rate"]],
+                    "预期花费": [f"{v:.0f}" for v in comparison["avg_cost"]],
+                    "比当前局面": [f"{d*100:+.1f}%" for d in comparison["diff"]],
+                    "差值 95% 置信区间": [f"{lo*100:+.1f}% ~ {hi*100:+.1f}%" for lo, hi in zip(comparison["diff_ci_low"], comparison["diff_ci_high"])],
+                }).iloc[1:],
+                hide_index=True, use_container_width=True
+            )
+            reduction = comparison["variance_reduction"].iloc[1:].replace(np.inf, np.nan).min()
+            if not np.isnan(reduction):
+                st.caption(f"🔗 配对比较：达到同样精度，独立模拟至少需要 {reduction:.1f} 倍的次数 ({num_trials} 次模拟)")
+
+# --- 6. 全场卡池：8 人同时 D 牌 ---
+with st.expander("🏟️ 全场卡池模拟 (8 人共用卡池，对手也在 D)"):
+    st.caption("上面的模型把场外拿走的卡当成固定数字；这里让 7 个对手按各自打法一起 D 牌，卡池在你 D 的同时被抽走。天选格子不在此模拟。")
+    lc1, lc2, lc3 = st.columns(3)
+    with lc1:
+        lobby_contested = st.slider("抢同一张卡的对手", 0, NUM_PLAYERS - 1, 2)
+    with lc2:
+        lobby_rounds = st.slider("模拟回合数", 1, 5, 3, key="lobby_rounds")
+    with lc3:
+        lobby_count = st.selectbox("模拟局数", [2000, 10000, 50000], index=1)
+
+    strategy_labels = {"all_in": "梭哈", "slow_roll": "慢 D 吃利息", "reroll": "低费赌狗"}
+    lobby_strategies = st.multiselect(
+        "对手打法 (按顺序轮流分给 7 个对手)", list(OPPONENT_STRATEGIES), default=list(OPPONENT_STRATEGIES),
+        format_func=lambda name: f"{strategy_labels.get(name, name)} (Lv{OPPONENT_STRATEGIES[name]['level']} · "
+                                 f"{OPPONENT_STRATEGIES[name]['gold']} 金币 · D 到 {OPPONENT_STRATEGIES[name]['roll_to']})"
+    )
+    if st.checkbox("加一种自定义打法", value=False):
+        oc1, oc2, oc3 = st.columns(3)
+        with oc1:
+            custom_level = st.slider("对手等级", 3, 10, 8, key="lobby_custom_level")
+        with oc2:
+            custom_gold = st.number_input("对手金币", 0, 200, 50, step=10, key="lobby_custom_gold")
+        with oc3:
+            custom_roll_to = st.number_input("D 到多少金币停手", 0, 200, 0, step=10, key="lobby_custom_roll_to")
+        lobby_strategies = lobby_strategies + [{"level": custom_level, "gold": custom_gold, "roll_to": custom_roll_to}]
+
+    if st.button("🏟️ 开始全场模拟", use_container_width=True):
+        try:
+            lobby_report = compare_contested(
+                current_season_data, level, target_cost, gold, target_copies, contested=lobby_contested,
+                locked_types_count=locked_types, rounds=lobby_rounds, num_lobbies=lobby_count, strategies=lobby_strategies
+            )
+        except ValueError as e:
+            st.error(f"❌ {e}")
+        else:
+            lm1, lm2, lm3 = st.columns(3)
+            lm1.metric(f"有 {lobby_contested} 人抢卡", format_prob(lobby_report["contested"]["success_rate"]))
+            lm2.metric("没人抢卡", format_prob(lobby_report["uncontested"]["success_rate"]))
+            lm3.metric("被抢卡损失", f"{lobby_report['contested_penalty']*100:.1f}%")
+            st.caption(f"{lobby_rounds} 回合内买齐的概率 · 每种情况 {lobby_count} 局 · 约 {lobby_report['lobbies_per_minute']:,} 局/分钟")
+
+# --- 7. 多目标联合 D 牌：几张卡共用一笔金币 ---
+with st.expander("🎯 多目标联合 D 牌 (几张卡一起找，共用金币)"):
+    st.caption("分开算每张卡的成功率，等于假设每张卡都能独占全部金币，会高估。这里几张卡一起 D，买卡共用同一笔金币，同费卡共用一个卡池。")
+    st.caption(f"目标 1 沿用上面的设置；场外被拿走的同费卡和锁定卡种只作用于 {target_cost} 费，其他费用按赛季默认。")
+    joint_count = st.slider("目标数", 2, 3, 2)
+    joint_targets = [{"cost": target_cost, "copies": target_copies, "taken": target_taken}]
+    for i in range(1, joint_count):
+        jc1, jc2, jc3 = st.columns(3)
+        with jc1:
+            jt_cost = st.selectbox(f"目标 {i + 1} 几费", [1, 2, 3, 4, 5], index=max(target_cost - i, 0), key=f"joint_cost_{i}")
+        with jc2:
+            jt_copies = st.selectbox(f"目标 {i + 1} 缺几张", list(range(1, 10)), index=1, key=f"joint_copies_{i}")
+        with jc3:
+            jt_taken = st.number_input(f"目标 {i + 1} 外面有几张", min_value=0, value=0, key=f"joint_taken_{i}")
+        joint_targets.append({"cost": jt_cost, "copies": jt_copies, "taken": jt_taken})
+    joint_trials = st.selectbox("模拟次数", [20000, 100000, 300000], index=1, key="joint_trials")
+
+    if st.button("🎯 开始联合模拟", use_container_width=True):
+        joint_report = run_joint(
+            current_season_data, level, gold, joint_targets, joint_trials,
+            other_taken={target_cost: other_taken}, locked={target_cost: locked_types}, has_headliner=has_headliner
+        )
+        if isinstance(joint_report, str):
+            st.error(f"❌ {ERROR_MAP.get(joint_report, '未知错误')}")
+        else:
+            jm1, jm2, jm3 = st.columns(3)
+            jm1.metric("全部凑齐 (共用金币)", format_prob(joint_report["success_rate"]))
+            if joint_report["naive_independent"] is not None:
+                jm2.metric("各算各的再相乘", format_prob(joint_report["naive_independent"]))
+            jm3.metric("成功时平均花费", f"{joint_report['avg_cost']:.1f}")
+            import pandas as pd
+            st.dataframe(pd.DataFrame([{
+                "目标": f"{t['cost']} 费 缺 {t['copies']} 张",
+                "联合下凑齐": format_prob(t["hit_rate"]),
+                "单独算 (独占金币)": "-" if t["standalone_success"] is None else format_prob(t["standalone_success"]),
+                "平均搜到": f"{t['avg_found']:.2f}",
+                "搜到 0/1/2… 张": " / ".join(f"{p*100:.0f}%" for p in t["found_distribution"]),
+            } for t in joint_report["targets"]]), hide_index=True, use_container_width=True)
+            st.caption(f"{joint_trials} 次模拟 · 约 {joint_report['trials_per_second']:,} 次/秒")
+
+# --- 每次 rerun 的开销：跑了模拟的那次写日志，勾选诊断时在侧边栏显示 ---
+process_stats = get_process_stats()
+process_stats["reruns"] += 1
+rerun_ms = (time.perf_counter() - _script_start) * 1000
+if perf_record is not None:
+    log_event(
+        "rerun", run_id=perf_record["run_id"], rerun_ms=round(rerun_ms, 2), import_ms=round(_import_ms, 2),
+        cold_start=process_stats["reruns"] == 1, lazy_loaded=[m for m in ("matplotlib", "openai", "pandas") if m in sys.modules]
+    )
+if show_diagnostics:
+    st.sidebar.caption(f"⏱️ 本次运行 {rerun_ms:.0f} ms (其中导入 {_import_ms:.0f} ms) · 进程内第 {process_stats['reruns']} 次运行")
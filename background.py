@@ -0,0 +1,83 @@
+# 后台模拟任务：在线程里逐批跑 iter_simulation，页面轮询目前为止的估计，输入一变就取消
+#
+# 模拟本身不碰 Streamlit；页面脚本只在轮询时读 snapshot()，所以脚本随时能被新的 rerun 打断，
+# 被打断时由调用方 cancel()，后台线程最多再跑完当前这一批 (约 STREAM_BATCH_SECONDS 秒) 就停。
+import threading
+import time
+
+from simulator import TrialResults, summarize_result
+
+
+class SimulationJob:
+    """一次后台模拟。batches 是 iter_simulation 返回的生成器，total 是预计总次数 (未知时为 None)。"""
+
+    def __init__(self, batches, total=None):
+        self.total = total
+        self.error = None
+        self._batches = batches
+        self._parts = []
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+        self._start = time.perf_counter()
+        self.elapsed = None
+        self._thread = threading.Thread(target=self._run, name="simulation-job", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            for batch in self._batches:
+                with self._lock:
+                    self._parts.append(batch)
+                    self._snapshot = None
+                if self._cancelled.is_set():
+                    break
+        except Exception as e:
+            # 子进程崩溃等，交给页面显示
+            self.error = e
+        finally:
+            self._batches.close()
+            self.elapsed = time.perf_counter() - self._start
+            self._done.set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def snapshot(self):
+        """目前为止的估计：{trials, progress, success_rate, avg_cost, ci}，还没有结果时返回 None。"""
+        with self._lock:
+            if self._snapshot is None and self._parts:
+                results = TrialResults.concat(self._parts) if len(self._parts) > 1 else self._parts[0]
+                summary = summarize_result(results)
+                trials = len(results) if summary["num_trials"] else self.total
+                self._snapshot = {
+                    "trials": trials,
+                    "progress": min(trials / self.total, 1.0) if self.total and trials else None,
+                    "success_rate": summary["success_rate"],
+                    "avg_cost": summary["avg_cost"],
+                    "ci": summary["ci"],
+                }
+            return self._snapshot
+
+    def result(self, timeout=None):
+        """等任务结束，返回合并后的 TrialResults；被取消时返回 None，出错时抛出原异常。"""
+        self.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        if self.cancelled or not self._parts:
+            return None
+        with self._lock:
+            if len(self._parts) == 1:
+                return self._parts[0]
+            return TrialResults.concat(self._parts)
@@ -0,0 +1,200 @@
+# 命令行批量模拟：从 JSONL 逐行读取场景，每个场景输出一行 JSON 结果 (不依赖 Streamlit)
+#
+# 用法：
+#   python batch_cli.py scenarios.jsonl --workers 4 > results.jsonl
+#   cat scenarios.jsonl | python batch_cli.py - --engine exact
+#
+# 每行一个场景，例如：
+#   {"season": "S16", "level": 8, "gold": 50, "target_cost": 4, "target_copies": 3,
+#    "target_taken": 0, "other_taken": 10, "locked_types": 13, "has_headliner": false}
+# locked_types 不填时与页面一致，取赛季默认的未解锁卡种数 (DEFAULT_LOCKED)。
+# 可选字段 num_trials / engine / tolerance / seed 会覆盖命令行默认值。
+# gold 超过 MAX_GOLD、num_trials 超过 MAX_TRIALS 的场景直接拒绝 (错误码 ERROR_GOLD_LIMIT / ERROR_TRIALS_LIMIT)，
+# 避免精确计算或超大批次把进程卡死、内存撑爆。
+# 吞吐量 (场景/秒) 在结束时以一行 JSON 写到 stderr。
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from season_config import SEASON_CONFIG, resolve_season
+from simulator import run_simulation, summarize_result
+
+CLI_ENGINES = ("numpy", "loop", "exact", "rare")
+MAX_GOLD = 1000
+MAX_TRIALS = 1_000_000
+
+
+def validate_scenario(season_data, level, target_cost, gold, target_copies, target_taken, other_taken, num_trials):
+    """检查数值范围，不合法时抛出 ValueError (错误信息直接写进结果行)。"""
+    if target_cost not in season_data["POOL_SIZES"]:
+        raise ValueError(f"target_cost 必须是 {sorted(season_data['POOL_SIZES'])} 之一")
+    if level not in season_data["SAMPLING"]:
+        raise ValueError(f"level 必须在 {min(season_data['SAMPLING'])} ~ {max(season_data['SAMPLING'])} 之间")
+    if num_trials <= 0:
+        raise ValueError("num_trials 必须是正整数")
+    if num_trials > MAX_TRIALS:
+        raise ValueError("ERROR_TRIALS_LIMIT")
+    if gold < 0:
+        raise ValueError("gold 不能为负数")
+    if gold > MAX_GOLD:
+        raise ValueError("ERROR_GOLD_LIMIT")
+    if target_copies <= 0:
+        raise ValueError("target_copies 必须是正整数")
+    if target_taken < 0 or other_taken < 0:
+        raise ValueError("target_taken / other_taken 不能为负数")
+
+
+def parse_scenario(index, scenario, defaults):
+    """合并默认值并检查输入，返回 (赛季名, 引擎, 位置参数, 关键字参数)；不合法时抛出 ValueError。"""
+    sc = {**defaults, **scenario}
+    try:
+        season_name = resolve_season(sc["season"])
+        if sc["engine"] not in CLI_ENGINES:
+            raise ValueError(f"命令行不支持引擎 {sc['engine']}，可选: {', '.join(CLI_ENGINES)}")
+        # 每个场景由 (种子, 行号) 派生独立种子，并发顺序不影响结果
+        seed = None
+        if sc.get("seed") is not None:
+            seed = int(np.random.SeedSequence([int(sc["seed"]), index]).generate_state(1)[0])
+        season_data = SEASON_CONFIG[season_name]
+        args = (
+            season_data, int(sc["level"]), int(sc["target_cost"]), int(sc["gold"]),
+            int(sc["target_copies"]), int(sc.get("target_taken", 0)), int(sc.get("other_taken", 0)),
+            int(sc["num_trials"]),
+        )
+        kwargs = {
+            # 不填时与页面一致：赛季默认的未解锁任务卡种数
+            "locked_types_count": int(sc.get("locked_types", season_data.get("DEFAULT_LOCKED", {}).get(args[2], 0))),
+            "has_headliner": bool(sc.get("has_headliner", False)),
+            "seed": seed,
+            "tolerance": sc.get("tolerance"),  # 只对 numpy 引擎生效
+        }
+        validate_scenario(season_data, *args[1:])
+    except KeyError as e:
+        raise ValueError(f"缺少字段: {e.args[0]}") from None
+    except TypeError as e:
+        raise ValueError(str(e)) from None
+    return season_name, sc["engine"], args, kwargs
+
+
+def check_scenario(scenario, defaults):
+    """只做输入检查 (不模拟)，返回错误信息；合法时返回 None。服务端提交进程池之前先调用。"""
+    try:
+        parse_scenario(0, scenario, defaults)
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def run_scenario(index, scenario, defaults):
+    """跑一个场景，只返回汇总数值 (子进程里执行，避免把整张 DataFrame 传回主进程)。"""
+    result = {"index": index, "input": scenario}
+    try:
+        season_name, engine, args, kwargs = parse_scenario(index, scenario, defaults)
+    except ValueError as e:
+        result["error"] = str(e)
+        return result
+
+    # 模拟本身出错也只记在这一行，不中断整批 (服务端据此返回 400 而不是 500)
+    try:
+        sim_result = run_simulation(*args, engine=engine, **kwargs)
+        if isinstance(sim_result, str):
+            result["error"] = sim_result
+            return result
+        summary = summarize_result(sim_result)
+        # 与页面一致：蒙特卡洛几乎没搜到时改用重要性抽样
+        if summary["num_trials"] and "weight" not in sim_result and summary["success_rate"] * summary["num_trials"] < 5:
+            engine = "rare"
+            sim_result = run_simulation(*args, engine=engine, **kwargs)
+            summary = summarize_result(sim_result)
+    except Exception as e:
+        result["error"] = f"模拟失败: {type(e).__name__}: {e}"
+        return result
+
+    result.update({
+        "season": season_name,
+        "engine": engine,
+        "success_rate": summary["success_rate"],
+        "avg_cost": summary["avg_cost"],
+        "ci": list(summary["ci"]) if summary["ci"] else None,
+        "num_trials": summary["num_trials"],
+    })
+    return result
+
+
+def parse_lines(stream):
+    # 逐行读取，坏行直接产出错误结果，不中断整批
+    for index, line in enumerate(stream):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            scenario = json.loads(line)
+            if not isinstance(scenario, dict):
+                raise ValueError("每行必须是一个 JSON 对象")
+        except ValueError as e:
+            yield index, None, {"index": index, "error": f"JSON 解析失败: {e}"}
+            continue
+        yield index, scenario, None
+
+
+def iter_results(stream, defaults, workers, max_in_flight):
+    """按输入顺序产出结果；同时在途的场景不超过 max_in_flight 个，内存有界。"""
+    if workers <= 1:
+        for index, scenario, error in parse_lines(stream):
+            yield error or run_scenario(index, scenario, defaults)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for index, scenario, error in parse_lines(stream):
+            pending.append(error if error else pool.submit(run_scenario, index, scenario, defaults))
+            while len(pending) >= max_in_flight:
+                item = pending.popleft()
+                yield item if isinstance(item, dict) else item.result()
+        while pending:
+            item = pending.popleft()
+            yield item if isinstance(item, dict) else item.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="金铲铲 D 牌概率批量模拟 (JSONL 进，JSONL 出)")
+    parser.add_argument("input", nargs="?", default="-", help="场景 JSONL 文件，- 表示 stdin")
+    parser.add_argument("--engine", default="numpy", choices=CLI_ENGINES, help="默认模拟引擎")
+    parser.add_argument("--trials", type=int, default=1000, help="默认模拟次数")
+    parser.add_argument("--tolerance", type=float, default=None, help="自适应模式的允许误差 (如 0.01)，仅 numpy 引擎")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子，给定后整批结果可复现")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="并发进程数")
+    args = parser.parse_args(argv)
+
+    defaults = {"engine": args.engine, "num_trials": args.trials, "tolerance": args.tolerance, "seed": args.seed}
+    stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    count = errors = 0
+    start = time.perf_counter()
+    try:
+        for result in iter_results(stream, defaults, args.workers, max_in_flight=4 * max(args.workers, 1)):
+            sys.stdout.write(json.dumps(result, ensure_ascii=False) + "\n")
+            sys.stdout.flush()
+            count += 1
+            errors += "error" in result
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    elapsed = time.perf_counter() - start
+    sys.stderr.write(json.dumps({
+        "scenarios": count,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "scenarios_per_second": round(count / elapsed, 2) if elapsed > 0 else None,
+    }) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
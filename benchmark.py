@@ -0,0 +1,192 @@
+# 模拟热路径基准测试：速度 / 峰值内存 / 统计正确性，输出 JSON 方便在不同提交之间对比
+#
+# 用法：
+#   python benchmark.py --output bench.json                      # 跑全部场景
+#   python benchmark.py --sizes 1000,100000 --compare bench.json  # 和上次结果比速度
+#   python benchmark.py --write-baseline                          # 用精确解重新生成成功率基线
+#
+# 成功率检查：每次蒙特卡洛结果与基线 (马尔可夫链精确解) 的偏差不超过 z_tolerance 个标准误。
+# 有检查失败或速度退化超过 --max-slowdown 时，退出码为 1。
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from season_config import SEASON_CONFIG
+from simulator import run_simulation, summarize_result
+
+S16 = "S16 (英雄联盟传奇)"
+S10 = "S10 (强音对决)"
+
+# 有代表性的场景：名称 -> run_simulation 的参数
+SCENARIOS = {
+    "s16_locked_4cost": dict(season=S16, level=8, target_cost=4, start_gold=50, target_copies=3,
+                             target_taken=0, other_taken=10, locked_types_count=13),
+    "s10_no_headliner": dict(season=S10, level=8, target_cost=4, start_gold=50, target_copies=3,
+                             target_taken=0, other_taken=10, has_headliner=False),
+    "s10_headliner": dict(season=S10, level=8, target_cost=4, start_gold=50, target_copies=3,
+                          target_taken=0, other_taken=10, has_headliner=True),
+    "s16_1cost_reroll": dict(season=S16, level=4, target_cost=1, start_gold=50, target_copies=6,
+                             target_taken=2, other_taken=15),
+    "s16_5cost_rolldown": dict(season=S16, level=9, target_cost=5, start_gold=80, target_copies=2,
+                               target_taken=0, other_taken=5),
+}
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+DEFAULT_ENGINES = ("numpy", "loop")
+LOOP_MAX_TRIALS = 100000  # 逐次循环引擎跑 100 万次太慢，超过这个规模跳过
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+SEED = 2024
+
+
+def _run(scenario, engine, num_trials):
+    sc = dict(scenario)
+    season_data = SEASON_CONFIG[sc.pop("season")]
+    return run_simulation(season_data, sc.pop("level"), sc.pop("target_cost"), sc.pop("start_gold"),
+                          sc.pop("target_copies"), sc.pop("target_taken"), sc.pop("other_taken"),
+                          num_trials, engine=engine, seed=SEED, **sc)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_baseline(path):
+    baseline = {}
+    for name, scenario in SCENARIOS.items():
+        summary = summarize_result(_run(scenario, "exact", 0))
+        baseline[name] = {"success_rate": summary["success_rate"], "avg_cost": summary["avg_cost"]}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    return baseline
+
+
+def bench_one(name, engine, num_trials, baseline, repeat, measure_memory, z_tolerance):
+    scenario = SCENARIOS[name]
+    # 计时和测内存分开跑：tracemalloc 会明显拖慢纯 Python 的循环引擎
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = _run(scenario, engine, num_trials)
+        times.append(time.perf_counter() - start)
+    peak_mb = None
+    if measure_memory:
+        tracemalloc.start()
+        _run(scenario, engine, num_trials)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+
+    summary = summarize_result(df)
+    wall = min(times)
+    row = {
+        "scenario": name,
+        "engine": engine,
+        "trials": num_trials,
+        "wall_seconds": round(wall, 4),
+        "trials_per_second": round(num_trials / wall, 1),
+        "peak_memory_mb": None if peak_mb is None else round(peak_mb, 2),
+        "success_rate": summary["success_rate"],
+        "avg_cost": summary["avg_cost"],
+    }
+    expected = baseline.get(name, {}).get("success_rate")
+    if expected is not None:
+        # 标准误用基线概率算；加一个极小量，避免 p 为 0 或 1 时误报
+        std_err = np.sqrt(expected * (1 - expected) / num_trials) + 1e-9
+        z = (summary["success_rate"] - expected) / std_err
+        row.update({"baseline_success_rate": expected, "z_score": round(z, 2), "stat_ok": bool(abs(z) <= z_tolerance)})
+    return row
+
+
+def compare(results, previous, max_slowdown):
+    """按 (场景, 引擎, 次数) 对齐，返回速度变慢超过阈值的条目。"""
+    old = {(r["scenario"], r["engine"], r["trials"]): r for r in previous.get("results", [])}
+    regressions = []
+    for row in results:
+        before = old.get((row["scenario"], row["engine"], row["trials"]))
+        if not before:
+            continue
+        ratio = row["trials_per_second"] / before["trials_per_second"]
+        row["speed_vs_previous"] = round(ratio, 3)
+        if ratio < 1 - max_slowdown:
+            regressions.append({"scenario": row["scenario"], "engine": row["engine"], "trials": row["trials"],
+                                "previous_commit": previous.get("meta", {}).get("commit"), "speed_ratio": round(ratio, 3)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="模拟热路径基准测试")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="模拟次数，逗号分隔")
+    parser.add_argument("--engines", default=",".join(DEFAULT_ENGINES), help="引擎，逗号分隔 (numpy/loop/rare)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="场景名，逗号分隔")
+    parser.add_argument("--repeat", type=int, default=1, help="每项重复次数，取最快一次")
+    parser.add_argument("--no-memory", action="store_true", help="不测峰值内存 (省一次运行)")
+    parser.add_argument("--z-tolerance", type=float, default=4.0, help="成功率允许偏离基线的标准误个数")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="成功率基线文件")
+    parser.add_argument("--write-baseline", action="store_true", help="用精确解重新生成基线后退出")
+    parser.add_argument("--compare", default=None, help="上一次的输出文件，用来检查速度退化")
+    parser.add_argument("--max-slowdown", type=float, default=0.2, help="允许的速度下降比例")
+    parser.add_argument("--output", default=None, help="结果写到文件 (默认 stdout)")
+    args = parser.parse_args(argv)
+
+    if args.write_baseline:
+        json.dump(write_baseline(args.baseline), sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    results = []
+    for name in args.scenarios.split(","):
+        for engine in args.engines.split(","):
+            for num_trials in map(int, args.sizes.split(",")):
+                if engine == "loop" and num_trials > LOOP_MAX_TRIALS:
+                    continue
+                row = bench_one(name, engine, num_trials, baseline, args.repeat, not args.no_memory, args.z_tolerance)
+                results.append(row)
+                sys.stderr.write(f"{name:20s} {engine:6s} {num_trials:>8d}  {row['wall_seconds']:8.3f}s  "
+                                 f"{row['trials_per_second']:>12,.0f}/s  z={row.get('z_score')}\n")
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.max_slowdown)
+
+    stat_failures = [r for r in results if r.get("stat_ok") is False]
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": SEED,
+        },
+        "results": results,
+        "stat_failures": len(stat_failures),
+        "regressions": regressions,
+        "ok": not stat_failures and not regressions,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2) + "\n"
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
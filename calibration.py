@@ -0,0 +1,340 @@
+# 真实商店日志校准：流式读入 D 牌时看到的商店，统计各等级各费用的出现频率，和模型假设做拟合优度检验
+#
+# 用法：
+#   python calibration.py generate --season S10 --rows 1000000 --out shops.csv.gz   # 按模型生成一份模拟日志
+#   python calibration.py check shops.csv.gz --season S10 --write-season fixed.json   # 检验并输出修正后的赛季文件
+#
+# 日志为 CSV (可 gzip)，每行一个商店，列：
+#   level                 当前等级
+#   slot_1 ~ slot_5       普通格子的费用 (1-5)，空或 0 表示该格没有卡 (如天选回合只有 4 个普通格子)
+#   headliner             天选格子的费用，没有天选格子时留空 (可选列)
+#   target_cost / target_remaining / pool_remaining / target_seen
+#                         卡池消耗检验 (可选列)：记录时盯着的那张卡的费用、卡池里还剩几张、
+#                         同费卡池还剩几张 (只算在池卡种)、这个商店的普通格子里出现了几张
+#
+# 一次遍历、按块读入，内存只和块大小有关；几千万行也只需要计数数组。
+import argparse
+import gzip
+import json
+import math
+import sys
+import time
+
+import numpy as np
+
+from season_config import SEASON_CONFIG, dump_season, resolve_season
+
+SLOT_COLUMNS = ["slot_1", "slot_2", "slot_3", "slot_4", "slot_5"]
+DEPLETION_COLUMNS = ["target_cost", "target_remaining", "pool_remaining", "target_seen"]
+LOG_COLUMNS = ["level"] + SLOT_COLUMNS + ["headliner"] + DEPLETION_COLUMNS
+MAX_LEVEL = 10
+MAX_COST = 5
+CHUNK_ROWS = 1_000_000
+DEPLETION_BINS = 10  # 按模型给出的单格概率 (剩余张数 / 同费剩余) 分 10 档
+
+
+# --- 统计检验 (不依赖 scipy) ---
+def chi2_sf(x, df):
+    """卡方分布右尾概率 = 正则化上不完全伽马函数 Q(df/2, x/2)。"""
+    if df <= 0:
+        return float("nan")
+    a, x = df / 2, x / 2
+    if x <= 0:
+        return 1.0
+    log_prefix = -x + a * math.log(x) - math.lgamma(a)
+    if x < a + 1:
+        # 级数求 P，再取 1 - P
+        term = total = 1 / a
+        ap = a
+        for _ in range(10000):
+            ap += 1
+            term *= x / ap
+            total += term
+            if abs(term) < abs(total) * 1e-15:
+                break
+        return max(0.0, 1 - total * math.exp(log_prefix))
+    # 连分式 (Lentz 算法) 直接求 Q
+    tiny = 1e-300
+    b = x + 1 - a
+    c, d = 1 / tiny, 1 / b
+    h = d
+    for i in range(1, 10000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        h *= d * c
+        if abs(d * c - 1) < 1e-15:
+            break
+    return min(1.0, math.exp(log_prefix) * h)
+
+
+def normal_two_sided(z):
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+# --- 流式聚合 ---
+class ShopLogAggregator:
+    """累计计数：slot[等级, 费用]、headliner[等级, 费用]，以及卡池消耗检验的分档期望 / 观测。"""
+
+    def __init__(self):
+        self.rows = 0
+        self.bad_rows = 0
+        self.slot = np.zeros((MAX_LEVEL + 1, MAX_COST + 1), dtype=np.int64)
+        self.headliner = np.zeros((MAX_LEVEL + 1, MAX_COST + 1), dtype=np.int64)
+        self.depletion_rows = 0
+        self.depletion = {name: np.zeros(DEPLETION_BINS) for name in ("slots", "expected", "observed", "variance")}
+
+    def add_chunk(self, frame):
+        level = frame["level"].to_numpy(dtype=float, na_value=np.nan)
+        slots = frame[SLOT_COLUMNS].to_numpy(dtype=float, na_value=0.0)
+        slots = np.nan_to_num(slots).astype(np.int64)
+        valid = (level >= 1) & (level <= MAX_LEVEL) & (slots >= 0).all(axis=1) & (slots <= MAX_COST).all(axis=1)
+        self.rows += len(frame)
+        self.bad_rows += int((~valid).sum())
+        level = level[valid].astype(np.int64)
+        slots = slots[valid]
+
+        # 等级 × 费用 展平成一个下标，一次 bincount；费用 0 (空格子) 最后丢掉
+        width = MAX_COST + 1
+        size = (MAX_LEVEL + 1) * width
+        self.slot += np.bincount((level[:, None] * width + slots).ravel(), minlength=size).reshape(self.slot.shape)
+        if "headliner" in frame:
+            hl = np.nan_to_num(frame["headliner"].to_numpy(dtype=float, na_value=0.0)[valid]).astype(np.int64)
+            ok = (hl >= 1) & (hl <= MAX_COST)
+            self.headliner += np.bincount(level[ok] * width + hl[ok], minlength=size).reshape(self.headliner.shape)
+
+        if all(column in frame for column in DEPLETION_COLUMNS):
+            dep = frame[DEPLETION_COLUMNS].to_numpy(dtype=float, na_value=np.nan)[valid]
+            target_cost, remaining, pool, seen = dep.T
+            ok = (target_cost >= 1) & (pool > 0) & (remaining >= 0) & (remaining <= pool) & ~np.isnan(seen)
+            # 普通格子里出现目标费用的格数 n，每格是目标卡的概率 p = 剩余 / 同费剩余 (模拟器的假设)
+            n = (slots[ok] == target_cost[ok, None]).sum(axis=1)
+            p = remaining[ok] / pool[ok]
+            bins = np.minimum((p * DEPLETION_BINS).astype(np.int64), DEPLETION_BINS - 1)
+            self.depletion_rows += int(ok.sum())
+            for name, weights in (("slots", n), ("expected", n * p), ("observed", seen[ok]), ("variance", n * p * (1 - p))):
+                self.depletion[name] += np.bincount(bins, weights=weights, minlength=DEPLETION_BINS)
+
+
+def read_shop_log(paths, aggregator=None, chunk_rows=CHUNK_ROWS):
+    """按块读入一个或多个日志文件 (.csv / .csv.gz)，返回累计好的 ShopLogAggregator。"""
+    import pandas as pd
+
+    aggregator = aggregator or ShopLogAggregator()
+    for path in paths:
+        reader = pd.read_csv(
+            path, chunksize=chunk_rows, usecols=lambda column: column in LOG_COLUMNS,
+            dtype={column: "float32" for column in LOG_COLUMNS}, engine="c",
+        )
+        for frame in reader:
+            missing = [column for column in ["level"] + SLOT_COLUMNS if column not in frame]
+            if missing:
+                raise ValueError(f"{path}: 缺少列 {', '.join(missing)}")
+            aggregator.add_chunk(frame)
+    return aggregator
+
+
+# --- 与模型对比 ---
+def _rate_test(observed, expected_probs):
+    """一个等级的拟合优度：Pearson 卡方 (只算模型概率 > 0 的费用)，模型概率为 0 却出现了的单独列出。"""
+    n = int(observed.sum())
+    expected = n * expected_probs
+    support = expected_probs > 0
+    chi2 = float((((observed - expected) ** 2)[support] / expected[support]).sum())
+    df = int(support.sum()) - 1
+    return {
+        "slots": n,
+        "observed": {int(c): round(float(o / n), 5) for c, o in enumerate(observed) if c > 0},
+        "expected": {int(c): float(p) for c, p in enumerate(expected_probs) if c > 0},
+        "chi2": round(chi2, 3),
+        "df": df,
+        "p_value": chi2_sf(chi2, df) if df > 0 else None,
+        "impossible": {int(c): int(o) for c, o in enumerate(observed) if c > 0 and o > 0 and not support[c]},
+    }
+
+
+def compare_rates(aggregator, season_data, min_slots=1000, alpha=0.01):
+    """按等级检验普通格子 (和天选格子) 的费用分布，返回 {drop_rates: [...], headliner_rates: [...]}。"""
+    report = {}
+    for key, counts, table in (("drop_rates", aggregator.slot, "slot"), ("headliner_rates", aggregator.headliner, "headliner")):
+        rows = []
+        for level, tables in sorted(season_data["SAMPLING"].items()):
+            rates = tables[table]
+            observed = counts[level, :MAX_COST + 1].astype(float)
+            observed[0] = 0  # 空格子
+            if rates is None or observed.sum() < min_slots:
+                continue
+            expected_probs = np.zeros(MAX_COST + 1)
+            expected_probs[:len(rates["by_cost"])] = rates["by_cost"][:MAX_COST + 1]
+            row = {"level": level, **_rate_test(observed, expected_probs)}
+            row["rejected"] = bool(row["impossible"]) or (row["p_value"] is not None and row["p_value"] < alpha)
+            rows.append(row)
+        report[key] = rows
+    return report
+
+
+def compare_depletion(aggregator):
+    """卡池消耗假设：各档观测到的目标卡张数 vs 期望 (按 剩余 / 同费剩余)，整体 z 检验 + 分档卡方。"""
+    dep = aggregator.depletion
+    if aggregator.depletion_rows == 0:
+        return None
+    used = dep["variance"] > 0
+    z = (dep["observed"].sum() - dep["expected"].sum()) / math.sqrt(dep["variance"].sum()) if used.any() else 0.0
+    chi2 = float(((dep["observed"] - dep["expected"]) ** 2 / np.where(used, dep["variance"], 1))[used].sum())
+    return {
+        "rows": aggregator.depletion_rows,
+        "observed": float(dep["observed"].sum()),
+        "expected": round(float(dep["expected"].sum()), 2),
+        "z": round(float(z), 3),
+        "p_value": normal_two_sided(z),
+        "bins_chi2": round(chi2, 3),
+        "bins_df": int(used.sum()),
+        "bins_p_value": chi2_sf(chi2, int(used.sum())),
+        "bins": [
+            {"p_range": [i / DEPLETION_BINS, (i + 1) / DEPLETION_BINS], "slots": int(dep["slots"][i]),
+             "observed": float(dep["observed"][i]), "expected": round(float(dep["expected"][i]), 2)}
+            for i in range(DEPLETION_BINS) if dep["slots"][i] > 0
+        ],
+    }
+
+
+def _round_rates(rates, digits=4):
+    # 四舍五入后把误差加到最大的一项上，保证和为 1 (赛季文件校验要求)
+    rounded = {cost: round(p, digits) for cost, p in rates.items()}
+    largest = max(rounded, key=rounded.get)
+    rounded[largest] = round(rounded[largest] + 1 - sum(rounded.values()), digits)
+    return rounded
+
+
+def corrected_season(season_data, rate_report):
+    """被拒绝的等级换成观测频率，其余保持原值；返回可直接写成赛季文件的数据。"""
+    data = {key: json.loads(json.dumps(season_data[key])) for key in ("POOL_SIZES", "DISTINCT_CHAMPS", "DEFAULT_LOCKED")}
+    for key, config_key in (("drop_rates", "DROP_RATES"), ("headliner_rates", "HEADLINER_RATES")):
+        if config_key not in season_data:
+            continue
+        table = {level: dict(rates) for level, rates in season_data[config_key].items()}
+        for row in rate_report[key]:
+            if row["rejected"]:
+                table[row["level"]] = _round_rates({cost: row["observed"].get(cost, 0.0) for cost in sorted(season_data["POOL_SIZES"])})
+        data[config_key] = table
+    return data
+
+
+def check(args):
+    season_name = args.season
+    season_data = SEASON_CONFIG[season_name]
+    start = time.perf_counter()
+    aggregator = read_shop_log(args.paths, chunk_rows=args.chunk_rows)
+    elapsed = time.perf_counter() - start
+
+    rate_report = compare_rates(aggregator, season_data, args.min_slots, args.alpha)
+    report = {
+        "season": season_name,
+        "rows": aggregator.rows,
+        "bad_rows": aggregator.bad_rows,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(aggregator.rows / elapsed) if elapsed > 0 else None,
+        "alpha": args.alpha,
+        **rate_report,
+        "depletion": compare_depletion(aggregator),
+    }
+    rejected = [f"{key}[{row['level']}]" for key in ("drop_rates", "headliner_rates") for row in rate_report[key] if row["rejected"]]
+    report["rejected"] = rejected
+    if args.write_season:
+        name = args.season_name or f"{season_name} (校准)"
+        with open(args.write_season, "w", encoding="utf-8") as f:
+            f.write(dump_season(name, corrected_season(season_data, rate_report)))
+        report["written"] = args.write_season
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 1 if rejected and args.fail_on_reject else 0
+
+
+# --- 生成模拟日志：验证这条流水线本身 / 测吞吐 ---
+def generate(args):
+    """按赛季模型抽样商店写成日志；--distort 把每个等级的费率随机扰动，用来确认检验能发现偏差。"""
+    import pandas as pd
+
+    season_name = args.season
+    season_data = SEASON_CONFIG[season_name]
+    rng = np.random.default_rng(args.seed)
+    levels = np.array(sorted(level for level in season_data["SAMPLING"] if level >= 3))
+    costs = season_data["SAMPLING"][levels[0]]["costs"]
+    slot_probs = np.array([season_data["SAMPLING"][level]["slot"]["probs"] for level in levels])
+    if args.distort:
+        slot_probs = slot_probs * rng.uniform(1 - args.distort, 1 + args.distort, slot_probs.shape)
+        slot_probs /= slot_probs.sum(axis=1, keepdims=True)
+    cum = np.cumsum(slot_probs, axis=1)
+    has_hl = bool(season_data.get("HEADLINER_RATES"))
+    hl_cum = np.cumsum([season_data["SAMPLING"][level]["headliner"]["probs"] for level in levels], axis=1) if has_hl else None
+
+    written = 0
+    # 压缩级别 1：默认的 9 写几百万行要慢好几倍，文件只小一点
+    f = gzip.open(args.out, "wt", compresslevel=1, encoding="utf-8", newline="") if args.out.endswith(".gz") else open(args.out, "w", encoding="utf-8", newline="")
+    with f:
+        while written < args.rows:
+            n = min(CHUNK_ROWS, args.rows - written)
+            li = rng.integers(len(levels), size=n)
+            u = rng.random((n, 5))
+            slot_costs = costs[np.minimum((u[:, :, None] > cum[li][:, None, :]).sum(axis=2), len(costs) - 1)]
+            frame = {"level": levels[li]}
+            headliner = np.zeros(n, dtype=np.int64)
+            if has_hl:
+                # 没天选时每次都有天选格子，占掉第 5 格
+                hl_idx = np.minimum((rng.random(n)[:, None] > hl_cum[li]).sum(axis=1), len(costs) - 1)
+                headliner = costs[hl_idx]
+                slot_costs[:, 4] = 0
+            frame.update({column: slot_costs[:, i] for i, column in enumerate(SLOT_COLUMNS)})
+            frame["headliner"] = headliner
+
+            # 卡池消耗：随机挑一个目标费用和卡池状态，按 剩余 / 同费剩余 抽出现张数
+            target_cost = costs[rng.integers(len(costs), size=n)]
+            pool_full = np.array([season_data["POOL_SIZES"][c] * season_data["DISTINCT_CHAMPS"][c] for c in costs])[target_cost - costs[0]]
+            one_full = np.array([season_data["POOL_SIZES"][c] for c in costs])[target_cost - costs[0]]
+            remaining = rng.integers(0, one_full + 1)
+            pool = np.maximum(rng.integers(pool_full // 2, pool_full + 1), remaining + 1)
+            tier_slots = (slot_costs == target_cost[:, None]).sum(axis=1)
+            frame.update({"target_cost": target_cost, "target_remaining": remaining, "pool_remaining": pool,
+                          "target_seen": rng.binomial(tier_slots, remaining / pool)})
+            pd.DataFrame(frame).to_csv(f, header=written == 0, index=False)
+            written += n
+    sys.stderr.write(f"已生成 {written} 行 -> {args.out}\n")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="真实商店日志校准：检验出卡概率与卡池消耗假设")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("check", help="读日志做拟合优度检验")
+    p.add_argument("paths", nargs="+", help="日志文件 (.csv / .csv.gz)")
+    p.add_argument("--season", default="S16", help="赛季名称或唯一前缀")
+    p.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="每块读入的行数 (决定内存占用)")
+    p.add_argument("--min-slots", type=int, default=1000, help="一个等级至少多少个格子才做检验")
+    p.add_argument("--alpha", type=float, default=0.01, help="显著性水平")
+    p.add_argument("--write-season", default=None, help="把修正后的概率表写成赛季文件 (被拒绝的等级用观测频率)")
+    p.add_argument("--season-name", default=None, help="修正后赛季文件里的名称")
+    p.add_argument("--fail-on-reject", action="store_true", help="有等级被拒绝时退出码为 1")
+    p.set_defaults(func=check)
+
+    p = sub.add_parser("generate", help="按模型生成模拟日志")
+    p.add_argument("--season", default="S16")
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--out", required=True, help="输出文件，以 .gz 结尾时压缩")
+    p.add_argument("--distort", type=float, default=0.0, help="费率随机扰动幅度 (如 0.1 = ±10%%)")
+    p.add_argument("--seed", type=int, default=None)
+    p.set_defaults(func=generate)
+
+    args = parser.parse_args(argv)
+    try:
+        args.season = resolve_season(args.season)
+    except ValueError as e:
+        parser.error(str(e))
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
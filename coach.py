@@ -0,0 +1,108 @@
+# AI 教练后端：进程内共用一个客户端 (复用连接池)，相同提示词 + 模型的回答在有效期内直接重放
+#
+# 重放的回答与真实流式输出的分片结构相同 (choices[0].delta.reasoning_content / content，最后一片带 usage)，
+# 页面的流式渲染和 StreamStats 不需要区分来源。
+# base_url 可以指向本地桩服务 (coach_stub.py)，离线也能测流式渲染。
+import hashlib
+import threading
+from types import SimpleNamespace
+
+from result_cache import ResultCache
+
+DEFAULT_BASE_URL = "https://api.deepseek.com"
+SYSTEM_PROMPT = "你是一个精通概率和云顶S16机制的职业教练。"
+REPLAY_CHUNK_CHARS = 16  # 重放缓存时每片的字数
+
+
+def make_coach_key(base_url, model, prompt, system_prompt=SYSTEM_PROMPT):
+    digest = hashlib.sha256(f"{system_prompt}\0{prompt}".encode("utf-8")).hexdigest()
+    return (base_url, model, digest)
+
+
+def _chunk(reasoning=None, content=None, usage=None):
+    choices = [] if reasoning is None and content is None else [
+        SimpleNamespace(delta=SimpleNamespace(reasoning_content=reasoning, content=content))
+    ]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+def replay_chunks(answer, chunk_chars=REPLAY_CHUNK_CHARS):
+    """把缓存的回答切成流式分片：先思考过程，再正文，最后一片带 token 用量。"""
+    for field in ("reasoning", "content"):
+        text = answer[field]
+        for i in range(0, len(text), chunk_chars):
+            piece = text[i:i + chunk_chars]
+            yield _chunk(reasoning=piece) if field == "reasoning" else _chunk(content=piece)
+    usage = answer.get("usage")
+    if usage:
+        yield _chunk(usage=SimpleNamespace(
+            completion_tokens=usage["completion_tokens"],
+            completion_tokens_details=SimpleNamespace(reasoning_tokens=usage["reasoning_tokens"]),
+        ))
+
+
+class CoachBackend:
+    """一个 (api_key, base_url) 对应一个实例，线程安全；cache 为 None 时不缓存。"""
+
+    def __init__(self, api_key, base_url=DEFAULT_BASE_URL, cache=None, timeout=60.0):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.cache = cache
+        self.timeout = timeout
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # openai 包导入较慢，第一次真正请求时才创建；之后所有请求共用它的 HTTP 连接池
+        with self._lock:
+            if self._client is None:
+                from openai import OpenAI
+                self._client = OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.timeout)
+            return self._client
+
+    def stream(self, model, prompt, system_prompt=SYSTEM_PROMPT):
+        """返回 (分片迭代器, 是否来自缓存)。新请求完整收完后才写入缓存，中途出错或被打断的不缓存。"""
+        key = make_coach_key(self.base_url, model, prompt, system_prompt)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            return replay_chunks(cached), True
+        return self._request(key, model, prompt, system_prompt), False
+
+    def _request(self, key, model, prompt, system_prompt):
+        stream = self.client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            stream=True,
+            stream_options={"include_usage": True}  # 最后一个分片带 token 用量，用于统计
+        )
+        reasoning, content, usage = [], [], None
+        try:
+            for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    details = getattr(chunk.usage, "completion_tokens_details", None)
+                    usage = {
+                        "completion_tokens": chunk.usage.completion_tokens or 0,
+                        "reasoning_tokens": getattr(details, "reasoning_tokens", None) or 0,
+                    }
+                if chunk.choices:
+                    delta = chunk.choices[0].delta
+                    reasoning.append(getattr(delta, "reasoning_content", None) or "")
+                    content.append(delta.content or "")
+                yield chunk
+        finally:
+            # 页面被打断时也把连接还给连接池
+            stream.close()
+        if self.cache is not None and any(content):
+            self.cache.put(key, {"reasoning": "".join(reasoning), "content": "".join(content), "usage": usage})
+
+    def stats(self):
+        return self.cache.stats() if self.cache is not None else {"hits": 0, "misses": 0, "size": 0}
+
+
+def make_coach_cache(max_entries=128, max_age_seconds=3600):
+    # 只放内存：回答和当时的版本 / 数据有关，不值得跨重启保存
+    return ResultCache(path=None, max_entries=max_entries, max_age_seconds=max_age_seconds)
@@ -0,0 +1,200 @@
+# 本地 AI 桩服务：模拟 DeepSeek / OpenAI 兼容的流式接口，按设定的速度吐出固定的思考过程和回答
+#
+# 用法：
+#   python coach_stub.py serve --port 8766 --ttft-ms 400 --tokens-per-second 40
+#   TFT_COACH_BASE_URL=http://127.0.0.1:8766 streamlit run app.py      # 页面走桩服务，无需密钥和网络
+#   python coach_stub.py load --concurrency 16 --requests 64              # 并发压测流式读取
+#
+# 接口：POST /chat/completions (或 /v1/chat/completions)，stream=true 时按 SSE 逐片返回；
+# 模型名含 reasoner 时先输出思考过程 (reasoning_content)，与 deepseek-reasoner 一致。
+import argparse
+import json
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from coach import CoachBackend
+from instrumentation import StreamStats, latency_percentiles
+
+CANNED_REASONING = (
+    "先看成功率和预期花费：成功率不到一半，说明这点钱梭哈大概率搜不齐。"
+    "再看卡池：同名卡外面被拿了几张，同费卡被别人清了一些，单格概率变化不大。"
+    "结合等级判断阵容阶数，这个等级 D 这个费用是正常节奏，问题在于钱不够。"
+)
+CANNED_ANSWER = (
+    "**处境：** 不算天胡，也没到绝望。\n\n"
+    "**建议：** 先别梭哈，慢 D 保利息，等下一回合多拿一轮收入再决定；"
+    "如果血量告急，就 D 到 10 块钱停手，搜不到就转低费过渡。"
+)
+
+
+def _tokens(text):
+    # 按两个字一个 token 切分，近似中文的 token 粒度
+    return [text[i:i + 2] for i in range(0, len(text), 2)]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    ttft = 0.3  # 首字延迟 (秒)，由 make_stub_server 绑定
+    tokens_per_second = 50.0
+    verbose = False
+
+    def _json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _event(self, body):
+        self.wfile.write(b"data: " + json.dumps(body, ensure_ascii=False).encode("utf-8") + b"\n\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        if self.path.rstrip("/") not in ("/chat/completions", "/v1/chat/completions"):
+            self._json(404, {"error": {"message": "未知路径"}})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError as e:
+            self._json(400, {"error": {"message": f"JSON 解析失败: {e}"}})
+            return
+        model = request.get("model", "deepseek-chat")
+        reasoning = _tokens(CANNED_REASONING) if "reasoner" in model else []
+        answer = _tokens(CANNED_ANSWER)
+        usage = {
+            "prompt_tokens": sum(len(m.get("content", "")) for m in request.get("messages", [])) // 2,
+            "completion_tokens": len(reasoning) + len(answer),
+            "completion_tokens_details": {"reasoning_tokens": len(reasoning)},
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        base = {"id": f"stub-{uuid.uuid4().hex[:12]}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": model}
+
+        time.sleep(self.ttft)
+        if not request.get("stream"):
+            self._json(200, {**base, "object": "chat.completion", "usage": usage, "choices": [{
+                "index": 0, "finish_reason": "stop",
+                "message": {"role": "assistant", "content": CANNED_ANSWER, "reasoning_content": "".join(reasoning) or None},
+            }]})
+            return
+
+        # SSE：HTTP/1.0 下不写 Content-Length，发完关闭连接即表示结束
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        interval = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        try:
+            for field, pieces in (("reasoning_content", reasoning), ("content", answer)):
+                for piece in pieces:
+                    self._event({**base, "choices": [{"index": 0, "delta": {field: piece}, "finish_reason": None}]})
+                    time.sleep(interval)
+            self._event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            if (request.get("stream_options") or {}).get("include_usage"):
+                self._event({**base, "choices": [], "usage": usage})
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 客户端中途断开 (页面被打断)
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # 压测时大量并发建连，默认的 5 会丢连接请求，客户端要等 1 秒重传
+
+
+def make_stub_server(host="127.0.0.1", port=8766, ttft_ms=300, tokens_per_second=50.0, verbose=False):
+    handler = type("BoundStubHandler", (StubHandler,), {
+        "ttft": ttft_ms / 1000, "tokens_per_second": tokens_per_second, "verbose": verbose,
+    })
+    return StubServer((host, port), handler)
+
+
+def serve(args):
+    server = make_stub_server(args.host, args.port, args.ttft_ms, args.tokens_per_second, args.verbose)
+    sys.stderr.write(f"AI 桩服务已启动: http://{args.host}:{server.server_port} (首字 {args.ttft_ms} ms, {args.tokens_per_second} token/s)\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def load(args):
+    """并发发起流式请求 (不走缓存)，统计首字延迟、总耗时和每秒 token 数。"""
+    server = None
+    url = args.url
+    if not url:
+        # 没给地址就在本进程里起一个桩服务
+        server = make_stub_server(port=0, ttft_ms=args.ttft_ms, tokens_per_second=args.tokens_per_second)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}"
+    coach = CoachBackend("local-stub", base_url=url, cache=None)
+    coach.client  # 先建好客户端 (导入 openai 约 1 秒)，不算进延迟
+
+    def one(i):
+        stats = StreamStats()
+        chunks, _ = coach.stream(args.model, f"压测请求 {i}")
+        for chunk in chunks:
+            stats.on_chunk(chunk)
+        stats.finish()
+        return stats.metrics()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one, range(args.requests)))
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        server.shutdown()
+
+    def seconds(name):
+        return [r[name] / 1000 for r in results if r[name] is not None]
+
+    print(json.dumps({
+        "url": url,
+        "model": args.model,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "seconds": round(elapsed, 3),
+        "ttft_ms": latency_percentiles(seconds("llm_ttft_ms")),
+        "total_ms": latency_percentiles(seconds("llm_total_ms")),
+        "tokens_per_second_mean": round(sum(r["llm_tokens_per_second"] or 0 for r in results) / len(results), 1),
+        "token_counts_exact": all(r["llm_token_counts_exact"] for r in results),
+    }, ensure_ascii=False, indent=2))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地 AI 桩服务 (OpenAI 兼容流式接口)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, func, help_text in (("serve", serve, "启动桩服务"), ("load", load, "并发压测流式读取")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--ttft-ms", type=float, default=300, help="首字延迟 (毫秒)")
+        p.add_argument("--tokens-per-second", type=float, default=50.0, help="每秒吐出的 token 数，0 为不限速")
+        p.set_defaults(func=func)
+        if name == "serve":
+            p.add_argument("--host", default="127.0.0.1")
+            p.add_argument("--port", type=int, default=8766)
+            p.add_argument("--verbose", action="store_true", help="打印每个请求的访问日志")
+        else:
+            p.add_argument("--url", default=None, help="桩服务地址，不填则在本进程内启动一个")
+            p.add_argument("--model", default="deepseek-reasoner")
+            p.add_argument("--concurrency", type=int, default=16)
+            p.add_argument("--requests", type=int, default=64)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# 性能埋点：每次“开始模拟”按阶段计时，AI 流式输出统计首字延迟 / 生成速度，结果写成 JSON 行日志
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+PERF_LOGGER_NAME = "tft_calculator.perf"
+DEFAULT_LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perf_log.jsonl")
+# 日志写满就轮转：perf_log.jsonl.1 ~ .N，最多占用约 (N + 1) × LOG_MAX_BYTES
+LOG_MAX_BYTES = 5 * 2**20
+LOG_BACKUP_COUNT = 3
+
+_setup_lock = threading.Lock()
+
+
+def get_perf_logger(path=None):
+    """每条日志是一行 JSON，方便用 jq / pandas 汇总。路径可用环境变量 TFT_PERF_LOG 覆盖，设为空则只走 logging。"""
+    logger = logging.getLogger(PERF_LOGGER_NAME)
+    with _setup_lock:
+        if not getattr(logger, "_tft_configured", False):
+            path = path or os.environ.get("TFT_PERF_LOG", DEFAULT_LOG_PATH)
+            if path:
+                try:
+                    handler = logging.handlers.RotatingFileHandler(
+                        path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+                    )
+                except OSError:
+                    # 目录不存在或没有写权限：不写文件，只走 logging，不能让计算因为日志失败
+                    pass
+                else:
+                    handler.setFormatter(logging.Formatter("%(message)s"))
+                    logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger._tft_configured = True
+    return logger
+
+
+def _write(record, logger=None):
+    (logger or get_perf_logger()).info(json.dumps(record, ensure_ascii=False, default=str))
+    return record
+
+
+def _now():
+    return time.strftime("%Y-%m-%dT%H:%M:%S%z")
+
+
+def _percentile(sorted_values, q):
+    # 与 np.percentile 默认的线性插值一致
+    pos = (len(sorted_values) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+
+def latency_percentiles(samples):
+    """延迟 (秒) 的分位数，单位毫秒；不依赖 NumPy，桩服务压测也能用。"""
+    if not samples:
+        return {"count": 0}
+    ms = sorted(s * 1000 for s in samples)
+    p50, p90, p99 = (_percentile(ms, q) for q in (50, 90, 99))
+    return {"count": len(ms), "p50": round(p50, 2), "p90": round(p90, 2), "p99": round(p99, 2), "max": round(ms[-1], 2)}
+
+
+def log_event(event, **fields):
+    """写一条不属于某次模拟的事件 (如每次 rerun 的耗时)。"""
+    return _write({"event": event, "ts": _now(), **fields})
+
+
+class RunTimer:
+    """记录一次运行的各阶段耗时 (毫秒) 和附加指标。"""
+
+    def __init__(self, event="simulation_run", **context):
+        self.event = event
+        self.run_id = uuid.uuid4().hex[:12]
+        self.context = context
+        self.stages = {}
+        self.metrics = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            # 同名阶段多次出现时累加 (如重要性抽样重跑)
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def record(self, **metrics):
+        self.metrics.update(metrics)
+
+    def as_record(self):
+        return {
+            "event": self.event,
+            "run_id": self.run_id,
+            "ts": _now(),
+            "total_ms": round((time.perf_counter() - self._start) * 1000, 2),
+            "stages_ms": {name: round(ms, 2) for name, ms in self.stages.items()},
+            **self.context,
+            **self.metrics,
+        }
+
+    def log(self, logger=None):
+        return _write(self.as_record(), logger)
+
+
+class StreamStats:
+    """统计一次流式回答：首字延迟、思考/正文 token 数、每秒 token 数。
+
+    服务端返回 usage (stream_options.include_usage) 时用真实 token 数，否则按收到的分片数近似。
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token_at = None
+        self.first_answer_at = None
+        self.end = None
+        self.reasoning_chunks = 0
+        self.answer_chunks = 0
+        self.usage = None
+
+    def on_chunk(self, chunk):
+        now = time.perf_counter()
+        if getattr(chunk, "usage", None):
+            self.usage = chunk.usage
+        if not chunk.choices:
+            return
+        delta = chunk.choices[0].delta
+        if getattr(delta, "reasoning_content", None):
+            self.reasoning_chunks += 1
+            self.first_token_at = self.first_token_at or now
+        if delta.content:
+            self.answer_chunks += 1
+            self.first_token_at = self.first_token_at or now
+            self.first_answer_at = self.first_answer_at or now
+
+    def finish(self):
+        self.end = time.perf_counter()
+
+    def metrics(self):
+        end = self.end or time.perf_counter()
+        reasoning_tokens, answer_tokens, exact = self.reasoning_chunks, self.answer_chunks, False
+        if self.usage is not None:
+            details = getattr(self.usage, "completion_tokens_details", None)
+            reasoning_tokens = getattr(details, "reasoning_tokens", None) or 0
+            answer_tokens = (self.usage.completion_tokens or 0) - reasoning_tokens
+            exact = True
+        generating = end - self.first_token_at if self.first_token_at else 0
+        total_tokens = reasoning_tokens + answer_tokens
+        return {
+            "llm_ttft_ms": round((self.first_token_at - self.start) * 1000, 1) if self.first_token_at else None,
+            "llm_first_answer_ms": round((self.first_answer_at - self.start) * 1000, 1) if self.first_answer_at else None,
+            "llm_total_ms": round((end - self.start) * 1000, 1),
+            "llm_reasoning_tokens": reasoning_tokens,
+            "llm_answer_tokens": answer_tokens,
+            "llm_tokens_per_second": round(total_tokens / generating, 1) if generating > 0 else None,
+            "llm_token_counts_exact": exact,
+        }
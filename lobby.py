@@ -0,0 +1,241 @@
+# 全场卡池模拟：8 名玩家共用一个卡池，多回合内同时 D 牌买卡
+#
+# 卡池按费用分层，每层是 [对局数, 可刷出的卡种] 的计数数组，很多局一起向量化推进。
+# S16 没解锁的任务卡不进卡池 (与单人模型的 locked_types 一致)；天选格子不在这里模拟。
+# 没买下的卡会回到卡池、不改变状态，所以每个格子只需判断是否刷到“有人想要的卡”。
+#
+# 用法：python lobby.py --season S16 --level 8 --gold 50 --target-cost 4 --copies 3 --contested 2
+#       --opponent 可重复，写打法名 (all_in / slow_roll / reroll) 或 等级:金币:停手金币，对手按顺序轮流采用
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from policy import income
+from season_config import SEASON_CONFIG, resolve_season, sample_alias
+
+NUM_PLAYERS = 8
+SHOP_SLOTS = 5
+
+# 对手打法：等级、初始金币、D 到多少金币停手 (0 = 梭哈，50 = 慢 D 吃满利息)
+OPPONENT_STRATEGIES = {
+    "all_in": {"level": 8, "gold": 50, "roll_to": 0},
+    "slow_roll": {"level": 7, "gold": 60, "roll_to": 50},
+    "reroll": {"level": 6, "gold": 50, "roll_to": 30},
+}
+
+
+def resolve_strategies(season_data, strategies=None):
+    """strategies 里每项是 OPPONENT_STRATEGIES 的打法名或 {level, gold, roll_to}；None 为全部预设打法。
+
+    返回打法 dict 的列表，不合法时抛出 ValueError。
+    """
+    if strategies is None:
+        strategies = list(OPPONENT_STRATEGIES)
+    if not strategies:
+        raise ValueError("至少要有一种对手打法")
+    resolved = []
+    for strategy in strategies:
+        if isinstance(strategy, str):
+            if strategy not in OPPONENT_STRATEGIES:
+                raise ValueError(f"未知对手打法: {strategy}，可选: {', '.join(OPPONENT_STRATEGIES)}")
+            strategy = OPPONENT_STRATEGIES[strategy]
+        missing = [key for key in ("level", "gold", "roll_to") if key not in strategy]
+        if missing:
+            raise ValueError(f"对手打法缺少字段 {', '.join(missing)}")
+        if strategy["level"] not in season_data["SAMPLING"]:
+            raise ValueError(f"对手等级 {strategy['level']} 不在该赛季的等级范围内")
+        if strategy["gold"] < 0 or strategy["roll_to"] < 0:
+            raise ValueError("对手金币和停手金币不能为负数")
+        resolved.append({key: int(strategy[key]) for key in ("level", "gold", "roll_to")})
+    return resolved
+
+
+def make_lobby(season_data, level, target_cost, gold, target_copies, contested=2, locked_types_count=0,
+               roll_to=0, opponent_copies_held=2, opponent_copies_wanted=3, strategies=None):
+    """构造一局：0 号是自己，1..contested 号和自己抢同一张卡，其余对手各玩各的。
+
+    strategies 见 resolve_strategies，按顺序轮流分给 1..7 号对手。
+    玩家是 dict：level / gold / roll_to / wants [(费用, 卡种编号, 还要几张)] / holds [(费用, 卡种编号, 已有几张)]。
+    返回 (players, locked)，locked[费用] = 该费用不在卡池里的任务卡种数。
+    """
+    if not 0 <= contested < NUM_PLAYERS:
+        raise ValueError(f"抢卡对手数必须在 0 ~ {NUM_PLAYERS - 1} 之间")
+    strategies = resolve_strategies(season_data, strategies)
+    locked = {cost: season_data.get("DEFAULT_LOCKED", {}).get(cost, 0) for cost in season_data["POOL_SIZES"]}
+    locked[target_cost] = locked_types_count
+    active_types = {cost: season_data["DISTINCT_CHAMPS"][cost] - locked[cost] for cost in locked}
+
+    players = [{"level": level, "gold": gold, "roll_to": roll_to, "wants": [(target_cost, 0, target_copies)], "holds": []}]
+    # 不抢目标卡的对手可用的卡种：目标费用的 0 号卡种留给目标卡
+    free_types = {cost: list(range(1 if cost == target_cost else 0, active_types[cost])) for cost in locked}
+    next_type = {cost: 0 for cost in locked}
+    for i in range(1, NUM_PLAYERS):
+        strategy = strategies[(i - 1) % len(strategies)]
+        if i <= contested:
+            cost, type_idx = target_cost, 0
+        else:
+            # 主 C 费用随打法变化，轮流占用各费用的不同卡种；
+            # 卡种不够分时几个对手共用同一种 (仍不会占到目标卡)
+            cost = min(max(strategy["level"] - 4, 1), 5) if i % 2 else target_cost
+            if not free_types[cost]:
+                raise ValueError(f"{cost} 费卡池里除了目标卡没有别的卡种，无法安排不抢卡的对手")
+            type_idx = free_types[cost][next_type[cost] % len(free_types[cost])]
+            next_type[cost] += 1
+        players.append({
+            **strategy,
+            "wants": [(cost, type_idx, opponent_copies_wanted)],
+            "holds": [(cost, type_idx, opponent_copies_held)],
+        })
+    return players, locked
+
+
+def simulate_lobbies(season_data, players, locked, num_lobbies, rounds=3, rng=None):
+    """模拟 num_lobbies 局，返回每名玩家的 (是否买齐[局], 花费[局])。
+
+    每一步所有还在 D 的玩家按随机顺序各 D 一次，卡池在玩家之间实时变化。
+    """
+    rng = np.random.default_rng(rng)
+    costs = sorted(season_data["POOL_SIZES"])
+    tier_of = {cost: i for i, cost in enumerate(costs)}
+    n = num_lobbies
+
+    # 卡池：每个费用 [局, 卡种]，玩家手里已有的卡先从卡池拿走
+    pools = {
+        cost: np.full((n, season_data["DISTINCT_CHAMPS"][cost] - locked.get(cost, 0)), season_data["POOL_SIZES"][cost], dtype=np.int16)
+        for cost in costs
+    }
+    for player in players:
+        for cost, type_idx, held in player["holds"]:
+            # 卡池不够时只能拿到剩下的
+            pools[cost][:, type_idx] -= np.minimum(pools[cost][:, type_idx], held)
+    totals = {cost: pools[cost].sum(axis=1) for cost in costs}
+
+    # 每个等级编译好的费用别名表 (按 costs 排列)，一个随机数抽出格子的费用
+    slot_tables = {player["level"]: season_data["SAMPLING"][player["level"]]["slot"] for player in players}
+
+    gold = [np.full(n, player["gold"], dtype=np.int32) for player in players]
+    spent = [np.zeros(n, dtype=np.int32) for _ in players]
+    need = [[np.full(n, wanted, dtype=np.int16) for _, _, wanted in player["wants"]] for player in players]
+
+    for round_idx in range(rounds):
+        if round_idx > 0:
+            for g in gold:
+                g += income(g)
+        while True:
+            rolling = []
+            for p, player in enumerate(players):
+                wants_more = np.logical_or.reduce([nd > 0 for nd in need[p]])
+                rolling.append(wants_more & (gold[p] - 2 >= player["roll_to"]) & (gold[p] >= 2))
+            if not any(r.any() for r in rolling):
+                break
+            for p in rng.permutation(len(players)):
+                active = rolling[p]
+                if not active.any():
+                    continue
+                player = players[p]
+                gold[p] -= 2 * active
+                spent[p] += 2 * active
+                u = rng.random((n, SHOP_SLOTS, 2))
+                table = slot_tables[player["level"]]
+                for slot in range(SHOP_SLOTS):
+                    tier = sample_alias(table["alias_prob"], table["alias"], u[:, slot, 0])
+                    # 同一费用下想要的几种卡在 [0, 总数) 上各占一段，落在哪段就刷到哪张
+                    offsets = {}
+                    for k, (cost, type_idx, _) in enumerate(player["wants"]):
+                        count = pools[cost][:, type_idx]
+                        low = offsets.get(cost, 0)
+                        offsets[cost] = low + count
+                        x = u[:, slot, 1] * totals[cost]
+                        hit = active & (tier == tier_of[cost]) & (x >= low) & (x < low + count)
+                        buy = hit & (need[p][k] > 0) & (gold[p] >= cost)
+                        if not buy.any():
+                            continue
+                        pools[cost][:, type_idx] -= buy
+                        totals[cost] -= buy
+                        need[p][k] -= buy
+                        gold[p] -= cost * buy
+                        spent[p] += cost * buy
+
+    success = [np.logical_and.reduce([nd <= 0 for nd in need[p]]) for p in range(len(players))]
+    return success, spent
+
+
+def compare_contested(season_data, level, target_cost, gold, target_copies, contested=2, locked_types_count=0,
+                      rounds=3, num_lobbies=10000, roll_to=0, seed=None, batch_size=2000, strategies=None):
+    """同一套随机数下对比：contested 名对手抢同一张卡 vs 没人抢，返回自己的成功率和花费。
+
+    strategies 为对手打法 (见 resolve_strategies)；输入不合法时抛出 ValueError。
+    """
+    seed_seq = np.random.SeedSequence(seed)
+    batch_seeds = seed_seq.spawn((num_lobbies + batch_size - 1) // batch_size)
+    report = {}
+    start = time.perf_counter()
+    for name, k in (("contested", contested), ("uncontested", 0)):
+        players, locked = make_lobby(
+            season_data, level, target_cost, gold, target_copies, k, locked_types_count, roll_to, strategies=strategies
+        )
+        successes, costs = [], []
+        for i, batch_seed in enumerate(batch_seeds):
+            size = min(batch_size, num_lobbies - i * batch_size)
+            success, spent = simulate_lobbies(season_data, players, locked, size, rounds, rng=np.random.default_rng(batch_seed))
+            successes.append(success[0])
+            costs.append(spent[0])
+        success = np.concatenate(successes)
+        cost = np.concatenate(costs)
+        report[name] = {
+            "opponents_on_target": k,
+            "success_rate": float(success.mean()),
+            "avg_cost": float(cost[success].mean()) if success.any() else 0.0,
+        }
+    elapsed = time.perf_counter() - start
+    report["contested_penalty"] = report["uncontested"]["success_rate"] - report["contested"]["success_rate"]
+    report["lobbies_per_minute"] = round(2 * num_lobbies / elapsed * 60) if elapsed > 0 else None
+    return report
+
+
+def _parse_strategy(text):
+    if text in OPPONENT_STRATEGIES:
+        return text
+    try:
+        level, gold, roll_to = (int(x) for x in text.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"应为 {' / '.join(OPPONENT_STRATEGIES)} 或 等级:金币:停手金币") from None
+    return {"level": level, "gold": gold, "roll_to": roll_to}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="全场 8 人共享卡池模拟：有人抢卡 vs 没人抢卡")
+    parser.add_argument("--season", default="S16", help="赛季名称或唯一前缀")
+    parser.add_argument("--level", type=int, default=8)
+    parser.add_argument("--gold", type=int, default=50)
+    parser.add_argument("--target-cost", type=int, default=4)
+    parser.add_argument("--copies", type=int, default=3, help="还缺几张")
+    parser.add_argument("--contested", type=int, default=2, help="和自己抢同一张卡的对手数 (0-7)")
+    parser.add_argument("--locked", type=int, default=None, help="目标费用未解锁的任务卡种数 (默认取赛季设定)")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--lobbies", type=int, default=10000)
+    parser.add_argument("--roll-to", type=int, default=0, help="自己 D 到多少金币停手")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--opponent", action="append", default=None, type=_parse_strategy,
+                        help="对手打法名或 等级:金币:停手金币，可重复 (默认全部预设打法)")
+    args = parser.parse_args(argv)
+
+    try:
+        season_name = resolve_season(args.season)
+        season_data = SEASON_CONFIG[season_name]
+        locked = args.locked if args.locked is not None else season_data.get("DEFAULT_LOCKED", {}).get(args.target_cost, 0)
+        report = compare_contested(
+            season_data, args.level, args.target_cost, args.gold, args.copies, args.contested,
+            locked, args.rounds, args.lobbies, args.roll_to, args.seed, strategies=args.opponent,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    print(json.dumps({"season": season_name, **report}, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+# 预计算查表：离线算好整张输入网格的成功率和预期花费，运行时 memory-map 后 O(1) 查询
+#
+# 生成表格：python lookup_table.py [输出路径]
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from season_config import SEASON_CONFIG, raw_season, slot_prob
+
+TABLE_MAGIC = b"TFTLUT02"
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenario_table.bin")
+
+# --- 网格范围 (与侧边栏输入对应) ---
+LEVELS = list(range(3, 11))
+MAX_GOLD = 200
+MAX_COPIES = 9
+MAX_TARGET_TAKEN = 4
+OTHER_TAKEN_STEP = 5
+MAX_OTHER_TAKEN = 60
+
+# 成功率存 float32：极小的成功率也不会被量化成 0；NaN 表示卡池输入不合法，查询时交给实时计算去报错
+PROB_DTYPE = np.dtype(np.float32)
+# 平均花费不超过金币上限，取整后存
+COST_DTYPE = np.dtype(np.uint8)
+if MAX_GOLD > np.iinfo(COST_DTYPE).max:
+    raise ValueError(f"MAX_GOLD={MAX_GOLD} 超出花费列 {COST_DTYPE} 的范围")
+
+
+def config_fingerprint(season_config):
+    # 赛季数据一改，旧表自动作废
+    # 只看原始数据：编译出的抽样表由原始数据决定
+    raw = {name: raw_season(season_data) for name, season_data in season_config.items()}
+    text = json.dumps(raw, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _season_layout(season_data):
+    # (费用, 锁定数) 展平成一维：每个费用占 DEFAULT_LOCKED + 1 格
+    cost_offsets = {}
+    n = 0
+    for cost in sorted(season_data["POOL_SIZES"]):
+        cost_offsets[cost] = n
+        n += season_data.get("DEFAULT_LOCKED", {}).get(cost, 0) + 1
+    headliner_states = 2 if season_data.get("HEADLINER_RATES") else 1
+    shape = (
+        len(LEVELS), n, MAX_TARGET_TAKEN + 1, MAX_OTHER_TAKEN // OTHER_TAKEN_STEP + 1,
+        headliner_states, MAX_COPIES, MAX_GOLD + 1,
+    )
+    return cost_offsets, shape
+
+
+# --- 离线计算：按金币从小到大的反向递推 ---
+def roll_outcomes(prob_cost_hit, prob_hl_cost_hit, hl_active, target_cost, remaining, real_time_prob):
+    """一次刷新的所有结局：[(多买张数, 买卡花费, 概率[批次, 刷新前金币, 已买张数])]。"""
+    batch, copies_len = remaining.shape
+    gold_after_roll = np.arange(MAX_GOLD + 1)[None, :, None] - 2
+    hl_price = target_cost * 3
+
+    def shifted(arr, k):
+        # 已买 c 张时再买 k 张后的值 (超出范围补 0)
+        out = np.zeros_like(arr)
+        out[:, :copies_len - k] = arr[:, k:]
+        return out
+
+    # weights[k] = 普通格子买到 k 张的概率
+    weights = [np.ones((batch, MAX_GOLD + 1, copies_len))]
+    for _ in range(4 if hl_active else 5):
+        if prob_cost_hit <= 0:
+            break
+        weights.append(np.zeros_like(weights[0]))
+        for k in range(len(weights) - 2, -1, -1):
+            affordable = gold_after_roll - k * target_cost >= target_cost
+            b = prob_cost_hit * shifted(real_time_prob, k)[:, None, :] * affordable
+            moved = weights[k] * b
+            weights[k] = weights[k] - moved
+            weights[k + 1] = weights[k + 1] + moved
+
+    outcomes = []
+    for k, w in enumerate(weights):
+        if hl_active and prob_hl_cost_hit > 0:
+            affordable = gold_after_roll - k * target_cost >= hl_price
+            hl_ok = (shifted(remaining, k) >= 3)
+            b = prob_hl_cost_hit * (shifted(real_time_prob, k) * hl_ok)[:, None, :] * affordable
+            outcomes.append((k + 3, k * target_cost + hl_price, w * b))
+            w = w * (1 - b)
+        outcomes.append((k, k * target_cost, w))
+    return outcomes
+
+
+def solve_grid(season_data, level, target_cost, locked_types_count, target_taken, other_taken_list, has_headliner):
+    """对一批 other_taken 同时递推，返回 (成功率, 成功时平均花费)，形状 [批次, 目标张数, 金币]。"""
+    prob_cost_hit = slot_prob(season_data, level, target_cost)
+    prob_hl_cost_hit = slot_prob(season_data, level, target_cost, headliner=True)
+    has_hl_mechanic = bool(season_data.get("HEADLINER_RATES"))
+
+    one_card_total = season_data["POOL_SIZES"][target_cost]
+    total_pool_size = one_card_total * (season_data["DISTINCT_CHAMPS"][target_cost] - locked_types_count)
+    start_remaining_target = one_card_total - target_taken
+    start_pool = total_pool_size - target_taken - np.asarray(other_taken_list)
+
+    batch = len(other_taken_list)
+    copies_axis = np.arange(start_remaining_target + 1)
+    remaining = np.broadcast_to(start_remaining_target - copies_axis, (batch, copies_axis.size)).copy()
+    real_time_prob = remaining / np.maximum(start_pool[:, None] - copies_axis, 1)
+
+    # 刷新相位：有天选时每 4 次出一次天选格子，需要记住 rolls_count % 4
+    phases = 4 if (has_hl_mechanic and has_headliner) else 1
+    outcomes_by_type = {
+        hl: roll_outcomes(prob_cost_hit, prob_hl_cost_hit, hl, target_cost, remaining, real_time_prob)
+        for hl in {has_hl_mechanic and (not has_headliner or p == 3) for p in range(phases)}
+    }
+
+    targets = np.arange(1, MAX_COPIES + 1)
+    reached = copies_axis[None, :] >= targets[:, None]  # [目标张数, 已买张数]
+    # value = 成功概率，spend = E[之后花费 * 成功]
+    value = np.zeros((phases, batch, MAX_COPIES, MAX_GOLD + 1, copies_axis.size))
+    value[:] = reached[None, None, :, None, :]
+    spend = np.zeros_like(value)
+
+    for gold in range(2, MAX_GOLD + 1):
+        for p in range(phases):
+            hl_active = has_hl_mechanic and (not has_headliner or (p + 1) % 4 == 0)
+            next_p = (p + 1) % phases
+            v = np.zeros((batch, MAX_COPIES, copies_axis.size))
+            s = np.zeros_like(v)
+            for dc, spent, w in outcomes_by_type[hl_active]:
+                gold_next = gold - 2 - spent
+                if gold_next < 0:
+                    continue
+                cidx = np.minimum(copies_axis + dc, copies_axis.size - 1)
+                wg = w[:, gold, None, :]
+                v_next = value[next_p, :, :, gold_next][:, :, cidx]
+                s_next = spend[next_p, :, :, gold_next][:, :, cidx]
+                v += wg * v_next
+                s += wg * ((2 + spent) * v_next + s_next)
+            value[p, :, :, gold] = np.where(reached, 1.0, v)
+            spend[p, :, :, gold] = np.where(reached, 0.0, s)
+
+    success = value[0, :, :, :, 0]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_cost = np.where(success > 0, spend[0, :, :, :, 0] / success, 0.0)
+    valid = (start_remaining_target > 0) & (start_pool > 0)
+    return success, avg_cost, valid
+
+
+def sweep_levels(season_data, target_cost, target_copies, target_taken, other_taken,
+                 locked_types_count=0, has_headliner=False, levels=LEVELS):
+    """敏感性分析：每个等级一次递推，得到 0~MAX_GOLD 每个金币预算下的成功率和平均花费。
+
+    返回 {等级: (成功率[金币], 成功时平均花费[金币])}。
+    """
+    curves = {}
+    for level in levels:
+        success, avg_cost, _ = solve_grid(
+            season_data, level, target_cost, locked_types_count, target_taken, [other_taken], has_headliner
+        )
+        curves[level] = (success[0, target_copies - 1], avg_cost[0, target_copies - 1])
+    return curves
+
+
+def build_table(path=DEFAULT_TABLE_PATH, season_config=SEASON_CONFIG, verbose=True):
+    header = {"fingerprint": config_fingerprint(season_config), "seasons": {}}
+    blocks = []
+    offset = 0
+    other_taken_list = list(range(0, MAX_OTHER_TAKEN + 1, OTHER_TAKEN_STEP))
+    t0 = time.time()
+
+    for season_name, season_data in season_config.items():
+        cost_offsets, shape = _season_layout(season_data)
+        prob = np.full(shape, np.nan, dtype=PROB_DTYPE)
+        cost = np.zeros(shape, dtype=COST_DTYPE)
+        for li, level in enumerate(LEVELS):
+            for target_cost, co in cost_offsets.items():
+                for locked in range(season_data.get("DEFAULT_LOCKED", {}).get(target_cost, 0) + 1):
+                    if season_data["DISTINCT_CHAMPS"][target_cost] - locked <= 0:
+                        continue
+                    for target_taken in range(MAX_TARGET_TAKEN + 1):
+                        for hi in range(shape[4]):
+                            success, avg_cost, valid = solve_grid(
+                                season_data, level, target_cost, locked, target_taken, other_taken_list, bool(hi)
+                            )
+                            cell = prob[li, co + locked, target_taken, :, hi]
+                            cell[valid] = np.clip(success[valid], 0, 1)
+                            cost[li, co + locked, target_taken, :, hi] = np.rint(np.clip(avg_cost, 0, MAX_GOLD))
+            if verbose:
+                print(f"{season_name} Lv{level} 完成 ({time.time() - t0:.0f}s)")
+        header["seasons"][season_name] = {
+            "shape": list(shape),
+            "cost_offsets": {str(k): v for k, v in cost_offsets.items()},
+            "prob_offset": offset,
+            "cost_offset": offset + prob.nbytes,
+        }
+        offset += prob.nbytes + cost.nbytes
+        blocks += [prob, cost]
+
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(TABLE_MAGIC)
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for block in blocks:
+            f.write(block.tobytes())
+    os.replace(tmp_path, path)
+    return path
+
+
+# --- 运行时查询 ---
+class ScenarioTable:
+    def __init__(self, path=DEFAULT_TABLE_PATH, season_config=SEASON_CONFIG):
+        self.path = path
+        self.seasons = {}
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            if f.read(len(TABLE_MAGIC)) != TABLE_MAGIC:
+                return
+            header_len = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(header_len).decode("utf-8"))
+        if header["fingerprint"] != config_fingerprint(season_config):
+            return  # 赛季数据已变，表过期，全部走实时计算
+        data_start = len(TABLE_MAGIC) + 8 + header_len
+        for name, info in header["seasons"].items():
+            shape = tuple(info["shape"])
+            # 每个费用: (在展平维度上的起点, 锁定数的取值个数)
+            bounds = sorted(info["cost_offsets"].values()) + [shape[1]]
+            cost_offsets = {
+                int(k): (v, bounds[bounds.index(v) + 1] - v) for k, v in info["cost_offsets"].items()
+            }
+            self.seasons[name] = {
+                "cost_offsets": cost_offsets,
+                "prob": np.memmap(path, dtype=PROB_DTYPE, mode="r", offset=data_start + info["prob_offset"], shape=shape),
+                "cost": np.memmap(path, dtype=COST_DTYPE, mode="r", offset=data_start + info["cost_offset"], shape=shape),
+            }
+
+    def lookup(self, season, level, target_cost, gold, target_copies, target_taken, other_taken,
+               locked_types_count=0, has_headliner=False):
+        """命中网格返回 (成功率, 成功时平均花费)，不在网格内返回 None。"""
+        table = self.seasons.get(season)
+        if table is None:
+            return None
+        if (level not in LEVELS or not 0 <= gold <= MAX_GOLD or not 1 <= target_copies <= MAX_COPIES
+                or not 0 <= target_taken <= MAX_TARGET_TAKEN or not 0 <= other_taken <= MAX_OTHER_TAKEN
+                or other_taken % OTHER_TAKEN_STEP or target_cost not in table["cost_offsets"]):
+            return None
+        cost_offset, locked_states = table["cost_offsets"][target_cost]
+        if not 0 <= locked_types_count < locked_states:
+            return None
+        hi = 1 if (has_headliner and table["prob"].shape[4] > 1) else 0
+        idx = (
+            LEVELS.index(level), cost_offset + locked_types_count, target_taken,
+            other_taken // OTHER_TAKEN_STEP, hi, target_copies - 1, gold,
+        )
+        prob = float(table["prob"][idx])
+        if np.isnan(prob):
+            return None
+        return prob, float(table["cost"][idx])
+
+
+if __name__ == "__main__":
+    out_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TABLE_PATH
+    build_table(out_path)
+    print(f"已写入 {out_path} ({os.path.getsize(out_path) / 1e6:.1f} MB)")
@@ -0,0 +1,221 @@
+# 多目标联合 D 牌：一次 D 牌同时找几张卡 (可以跨费用)，共用同一笔金币，各费用卡池分别消耗
+#
+# 分开对每张卡跑 run_simulation，等于假设每张卡都能独占全部金币，会高估成功率。
+# 每个格子仍只用一个随机数：把各目标在这一格出现的概率 (费率 × 剩余 / 同费剩余) 依次排开，
+# 落在第 j 段就是刷到第 j 个目标；只有一个目标时和 simulate_batch 用同一套判定，同种子的成败 (success 列) 逐个一致。
+# 花费不完全一致：凑齐后这里不再买，simulate_batch 会把这一次刷新剩下的格子也买下，
+# 所以同一个 trial 的花费 <= simulate_batch，只在后者多买了的 trial 上更低。
+#
+# 用法：python multi_target.py --season S16 --level 8 --gold 60 --target 4:3 --target 4:2 --target 3:2
+#       目标写成 费用:还缺几张[:场外被拿走几张]，--other-taken 4:10 表示场外被拿走的其他 4 费卡
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from season_config import SEASON_CONFIG, resolve_season, slot_prob
+from simulator import ROLL_DRAW_SHAPE, TrialResults, headliner_slot_active, prepare_params, solve_exact, summarize_result
+
+
+def prepare_targets(season_data, level, targets, other_taken=None, locked=None, has_headliner=False):
+    """targets: [{"cost", "copies", "taken"}]；other_taken / locked: {费用: 数量} (locked 缺省取赛季默认)。
+
+    返回模拟用的参数字典，输入不合法时返回错误码字符串 (与 prepare_params 相同的错误码)。
+    """
+    if level not in season_data["SAMPLING"]:
+        return "ERROR_LEVEL"
+    other_taken = other_taken or {}
+    locked = {**season_data.get("DEFAULT_LOCKED", {}), **(locked or {})}
+    tier_costs = sorted({t["cost"] for t in targets})
+    start_pool = []
+    for cost in tier_costs:
+        active_types = season_data["DISTINCT_CHAMPS"][cost] - locked.get(cost, 0)
+        in_tier = [t for t in targets if t["cost"] == cost]
+        if active_types <= 0:
+            return "ERROR_ALL_LOCKED"
+        if len(in_tier) > active_types:
+            return "ERROR_TOO_MANY_TARGETS"
+        pool = season_data["POOL_SIZES"][cost] * active_types - sum(t.get("taken", 0) for t in in_tier) - other_taken.get(cost, 0)
+        if pool <= 0:
+            return "ERROR_POOL_LIMIT"
+        start_pool.append(pool)
+    start_remaining = [season_data["POOL_SIZES"][t["cost"]] - t.get("taken", 0) for t in targets]
+    if min(start_remaining) <= 0:
+        return "ERROR_TARGET_LIMIT"
+
+    return {
+        "costs": np.array([t["cost"] for t in targets]),
+        "copies": np.array([t["copies"] for t in targets]),
+        "tier": np.array([tier_costs.index(t["cost"]) for t in targets]),
+        "slot_probs": np.array([slot_prob(season_data, level, t["cost"]) for t in targets]),
+        "hl_probs": np.array([slot_prob(season_data, level, t["cost"], headliner=True) for t in targets]),
+        "start_remaining": np.array(start_remaining),
+        "start_pool": np.array(start_pool),
+        "has_hl_mechanic": bool(season_data.get("HEADLINER_RATES")),
+        "has_headliner": has_headliner,
+    }
+
+
+def simulate_joint(params, start_gold, num_trials, rng=None):
+    """所有 trial 同步推进；返回 TrialResults：success (全部凑齐)、cost、copies_0..copies_{K-1}。"""
+    rng = np.random.default_rng(rng)
+    costs, need, tier = params["costs"], params["copies"], params["tier"]
+    k = len(costs)
+
+    out_cost = np.zeros(num_trials, dtype=np.min_scalar_type(start_gold))
+    out_copies = np.zeros((num_trials, k), dtype=np.min_scalar_type(int(params["start_remaining"].max())))
+
+    alive = np.arange(num_trials)
+    gold = np.full(num_trials, start_gold, dtype=np.int64)
+    cost_spent = np.zeros(num_trials, dtype=np.int64)
+    copies = np.zeros((num_trials, k), dtype=np.int64)
+    remaining = np.tile(params["start_remaining"], (num_trials, 1))
+    pool = np.tile(params["start_pool"], (num_trials, 1))  # [trial, 费用档]
+
+    def segments(rows, probs, per_buy):
+        # 各目标在一个格子里出现的累计概率；天选格子要求该卡剩余 >= 3
+        share = remaining[rows] / np.maximum(pool[rows][:, tier], 1)
+        if per_buy > 1:
+            share = share * (remaining[rows] >= per_buy)
+        return np.cumsum(probs * share, axis=1)
+
+    rolls_count = 0
+    keep = gold >= 2
+    while True:
+        if not keep.all():
+            done = ~keep
+            out_cost[alive[done]] = cost_spent[done]
+            out_copies[alive[done]] = copies[done]
+            alive, gold, cost_spent = alive[keep], gold[keep], cost_spent[keep]
+            copies, remaining, pool = copies[keep], remaining[keep], pool[keep]
+        if alive.size == 0:
+            break
+
+        gold -= 2
+        cost_spent += 2
+        rolls_count += 1
+        hl_active = headliner_slot_active(params, rolls_count)
+        u = rng.random((alive.size,) + ROLL_DRAW_SHAPE)
+
+        # 普通格子一次买 1 张；天选格子卡池剩余 >= 3 才出，一次 3 张、3 倍价格
+        plan = [(slot, params["slot_probs"], 1) for slot in range(4 if hl_active else 5)]
+        if hl_active and params["hl_probs"].any():
+            plan.append((5, params["hl_probs"], 3))
+        everyone = slice(None)
+        seg = segments(everyone, params["slot_probs"], 1)
+        for slot, probs, per_buy in plan:
+            if per_buy > 1:
+                seg = segments(everyone, probs, per_buy)
+            # 绝大多数格子一个目标都没刷到，只处理刷到的行
+            hits = np.flatnonzero(u[:, slot] < seg[:, -1])
+            j = (u[hits, slot, None] >= seg[hits]).sum(axis=1)
+            price = costs[j] * per_buy
+            ok = (copies[hits, j] < need[j]) & (gold[hits] >= price)
+            rows, j, price = hits[ok], j[ok], price[ok]
+            copies[rows, j] += per_buy
+            remaining[rows, j] -= per_buy
+            pool[rows, tier[j]] -= per_buy
+            gold[rows] -= price
+            cost_spent[rows] += price
+            if per_buy == 1 and rows.size:
+                seg[rows] = segments(rows, probs, 1)
+
+        keep = (gold >= 2) & (copies < need).any(axis=1)
+
+    columns = {"success": (out_copies >= need).all(axis=1), "cost": out_cost}
+    columns.update({f"copies_{j}": out_copies[:, j] for j in range(k)})
+    return TrialResults(columns)
+
+
+def standalone_success(season_data, level, start_gold, targets, other_taken=None, locked=None, has_headliner=False):
+    """每个目标单独算 (独占全部金币) 的精确成功率；同费其他目标被拿走的张数算进场外干扰。"""
+    other_taken = other_taken or {}
+    locked = {**season_data.get("DEFAULT_LOCKED", {}), **(locked or {})}
+    probs = []
+    for i, t in enumerate(targets):
+        others = other_taken.get(t["cost"], 0) + sum(o.get("taken", 0) for j, o in enumerate(targets) if j != i and o["cost"] == t["cost"])
+        params = prepare_params(season_data, level, t["cost"], t.get("taken", 0), others, locked.get(t["cost"], 0), has_headliner)
+        probs.append(None if isinstance(params, str) else summarize_result(solve_exact(params, start_gold, t["copies"]))["success_rate"])
+    return probs
+
+
+def run_joint(season_data, level, start_gold, targets, num_trials=100000, other_taken=None, locked=None,
+              has_headliner=False, seed=None):
+    """联合模拟 + 汇总，返回报告 dict；输入不合法时返回错误码字符串。"""
+    params = prepare_targets(season_data, level, targets, other_taken, locked, has_headliner)
+    if isinstance(params, str):
+        return params
+    start = time.perf_counter()
+    results = simulate_joint(params, start_gold, num_trials, rng=seed)
+    elapsed = time.perf_counter() - start
+    summary = summarize_result(results)
+    standalone = standalone_success(season_data, level, start_gold, targets, other_taken, locked, has_headliner)
+
+    per_target = []
+    for j, t in enumerate(targets):
+        found = results[f"copies_{j}"]
+        per_target.append({
+            "cost": t["cost"],
+            "copies": t["copies"],
+            "hit_rate": float((found >= t["copies"]).mean()),
+            "avg_found": float(found.mean()),
+            # 搜到 0, 1, 2 ... 张的概率
+            "found_distribution": (np.bincount(found, minlength=t["copies"] + 1) / len(found)).round(5).tolist(),
+            "standalone_success": standalone[j],
+        })
+    naive = np.prod([p for p in standalone if p is not None]) if all(p is not None for p in standalone) else None
+    return {
+        "success_rate": summary["success_rate"],
+        "ci": summary["ci"],
+        "avg_cost": summary["avg_cost"],
+        "num_trials": num_trials,
+        "targets": per_target,
+        # 各算各的再相乘 (还假设互相独立)，用来对比共用金币后的真实成功率
+        "naive_independent": None if naive is None else float(naive),
+        "trials_per_second": round(num_trials / elapsed) if elapsed > 0 else None,
+    }
+
+
+def _parse_pairs(text, names):
+    parts = [int(x) for x in text.split(":")]
+    if not 2 <= len(parts) <= len(names):
+        raise argparse.ArgumentTypeError(f"格式应为 {':'.join(names)}")
+    return dict(zip(names, parts))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多目标联合 D 牌：几张卡共用一笔金币")
+    parser.add_argument("--season", default="S16", help="赛季名称或唯一前缀")
+    parser.add_argument("--level", type=int, default=8)
+    parser.add_argument("--gold", type=int, default=50)
+    parser.add_argument("--target", action="append", required=True, type=lambda s: _parse_pairs(s, ["cost", "copies", "taken"]),
+                        help="费用:还缺几张[:场外被拿走几张]，可重复")
+    parser.add_argument("--other-taken", action="append", default=[], type=lambda s: _parse_pairs(s, ["cost", "count"]),
+                        help="费用:场外被拿走的其他同费卡张数，可重复")
+    parser.add_argument("--locked", action="append", default=[], type=lambda s: _parse_pairs(s, ["cost", "count"]),
+                        help="费用:未解锁的任务卡种数 (默认取赛季设定)，可重复")
+    parser.add_argument("--headliner", action="store_true", help="场上已有天选")
+    parser.add_argument("--trials", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    try:
+        season_name = resolve_season(args.season)
+    except ValueError as e:
+        parser.error(str(e))
+    report = run_joint(
+        SEASON_CONFIG[season_name], args.level, args.gold, args.target, args.trials,
+        other_taken={o["cost"]: o["count"] for o in args.other_taken}, locked={o["cost"]: o["count"] for o in args.locked},
+        has_headliner=args.headliner, seed=args.seed,
+    )
+    if isinstance(report, str):
+        print(json.dumps({"error": report}, ensure_ascii=False))
+        return 1
+    print(json.dumps({"season": season_name, **report}, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+# 决策引擎：未来几个回合里 D 牌 / 升级 / 存钱怎么安排，搜齐目标卡的概率最大
+#
+# 每回合开始先拿收入 (基础 5 + 利息)，然后可以买经验升一级，再一次次决定要不要继续 D。
+# 状态 = (剩余回合, 等级, 金币, 已买张数, 刷新相位)，按剩余回合从少到多递推，
+# 值函数按卡池参数缓存，同一卡池下不同金币 / 等级 / 回合数的查询共用一张表。
+#
+# 等待的代价：卡池在回合之间不变、利息又是正的，不计代价时“先存钱”几乎总是不差于“现在 D”。
+# 所以每多等一回合，成功率乘以 (1 - wait_risk)，代表这一回合里掉血出局 / 卡被别人拿走 / 阵容来不及成型的风险。
+#
+# 简化：升级按直接买满所需经验计价 (不计自然经验和已有经验)，连胜 / 连败收入不计。
+import math
+from functools import lru_cache
+
+import numpy as np
+
+from lookup_table import LEVELS, MAX_GOLD, roll_outcomes
+from season_config import SEASON_CONFIG, slot_prob
+from simulator import prepare_params
+
+BASE_INCOME = 5
+MAX_INTEREST = 5
+MAX_HORIZON = 6
+DEFAULT_WAIT_RISK = 0.15  # 每多等一回合的风险
+# 成功率相差不到这个值算打平，按 存钱 > 升级 > D 牌 选 (不让浮点误差决定动作)
+TIE_TOLERANCE = 1e-9
+# 从当前等级升到下一级所需经验 (4 金币买 4 点经验)
+XP_TO_NEXT_LEVEL = {3: 6, 4: 10, 5: 20, 6: 36, 7: 48, 8: 76, 9: 84}
+
+ACTION_LABELS = {"roll": "D 牌", "level": "升级", "save": "存钱", "done": "已搜齐"}
+
+
+def level_up_cost(level):
+    return 4 * math.ceil(XP_TO_NEXT_LEVEL[level] / 4)
+
+
+def income(gold):
+    return BASE_INCOME + np.minimum(gold // 10, MAX_INTEREST)
+
+
+@lru_cache(maxsize=16)
+def _solve_policy(season_name, target_cost, locked_types_count, target_taken, other_taken, has_headliner, target_copies,
+                  wait_risk=DEFAULT_WAIT_RISK):
+    """返回 tables[剩余回合][等级] = (value, stop, roll)，形状都是 [相位, 金币, 已买张数]。
+
+    value：回合开始 (已拿收入、还没升级) 时的最优成功率；
+    stop：本回合不再 D、进入下一回合的成功率；roll：此时再 D 一次 (之后继续最优) 的成功率。
+    """
+    season_data = SEASON_CONFIG[season_name]
+    one_card_total = season_data["POOL_SIZES"][target_cost]
+    total_pool_size = one_card_total * (season_data["DISTINCT_CHAMPS"][target_cost] - locked_types_count)
+    start_remaining = one_card_total - target_taken
+    start_pool = total_pool_size - target_taken - other_taken
+    has_hl_mechanic = bool(season_data.get("HEADLINER_RATES"))
+
+    copies_axis = np.arange(start_remaining + 1)
+    remaining = (start_remaining - copies_axis)[None, :]
+    real_time_prob = remaining / np.maximum(start_pool - copies_axis, 1)[None, :]
+    reached = copies_axis >= target_copies
+    gold_axis = np.arange(MAX_GOLD + 1)
+    gold_next_round = np.minimum(gold_axis + income(gold_axis), MAX_GOLD)
+
+    # 刷新相位：有天选时每 4 次出一次天选格子，相位跨回合保留
+    phases = 4 if (has_hl_mechanic and has_headliner) else 1
+    outcomes = {}
+    for level in LEVELS:
+        prob_cost_hit = slot_prob(season_data, level, target_cost)
+        prob_hl_cost_hit = slot_prob(season_data, level, target_cost, headliner=True)
+        outcomes[level] = {
+            hl: roll_outcomes(prob_cost_hit, prob_hl_cost_hit, hl, target_cost, remaining, real_time_prob)
+            for hl in {has_hl_mechanic and (not has_headliner or p == 3) for p in range(phases)}
+        }
+
+    shape = (phases, MAX_GOLD + 1, copies_axis.size)
+    tables = {}
+    next_value = None  # 下一回合开始时的 value (按等级)
+    for rounds_left in range(1, MAX_HORIZON + 1):
+        after_roll = {}
+        round_tables = {}
+        for level in LEVELS:
+            # 不再 D：搜齐了算成功，最后一回合没搜齐算失败，否则带着利息进入下一回合
+            if next_value is None:
+                stop = np.broadcast_to(reached, shape).astype(float)
+            else:
+                stop = np.where(reached, 1.0, (1 - wait_risk) * next_value[level][:, gold_next_round, :])
+            roll = np.zeros(shape)
+            best = stop.copy()
+            # 金币从小到大：D 一次之后金币一定变少，需要的值都已算好
+            for gold in range(2, MAX_GOLD + 1):
+                for p in range(phases):
+                    hl_active = has_hl_mechanic and (not has_headliner or (p + 1) % 4 == 0)
+                    next_p = (p + 1) % phases
+                    v = np.zeros(copies_axis.size)
+                    for dc, spent, w in outcomes[level][hl_active]:
+                        gold_after = gold - 2 - spent
+                        if gold_after < 0:
+                            continue
+                        cidx = np.minimum(copies_axis + dc, copies_axis.size - 1)
+                        v += w[0, gold] * best[next_p, gold_after, cidx]
+                    roll[p, gold] = np.where(reached, 0.0, v)
+                    best[p, gold] = np.maximum(stop[p, gold], roll[p, gold])
+            after_roll[level] = best
+            round_tables[level] = [None, stop, roll]
+
+        # 回合开始：先决定升不升级 (每回合最多一级)
+        value = {}
+        for level in LEVELS:
+            v = after_roll[level].copy()
+            if level + 1 in after_roll:
+                cost = level_up_cost(level)
+                v[:, cost:, :] = np.maximum(v[:, cost:, :], after_roll[level + 1][:, :MAX_GOLD + 1 - cost, :])
+            value[level] = v
+            round_tables[level][0] = v
+        tables[rounds_left] = {level: tuple(t) for level, t in round_tables.items()}
+        next_value = value
+    return tables
+
+
+def recommend_action(season_name, level, gold, target_cost, target_copies, target_taken, other_taken,
+                     locked_types_count=0, has_headliner=False, horizon=3, wait_risk=DEFAULT_WAIT_RISK):
+    """当前回合的最优动作及各动作的成功率，输入不合法时返回错误码字符串。
+
+    返回 {action, label, success_prob, action_probs: {roll, level, save}, roll_to, horizon, wait_risk}；
+    roll_to 是按最优策略、一直没搜到时 D 到多少金币停手；wait_risk 为每多等一回合的风险 (0 ~ 1)。
+    """
+    params = prepare_params(SEASON_CONFIG[season_name], level, target_cost, target_taken, other_taken,
+                            locked_types_count, has_headliner)
+    # 当前等级搜不到这个费用不算错误：升级之后也许就能搜了
+    if isinstance(params, str) and params != "ERROR_LEVEL":
+        return params
+    horizon = int(min(max(horizon, 1), MAX_HORIZON))
+    wait_risk = round(float(min(max(wait_risk, 0.0), 1.0)), 4)
+    gold = int(min(gold, MAX_GOLD))
+    if target_copies <= 0:
+        return {"action": "done", "label": ACTION_LABELS["done"], "success_prob": 1.0,
+                "action_probs": {}, "roll_to": None, "horizon": horizon, "wait_risk": wait_risk}
+
+    tables = _solve_policy(season_name, target_cost, locked_types_count, target_taken, other_taken,
+                           bool(has_headliner), target_copies, wait_risk)[horizon]
+    value, stop, roll = tables[level]
+    action_probs = {
+        "roll": float(roll[0, gold, 0]) if gold >= 2 else None,
+        "level": None,
+        "save": float(stop[0, gold, 0]) if horizon > 1 else None,
+    }
+    if level + 1 in tables and gold >= level_up_cost(level):
+        # 升级后本回合不能再升，接着按最优决定 D 不 D
+        _, next_stop, next_roll = tables[level + 1]
+        leveled_gold = gold - level_up_cost(level)
+        action_probs["level"] = float(max(next_stop[0, leveled_gold, 0], next_roll[0, leveled_gold, 0]))
+
+    # 同样的成功率 (差距在 TIE_TOLERANCE 以内) 优先不花钱：存钱 > 升级 > D 牌
+    candidates = [(name, p) for name in ("save", "level", "roll") if (p := action_probs[name]) is not None]
+    best_prob = max((p for _, p in candidates), default=0.0)
+    action = next((name for name, p in candidates if p >= best_prob - TIE_TOLERANCE), "save")
+    best_prob = dict(candidates).get(action, best_prob)
+
+    # 一直没搜到时，按最优策略 D 到多少金币停
+    roll_to = None
+    if action in ("roll", "level"):
+        lv, g = (level + 1, gold - level_up_cost(level)) if action == "level" else (level, gold)
+        _, lv_stop, lv_roll = tables[lv]
+        p = 0
+        while g >= 2 and lv_roll[p, g, 0] > lv_stop[p, g, 0] + TIE_TOLERANCE:
+            g -= 2
+            p = (p + 1) % lv_roll.shape[0]
+        roll_to = g
+
+    return {
+        "action": action,
+        "label": ACTION_LABELS[action],
+        "success_prob": float(best_prob),
+        "action_probs": action_probs,
+        "roll_to": roll_to,
+        "horizon": horizon,
+        "wait_risk": wait_risk,
+    }
+
+
+def describe_action(rec, level, gold):
+    """把推荐动作写成一句话 (页面和 AI 提示词共用)。"""
+    if rec["action"] == "done":
+        return "已经搜齐了"
+    if rec["action"] == "save":
+        return "本回合先存钱，不 D 也不升级"
+    if rec["action"] == "level":
+        leveled_gold = gold - level_up_cost(level)
+        text = f"先升到 {level + 1} 级 (花 {level_up_cost(level)} 金币)"
+        if rec["roll_to"] == leveled_gold:
+            return text + "，本回合不 D"
+    else:
+        text = "现在就 D"
+    if rec["roll_to"] is not None and rec["roll_to"] >= 2:
+        # 只剩这一回合时留钱不是为了利息，只是剩下的钱不够再 D 出结果
+        keep = " (留利息)" if rec["horizon"] > 1 else ""
+        return text + f"，一直没搜到就 D 到 {rec['roll_to']} 金币停手{keep}"
+    return text + "，梭哈"
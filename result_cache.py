@@ -0,0 +1,157 @@
+# 模拟结果缓存：按输入参数做 key，LRU + 过期淘汰，落盘保存 (服务重启后仍可命中)
+#
+# 落盘时每个条目单独一个文件 (目录 path 下 <key 哈希>.pkl)，写入只写这一条；
+# 启动时只扫描文件大小和时间，读到时才加载内容。太大的条目只放内存，目录总大小有上限。
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+# 缓存内容的格式版本：结果结构变了就加 1，旧条目自然不再命中，随后被淘汰
+CACHE_FORMAT_VERSION = 3
+
+
+def make_cache_key(season, season_fingerprint, level, target_cost, gold, target_copies, target_taken, other_taken,
+                   locked_types_count, has_headliner, num_trials, engine):
+    # season_fingerprint：赛季数据的指纹 (lookup_table.config_fingerprint)，改了赛季文件旧结果就不再命中
+    if engine == "exact":
+        # 精确解与模拟次数 (及自适应误差) 无关，不放进 key，换个次数也能命中
+        num_trials = None
+    return (CACHE_FORMAT_VERSION, season, season_fingerprint, level, target_cost, gold, target_copies, target_taken,
+            other_taken, locked_types_count, bool(has_headliner), num_trials, engine)
+
+
+def _entry_name(key):
+    return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:32] + ".pkl"
+
+
+class ResultCache:
+    def __init__(self, path=None, max_entries=256, max_age_seconds=7 * 24 * 3600,
+                 max_entry_bytes=16 * 2**20, max_disk_bytes=256 * 2**20):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.max_entry_bytes = max_entry_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (写入时间, value)，越靠后越新
+        self._disk = OrderedDict()  # 文件名 -> (写入时间, 字节数)，越靠后越新
+        self._lock = threading.Lock()
+        self._load()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._read(key)
+            if entry is not None and time.time() - entry[0] > self.max_age_seconds:
+                self._entries.pop(key, None)
+                self._remove(_entry_name(key))
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if _entry_name(key) in self._disk:
+                self._disk.move_to_end(_entry_name(key))
+            self._evict()
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            entry = (time.time(), value)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._write(key, entry)
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            names = {_entry_name(key) for key in self._entries} | set(self._disk)
+            return {"hits": self.hits, "misses": self.misses, "size": len(names),
+                    "disk_bytes": sum(size for _, size in self._disk.values())}
+
+    def _evict(self):
+        # 先清掉过期的，再按最近最少使用淘汰到容量以内 (内存按条数，磁盘按条数和总字节数)
+        now = time.time()
+        for key in [k for k, (ts, _) in self._entries.items() if now - ts > self.max_age_seconds]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        for name in [n for n, (ts, _) in self._disk.items() if now - ts > self.max_age_seconds]:
+            self._remove(name)
+        disk_bytes = sum(size for _, size in self._disk.values())
+        while self._disk and (len(self._disk) > self.max_entries or disk_bytes > self.max_disk_bytes):
+            name = next(iter(self._disk))
+            disk_bytes -= self._disk[name][1]
+            self._remove(name)
+
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            files = []
+            for name in os.listdir(self.path):
+                if name.endswith(".pkl"):
+                    info = os.stat(os.path.join(self.path, name))
+                    files.append((info.st_mtime, name, info.st_size))
+            # 按修改时间排序：读取时会刷新修改时间，所以就是最近使用的顺序；
+            # 过期以文件里记的写入时间为准 (get 时检查)，这里按修改时间只是尽早清理
+            for mtime, name, size in sorted(files):
+                self._disk[name] = (mtime, size)
+            self._evict()
+        except OSError:
+            # 目录不可用就只用内存
+            self.path = None
+            self._disk = OrderedDict()
+
+    def _read(self, key):
+        name = _entry_name(key)
+        if name not in self._disk:
+            return None
+        file_path = os.path.join(self.path, name)
+        try:
+            with open(file_path, "rb") as f:
+                stored_key, ts, value = pickle.load(f)
+            if stored_key != key:
+                return None
+            os.utime(file_path)
+            return ts, value
+        except Exception:
+            # 文件损坏或格式不兼容就直接丢弃
+            self._remove(name)
+            return None
+
+    def _write(self, key, entry):
+        if not self.path:
+            return
+        data = pickle.dumps((key,) + entry, protocol=pickle.HIGHEST_PROTOCOL)
+        name = _entry_name(key)
+        if len(data) > self.max_entry_bytes:
+            self._remove(name)
+            return
+        # 先写临时文件再替换，避免写一半时崩溃留下坏文件
+        file_path = os.path.join(self.path, name)
+        try:
+            with open(file_path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(file_path + ".tmp", file_path)
+        except OSError:
+            return
+        self._disk[name] = (entry[0], len(data))
+        self._disk.move_to_end(name)
+
+    def _remove(self, name):
+        if self._disk.pop(name, None) is None:
+            return
+        try:
+            os.remove(os.path.join(self.path, name))
+        except OSError:
+            pass
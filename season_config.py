@@ -0,0 +1,191 @@
+# 赛季核心数据配置 (app / 离线脚本共用)
+#
+# 每个赛季一个 seasons/*.json 文件，导入时读入、校验一次，并编译出各等级的抽样表 (所有模拟引擎共用)。
+# 加新赛季只需放一个新文件，不用改代码。文件里的费用 / 等级写成字符串键，读入后转成整数。
+import json
+import os
+
+import numpy as np
+
+SEASON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "seasons")
+# 赛季原始数据的键；SAMPLING 是编译出来的抽样表，不属于原始数据
+SEASON_KEYS = ("POOL_SIZES", "DISTINCT_CHAMPS", "DEFAULT_LOCKED", "DROP_RATES", "HEADLINER_RATES")
+REQUIRED_KEYS = ("POOL_SIZES", "DISTINCT_CHAMPS", "DROP_RATES")
+RATE_TOLERANCE = 1e-6
+
+
+class SeasonConfigError(ValueError):
+    pass
+
+
+def _int_keys(mapping, what):
+    try:
+        return {int(k): v for k, v in mapping.items()}
+    except (AttributeError, ValueError):
+        raise SeasonConfigError(f"{what} 必须是以整数为键的表") from None
+
+
+def _parse_season(raw, source):
+    """把文件内容转成 SEASON_CONFIG 里的格式并校验，出错时抛出 SeasonConfigError (带文件名)。"""
+    def fail(message):
+        raise SeasonConfigError(f"{source}: {message}")
+
+    missing = [key for key in REQUIRED_KEYS if key not in raw]
+    if "name" not in raw or missing:
+        fail(f"缺少字段 {', '.join((['name'] if 'name' not in raw else []) + missing)}")
+    try:
+        data = {key: _int_keys(raw[key], key) for key in ("POOL_SIZES", "DISTINCT_CHAMPS")}
+        data["DEFAULT_LOCKED"] = _int_keys(raw.get("DEFAULT_LOCKED", {}), "DEFAULT_LOCKED")
+        for key in ("DROP_RATES", "HEADLINER_RATES"):
+            if key in raw:
+                data[key] = {level: _int_keys(rates, f"{key}[{level}]") for level, rates in _int_keys(raw[key], key).items()}
+    except SeasonConfigError as e:
+        fail(str(e))
+
+    costs = sorted(data["POOL_SIZES"])
+    if sorted(data["DISTINCT_CHAMPS"]) != costs:
+        fail("POOL_SIZES 和 DISTINCT_CHAMPS 的费用不一致")
+    for cost in costs:
+        if not isinstance(data["POOL_SIZES"][cost], int) or data["POOL_SIZES"][cost] <= 0:
+            fail(f"{cost} 费单卡数量必须是正整数")
+        if not isinstance(data["DISTINCT_CHAMPS"][cost], int) or data["DISTINCT_CHAMPS"][cost] <= 0:
+            fail(f"{cost} 费卡种数必须是正整数")
+    for cost, locked in data["DEFAULT_LOCKED"].items():
+        if cost not in data["DISTINCT_CHAMPS"]:
+            fail(f"DEFAULT_LOCKED 里有未知费用 {cost}")
+        if not isinstance(locked, int) or not 0 <= locked <= data["DISTINCT_CHAMPS"][cost]:
+            fail(f"{cost} 费锁定卡种数 {locked} 不在 0 ~ {data['DISTINCT_CHAMPS'][cost]} 之间")
+
+    for key in ("DROP_RATES", "HEADLINER_RATES"):
+        for level, rates in data.get(key, {}).items():
+            unknown = set(rates) - set(costs)
+            if unknown:
+                fail(f"{key}[{level}] 里有未知费用 {sorted(unknown)}")
+            if any(not isinstance(p, (int, float)) or p < 0 for p in rates.values()):
+                fail(f"{key}[{level}] 的概率必须是非负数")
+            if abs(sum(rates.values()) - 1) > RATE_TOLERANCE:
+                fail(f"{key}[{level}] 的概率之和为 {sum(rates.values()):.6g}，应为 1")
+    if "HEADLINER_RATES" in data and set(data["HEADLINER_RATES"]) != set(data["DROP_RATES"]):
+        fail("HEADLINER_RATES 和 DROP_RATES 的等级不一致")
+    return raw["name"], data
+
+
+# --- 编译：每个等级一张抽样表 ---
+def alias_table(probs):
+    """Vose 别名表：一个均匀随机数 O(1) 抽出一个类别，见 sample_alias。"""
+    n = len(probs)
+    scaled = np.asarray(probs, dtype=float) * n
+    prob = np.ones(n)
+    alias = np.arange(n)
+    small = [i for i in range(n) if scaled[i] < 1]
+    large = [i for i in range(n) if scaled[i] >= 1]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        prob[s], alias[s] = scaled[s], l
+        scaled[l] -= 1 - scaled[s]
+        (small if scaled[l] < 1 else large).append(l)
+    # 剩下的只差浮点误差，概率取 1
+    return prob, alias
+
+
+def sample_alias(prob, alias, u):
+    """u 为 [0, 1) 均匀随机数 (任意形状)，返回类别下标：整数部分选格子，小数部分决定取本格还是别名。"""
+    n = len(prob)
+    scaled = np.asarray(u) * n
+    k = np.minimum(scaled.astype(np.intp), n - 1)
+    return np.where(scaled - k < prob[k], k, alias[k])
+
+
+def _compile_rates(rates, costs):
+    probs = np.array([rates.get(cost, 0.0) for cost in costs])
+    by_cost = np.zeros(costs[-1] + 1)
+    by_cost[costs] = probs
+    prob, alias = alias_table(probs)
+    return {"probs": probs, "by_cost": by_cost, "alias_prob": prob, "alias": alias}
+
+
+def compile_season(data):
+    """SAMPLING[等级] = {costs, slot, headliner}；slot / headliner 各含
+    probs (按 costs 排列)、by_cost (按费用下标)、alias_prob / alias (别名表)。"""
+    costs = np.array(sorted(data["POOL_SIZES"]))
+    headliner = data.get("HEADLINER_RATES", {})
+    return {
+        level: {
+            "costs": costs,
+            "slot": _compile_rates(rates, costs),
+            "headliner": _compile_rates(headliner[level], costs) if headliner else None,
+        }
+        for level, rates in data["DROP_RATES"].items()
+    }
+
+
+def slot_prob(season_data, level, cost, headliner=False):
+    """某等级一个普通格子 (或天选格子) 刷出该费用的概率；等级或费用不存在时为 0。"""
+    tables = season_data["SAMPLING"].get(level)
+    rates = tables and tables["headliner" if headliner else "slot"]
+    if not rates or not 0 <= cost < len(rates["by_cost"]):
+        return 0.0
+    return float(rates["by_cost"][cost])
+
+
+def raw_season(season_data):
+    return {key: season_data[key] for key in SEASON_KEYS if key in season_data}
+
+
+def dump_season(name, data, order=None):
+    """把赛季数据写成 seasons/*.json 的格式 (每个等级一行，方便手改和看 diff)。"""
+    def row(mapping):
+        return json.dumps({str(k): v for k, v in mapping.items()}, ensure_ascii=False)
+
+    lines = ["{", f'  "name": {json.dumps(name, ensure_ascii=False)},']
+    if order is not None:
+        lines.append(f'  "order": {order},')
+    keys = [key for key in SEASON_KEYS if data.get(key)]
+    for i, key in enumerate(keys):
+        end = "," if i < len(keys) - 1 else ""
+        if key in ("DROP_RATES", "HEADLINER_RATES"):
+            rows = ",\n".join(f'    "{level}": {row(rates)}' for level, rates in sorted(data[key].items()))
+            lines += [f'  "{key}": {{', rows, "  }" + end]
+        else:
+            lines.append(f'  "{key}": {row(data[key])}{end}')
+    return "\n".join(lines + ["}"]) + "\n"
+
+
+def load_seasons(directory=SEASON_DIR):
+    """读入目录下所有 *.json，按 order (缺省 100)、文件名排序，返回 {赛季名: 数据 + SAMPLING}。"""
+    seasons = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json"):
+            continue
+        path = os.path.join(directory, filename)
+        try:
+            with open(path, encoding="utf-8") as f:
+                raw = json.load(f)
+        except ValueError as e:
+            raise SeasonConfigError(f"{filename}: JSON 解析失败: {e}") from None
+        name, data = _parse_season(raw, filename)
+        seasons.append((raw.get("order", 100), filename, name, data))
+
+    config = {}
+    for _, filename, name, data in sorted(seasons, key=lambda s: s[:2]):
+        if name in config:
+            raise SeasonConfigError(f"{filename}: 赛季名 {name} 重复")
+        data["SAMPLING"] = compile_season(data)
+        config[name] = data
+    if not config:
+        raise SeasonConfigError(f"{directory} 下没有赛季文件")
+    return config
+
+
+SEASON_CONFIG = load_seasons()
+
+
+def resolve_season(name, config=None):
+    """完整赛季名，或唯一的前缀 (如 "S16")；找不到或前缀不唯一时抛出 ValueError。"""
+    config = SEASON_CONFIG if config is None else config
+    if name in config:
+        return name
+    matches = [key for key in config if key.startswith(name)]
+    if len(matches) != 1:
+        raise ValueError(f"未知赛季: {name}")
+    return matches[0]
@@ -0,0 +1,266 @@
+# 本地 HTTP 模拟服务：给悬浮窗 / 机器人调用 (不依赖 Streamlit)
+#
+# 用法：
+#   python sim_server.py serve --port 8765 --workers 4
+#   python sim_server.py load --url http://127.0.0.1:8765 --concurrency 32 --requests 1000
+#
+# 接口：
+#   POST /simulate  请求体与 batch_cli.py 的一行场景相同，返回一个 JSON 结果
+#   GET  /stats     请求计数、合并数、拒绝数与延迟分位数
+#   GET  /healthz   存活检查
+#
+# 输入不合法的请求在提交进程池之前就返回 400；
+# 相同参数的并发请求只算一次 (共享同一个 Future)；
+# 正在计算的不同场景超过 --max-pending 时直接返回 429，让调用方稍后重试。
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from batch_cli import CLI_ENGINES, check_scenario, run_scenario
+from instrumentation import latency_percentiles
+from simulator import make_process_pool
+
+LATENCY_WINDOW = 10000  # 只保留最近这么多次请求的延迟
+
+
+class Overloaded(Exception):
+    pass
+
+
+class SimulationService:
+    """有界进程池 + 在途请求合并。线程安全，HTTP 处理线程直接调用 simulate。"""
+
+    def __init__(self, workers=2, max_pending=None, defaults=None, timeout=60.0):
+        self.workers = workers
+        self.max_pending = max_pending or 4 * workers
+        self.defaults = {"engine": "numpy", "num_trials": 1000, "tolerance": None, "seed": None, **(defaults or {})}
+        self.timeout = timeout
+        self._pool = make_process_pool(workers)
+        self._inflight = {}  # 场景 key -> Future
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._counts = Counter()
+
+    def _key(self, scenario):
+        return json.dumps({**self.defaults, **scenario}, sort_keys=True)
+
+    def _submit(self, scenario):
+        key = self._key(scenario)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._counts["coalesced"] += 1
+                return future
+            if len(self._inflight) >= self.max_pending:
+                self._counts["rejected"] += 1
+                raise Overloaded()
+            future = self._pool.submit(run_scenario, 0, scenario, self.defaults)
+            self._inflight[key] = future
+            self._counts["computed"] += 1
+        # 在锁外注册回调：如果已经算完，回调会在当前线程里立即执行
+        future.add_done_callback(lambda f: self._forget(key))
+        return future
+
+    def _forget(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def simulate(self, scenario):
+        """返回 (HTTP 状态码, 结果 dict)。"""
+        start = time.perf_counter()
+        with self._lock:
+            self._counts["requests"] += 1
+        try:
+            # 输入不合法 (包括超过金币 / 次数上限) 先在这里返回 400，不占进程池和在途名额
+            error = check_scenario(scenario, self.defaults)
+            if error:
+                status, result = 400, {"input": scenario, "error": error}
+            else:
+                result = dict(self._submit(scenario).result(timeout=self.timeout))
+                result.pop("index", None)
+                status = 400 if "error" in result else 200
+        except Overloaded:
+            return 429, {"error": "服务繁忙，请稍后重试"}
+        except FutureTimeout:
+            status, result = 504, {"error": f"计算超过 {self.timeout} 秒"}
+        except Exception as e:
+            # 子进程崩溃等
+            status, result = 500, {"error": f"{type(e).__name__}: {e}"}
+        with self._lock:
+            self._counts["errors"] += status != 200
+            self._latencies.append(time.perf_counter() - start)
+        return status, result
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._inflight)
+            latencies = list(self._latencies)
+            counts = dict(self._counts)
+        return {
+            **{name: counts.get(name, 0) for name in ("requests", "computed", "coalesced", "rejected", "errors")},
+            "in_flight": in_flight,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "latency_ms": latency_percentiles(latencies),
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(cancel_futures=True)
+
+
+class SimulationHandler(BaseHTTPRequestHandler):
+    service = None  # 由 make_server 绑定
+    verbose = False
+
+    def _reply(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._reply(200, {"ok": True})
+        elif self.path == "/stats":
+            self._reply(200, self.service.stats())
+        else:
+            self._reply(404, {"error": "未知路径"})
+
+    def do_POST(self):
+        if self.path != "/simulate":
+            self._reply(404, {"error": "未知路径"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            scenario = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(scenario, dict):
+                raise ValueError("请求体必须是一个 JSON 对象")
+        except ValueError as e:
+            self._reply(400, {"error": f"JSON 解析失败: {e}"})
+            return
+        status, result = self.service.simulate(scenario)
+        self._reply(status, result, {"Retry-After": "1"} if status == 429 else None)
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(service, host="127.0.0.1", port=8765, verbose=False):
+    handler = type("BoundSimulationHandler", (SimulationHandler,), {"service": service, "verbose": verbose})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(args):
+    defaults = {"engine": args.engine, "num_trials": args.trials, "tolerance": args.tolerance, "seed": args.seed}
+    service = SimulationService(args.workers, args.max_pending, defaults, args.timeout)
+    server = make_server(service, args.host, args.port, args.verbose)
+    sys.stderr.write(f"模拟服务已启动: http://{args.host}:{server.server_port} (workers={args.workers}, max_pending={service.max_pending})\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+
+def _post(url, scenario, timeout):
+    request = urllib.request.Request(url, json.dumps(scenario).encode("utf-8"), {"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return "connection_error"
+
+
+def load(args):
+    """本地压测：并发发请求，场景从 --distinct 个随机场景里抽 (重复越多，合并越多)。"""
+    rng = random.Random(args.seed)
+    scenarios = [
+        {"season": rng.choice(["S16", "S10"]), "level": rng.randint(6, 9), "gold": rng.choice([30, 50, 80]),
+         "target_cost": rng.randint(2, 4), "target_copies": rng.randint(2, 6), "target_taken": rng.randint(0, 3),
+         "other_taken": rng.randint(0, 20)}
+        for _ in range(args.distinct)
+    ]
+    picks = [rng.choice(scenarios) for _ in range(args.requests)]
+    url = args.url.rstrip("/")
+    statuses = Counter()
+    latencies = []
+
+    def one(scenario):
+        start = time.perf_counter()
+        status = _post(url + "/simulate", scenario, args.timeout)
+        return status, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for status, latency in pool.map(one, picks):
+            statuses[status] += 1
+            latencies.append(latency)
+    elapsed = time.perf_counter() - start
+
+    with urllib.request.urlopen(url + "/stats", timeout=args.timeout) as response:
+        server_stats = json.loads(response.read())
+    print(json.dumps({
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(args.requests / elapsed, 2),
+        "status": {str(k): v for k, v in sorted(statuses.items(), key=str)},
+        "client_latency_ms": latency_percentiles(latencies),
+        "server": server_stats,
+    }, ensure_ascii=False, indent=2))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="金铲铲 D 牌概率本地 HTTP 服务")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("serve", help="启动服务")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--workers", type=int, default=2, help="计算进程数")
+    p.add_argument("--max-pending", type=int, default=None, help="同时在算的不同场景上限，超过返回 429 (默认 4×workers)")
+    p.add_argument("--timeout", type=float, default=60.0, help="单个请求最长等待秒数")
+    p.add_argument("--engine", default="numpy", choices=CLI_ENGINES, help="默认模拟引擎")
+    p.add_argument("--trials", type=int, default=1000, help="默认模拟次数")
+    p.add_argument("--tolerance", type=float, default=None, help="自适应模式的允许误差，仅 numpy 引擎")
+    p.add_argument("--seed", type=int, default=None, help="随机种子，给定后相同场景结果固定")
+    p.add_argument("--verbose", action="store_true", help="打印每个请求的访问日志")
+    p.set_defaults(func=serve)
+
+    p = sub.add_parser("load", help="本地压测")
+    p.add_argument("--url", default="http://127.0.0.1:8765")
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--requests", type=int, default=500)
+    p.add_argument("--distinct", type=int, default=20, help="不同场景的数量")
+    p.add_argument("--timeout", type=float, default=60.0)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=load)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,694 @@
+# 模拟引擎 (不依赖 Streamlit，可单独导入)
+import multiprocessing
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from season_config import slot_prob
+
+
+# --- 模拟结果：紧凑的定长数组 ---
+class TrialResults:
+    """每个 trial 一条结果，按列存成定长 numpy 数组 (约 4 字节 / trial)。
+
+    列：success (bool)、cost (按初始金币选 uint8 / uint16)、final_copies (uint8)；
+    重要性抽样多一列 weight (float64)，精确解多一列 prob (float64，每行是一种结局)。
+    支持 len / in / [] / attrs / empty，原先按 DataFrame 写的调用方不用改。
+    """
+
+    def __init__(self, columns, attrs=None):
+        self.columns = columns
+        self.attrs = dict(attrs or {})
+
+    def __len__(self):
+        return len(self.columns["success"])
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    @property
+    def nbytes(self):
+        return sum(col.nbytes for col in self.columns.values())
+
+    def copy(self):
+        return TrialResults({name: col.copy() for name, col in self.columns.items()}, self.attrs)
+
+    @classmethod
+    def concat(cls, parts):
+        parts = list(parts)
+        return cls({name: np.concatenate([p.columns[name] for p in parts]) for name in parts[0].columns})
+
+    def to_frame(self):
+        # 需要表格时再转 DataFrame (pandas 按需导入)
+        import pandas as pd
+        return pd.DataFrame(self.columns)
+
+
+def _result_dtypes(params, start_gold):
+    # 花费不会超过初始金币，搜到的张数不会超过卡池剩余
+    return np.min_scalar_type(start_gold), np.min_scalar_type(params["start_remaining_target"])
+
+
+# --- 参数预处理 & 卡池校验 ---
+def prepare_params(season_data, level, target_cost, target_taken, other_taken, locked_types_count=0, has_headliner=False):
+    """把 UI 输入换算成模拟用的参数字典；输入不合法时返回错误码字符串。"""
+    # 概率直接查编译好的抽样表 (读入赛季文件时已算好)
+    if level not in season_data["SAMPLING"]:
+        return "ERROR_LEVEL"
+    prob_cost_hit = slot_prob(season_data, level, target_cost)
+
+    # 获取天选概率
+    prob_hl_cost_hit = slot_prob(season_data, level, target_cost, headliner=True)
+
+    # 获取该费用基础数据
+    one_card_total = season_data["POOL_SIZES"][target_cost]
+    total_distinct_champs = season_data["DISTINCT_CHAMPS"][target_cost]
+
+    # S16 机制：有效卡种 = 总种类 - 锁住的种类
+    effective_distinct_champs = total_distinct_champs - locked_types_count
+
+    if effective_distinct_champs <= 0:
+        return "ERROR_ALL_LOCKED"
+
+    # 总卡池大小 (分母) = 单张数量 * 有效种类
+    total_pool_size = one_card_total * effective_distinct_champs
+
+    # 初始卡池状态检验
+    start_remaining_target = one_card_total - target_taken
+    if start_remaining_target <= 0: # 修正：如果只剩0张也不能搜
+        return "ERROR_TARGET_LIMIT"
+
+    start_current_pool = total_pool_size - target_taken - other_taken
+    if start_current_pool <= 0:
+        return "ERROR_POOL_LIMIT"
+
+    return {
+        "target_cost": target_cost,
+        "prob_cost_hit": prob_cost_hit,
+        "prob_hl_cost_hit": prob_hl_cost_hit,
+        "has_hl_mechanic": bool(season_data.get("HEADLINER_RATES")),  # 赛季是否有天选格子
+        "has_headliner": has_headliner,
+        "start_remaining_target": start_remaining_target,
+        "start_current_pool": start_current_pool,
+    }
+
+
+def headliner_slot_active(params, rolls_count):
+    # 天选逻辑判断：没天选=次次刷天选；有天选=每4次刷一次天选
+    if not params["has_hl_mechanic"]:
+        return False
+    if params["has_headliner"]:
+        return rolls_count % 4 == 0
+    return True
+
+
+# --- NumPy 批量引擎 ---
+# 每次刷新每个 trial 用到的均匀随机数：6 个格子，第 6 个为天选格子。
+# 每格一个随机数 u < 费率 x 卡池占比 即出目标卡，与先判费率再判卡同分布，
+# 但不同场景 (等级/卡池) 下的命中是单调耦合的，公共随机数对比时方差更小。
+ROLL_DRAW_SHAPE = (6,)
+
+
+def simulate_batch(params, start_gold, target_copies, num_trials, rng=None):
+    """所有 trial 同步推进的向量化模拟，输出与逐次循环版本同分布。
+
+    rng 可以是种子或 np.random.Generator。
+    """
+    rng = np.random.default_rng(rng)
+    return _run_trials(
+        params, start_gold, target_copies, num_trials,
+        lambda alive, rolls_count: rng.random((alive.size,) + ROLL_DRAW_SHAPE),
+    )
+
+
+def _run_trials(params, start_gold, target_copies, num_trials, draw, tilt=1.0):
+    # draw(存活 trial 编号, 第几次刷新) -> 本次刷新的随机数 [存活数, 6]
+    # tilt > 1 时为重要性抽样：出目标卡的概率放大 tilt 倍 (上限 MAX_TILTED_PROB)，
+    # 结果多一列 weight = 似然比，用来把偏置后的结局还原成真实概率
+    target_cost = params["target_cost"]
+    prob_cost_hit = params["prob_cost_hit"]
+    prob_hl_cost_hit = params["prob_hl_cost_hit"]
+    hl_price = target_cost * 3
+
+    # 最终结果 (按 trial 编号存放，紧凑类型)
+    cost_dtype, copies_dtype = _result_dtypes(params, start_gold)
+    out_cost = np.zeros(num_trials, dtype=cost_dtype)
+    out_copies = np.zeros(num_trials, dtype=copies_dtype)
+    out_log_weight = np.zeros(num_trials) if tilt != 1.0 else None
+
+    # 仍在 D 牌的 trial 的状态 (每轮把结束的 trial 剔除，数组越来越短)
+    alive = np.arange(num_trials)
+    gold = np.full(num_trials, start_gold, dtype=np.int64)
+    cost_spent = np.zeros(num_trials, dtype=np.int64)
+    copies_found = np.zeros(num_trials, dtype=np.int64)
+    remaining_target = np.full(num_trials, params["start_remaining_target"], dtype=np.int64)
+    current_pool = np.full(num_trials, params["start_current_pool"], dtype=np.int64)
+    log_weight = np.zeros(num_trials)
+
+    # 所有存活的 trial 每轮都刷新一次，所以刷新次数是共享的
+    rolls_count = 0
+    keep = gold >= 2
+
+    while True:
+        if not keep.all():
+            done = ~keep
+            out_cost[alive[done]] = cost_spent[done]
+            out_copies[alive[done]] = copies_found[done]
+            if out_log_weight is not None:
+                out_log_weight[alive[done]] = log_weight[done]
+            alive = alive[keep]
+            gold = gold[keep]
+            cost_spent = cost_spent[keep]
+            copies_found = copies_found[keep]
+            remaining_target = remaining_target[keep]
+            current_pool = current_pool[keep]
+            log_weight = log_weight[keep]
+        if alive.size == 0:
+            break
+
+        # 扣除刷新费用
+        gold -= 2
+        cost_spent += 2
+        rolls_count += 1
+
+        hl_active = headliner_slot_active(params, rolls_count)
+        normal_slots = 4 if hl_active else 5
+        u = draw(alive, rolls_count)
+
+        # 1. 普通格子：格子之间卡池会变化，按格子顺序逐个处理
+        if prob_cost_hit > 0:
+            for slot in range(normal_slots):
+                real_time_prob = remaining_target / np.maximum(current_pool, 1)
+                affordable = gold >= target_cost
+                bought = _draw_slot(u[:, slot], prob_cost_hit * real_time_prob, affordable, tilt, log_weight)
+                copies_found += bought
+                remaining_target -= bought
+                current_pool -= bought
+                gold -= bought * target_cost
+                cost_spent += bought * target_cost
+
+        # 2. 天选格子 (S10)：卡池剩余 >= 3 才能出，价格 = 3 * 单卡价格
+        if hl_active and prob_hl_cost_hit > 0:
+            real_time_prob = remaining_target / np.maximum(current_pool, 1) * (remaining_target >= 3)
+            affordable = gold >= hl_price
+            bought = _draw_slot(u[:, 5], prob_hl_cost_hit * real_time_prob, affordable, tilt, log_weight)
+            copies_found += 3 * bought
+            remaining_target -= 3 * bought
+            current_pool -= 3 * bought
+            gold -= bought * hl_price
+            cost_spent += bought * hl_price
+
+        keep = (gold >= 2) & (copies_found < target_copies)
+
+    columns = {"success": out_copies >= target_copies, "cost": out_cost, "final_copies": out_copies}
+    if out_log_weight is not None:
+        columns["weight"] = np.exp(out_log_weight)
+    return TrialResults(columns)
+
+
+MAX_TILTED_PROB = 0.95
+
+
+def _draw_slot(u, hit_prob, affordable, tilt, log_weight):
+    # 一个格子是否买到目标卡；买不起时出不出卡都不影响状态，不计入似然比
+    if tilt == 1.0:
+        return (u < hit_prob) & affordable
+    tilted = np.minimum(hit_prob * tilt, np.maximum(hit_prob, MAX_TILTED_PROB))
+    hit = u < tilted
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(hit, hit_prob / tilted, (1 - hit_prob) / (1 - tilted))
+    log_weight += np.where(affordable & (tilted > 0), np.log(ratio), 0.0)
+    return hit & affordable
+
+
+# --- 稀有事件：重要性抽样 ---
+RARE_TILTS = (2, 4, 8, 16, 32, 64, 128)
+
+
+def simulate_rare(params, start_gold, target_copies, num_trials, pilot_trials=200, z=1.96, rng=None):
+    """重要性抽样估计极低的成功率 (可到 1e-6 量级)。
+
+    先用少量 pilot 从 RARE_TILTS 里挑相对方差最小的放大倍数，再正式跑 num_trials 次。
+    返回的结果带 weight 列，attrs 里带置信区间和选中的倍数。
+    """
+    rng = np.random.default_rng(rng)
+
+    def run(tilt, n):
+        return _run_trials(
+            params, start_gold, target_copies, n,
+            lambda alive, rolls_count: rng.random((alive.size,) + ROLL_DRAW_SHAPE), tilt=tilt,
+        )
+
+    # 从小到大试放大倍数；相对方差变大、或估计值骤降 (放大过头，权重退化) 就停
+    best_tilt, best_rel_var, best_estimate = RARE_TILTS[0], np.inf, None
+    for tilt in RARE_TILTS:
+        pilot = run(tilt, pilot_trials)
+        contrib = pilot["weight"] * pilot["success"]
+        if np.count_nonzero(contrib) < 10:
+            continue  # 命中太少，方差估计不可信
+        estimate = contrib.mean()
+        rel_var = contrib.var() / estimate ** 2
+        if best_estimate is not None and (rel_var > best_rel_var or estimate < 0.5 * best_estimate):
+            break
+        best_tilt, best_rel_var, best_estimate = tilt, rel_var, estimate
+
+    results = run(best_tilt, num_trials)
+    contrib = results["weight"] * results["success"]
+    estimate = contrib.mean()
+    half = z * contrib.std(ddof=1) / np.sqrt(num_trials) if num_trials > 1 else 0.0
+    results.attrs["ci"] = (max(0.0, float(estimate - half)), float(estimate + half))
+    results.attrs["tilt"] = best_tilt
+    return results
+
+
+# --- 公共随机数 (CRN) 场景对比 ---
+def simulate_common(scenarios, num_trials, seed=None):
+    """用同一套随机数跑多个场景：第 i 个 trial 第 r 次刷新的随机数在所有场景里相同。
+
+    scenarios: [(params, start_gold, target_copies)]，返回各场景的 TrialResults 列表。
+    """
+    entropy = np.random.SeedSequence(seed).entropy
+
+    def draw(alive, rolls_count):
+        # 每次刷新的随机数只由 (种子, 刷新次数) 决定，场景之间天然对齐
+        block = np.random.default_rng([entropy, rolls_count]).random((num_trials,) + ROLL_DRAW_SHAPE)
+        return block[alive]
+
+    return [
+        _run_trials(params, start_gold, target_copies, num_trials, draw)
+        for params, start_gold, target_copies in scenarios
+    ]
+
+
+def compare_scenarios(scenarios, num_trials, seed=None, z=1.96):
+    """场景对比：第一个场景为基准，给出配对差值及其置信区间。
+
+    scenarios: [(名称, params, start_gold, target_copies)]。
+    variance_reduction = 独立抽样的差值方差 / 配对差值方差，即同等精度下省下的模拟次数倍数。
+    """
+    import pandas as pd
+
+    results = simulate_common([sc[1:] for sc in scenarios], num_trials, seed=seed)
+    base = results[0]["success"].astype(float)
+    rows = []
+    for (name, *_), result in zip(scenarios, results):
+        success = result["success"].astype(float)
+        diff = success - base
+        half = z * diff.std(ddof=1) / np.sqrt(num_trials) if num_trials > 1 else 0.0
+        paired_var = diff.var()
+        independent_var = success.var() + base.var()
+        summary = summarize_result(result)
+        rows.append({
+            "scenario": name,
+            "success_rate": summary["success_rate"],
+            "avg_cost": summary["avg_cost"],
+            "diff": float(diff.mean()),
+            "diff_ci_low": float(diff.mean() - half),
+            "diff_ci_high": float(diff.mean() + half),
+            "variance_reduction": float(independent_var / paired_var) if paired_var > 0 else float("inf"),
+        })
+    return pd.DataFrame(rows)
+
+
+# --- 多进程并行 ---
+def make_process_pool(workers):
+    # 用 spawn 启动子进程，避免 fork 带上 Streamlit 的线程状态
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _simulate_chunk(params, start_gold, target_copies, num_trials, seed_seq):
+    return simulate_batch(params, start_gold, target_copies, num_trials, rng=np.random.default_rng(seed_seq))
+
+
+def simulate_parallel(params, start_gold, target_copies, num_trials, executor, workers, seed=None):
+    """把 trial 平均分给 workers 份，每份有独立的随机流，按顺序合并 (只提交 workers 个任务，进程池可以更大)。
+
+    同一个 seed + workers 的结果逐位一致，与进程池实际大小和完成顺序无关。
+    """
+    seed_seqs = np.random.SeedSequence(seed).spawn(workers)
+    sizes = [num_trials // workers + (1 if i < num_trials % workers else 0) for i in range(workers)]
+    futures = [
+        executor.submit(_simulate_chunk, params, start_gold, target_copies, size, seed_seq)
+        for size, seed_seq in zip(sizes, seed_seqs) if size > 0
+    ]
+    return TrialResults.concat(f.result() for f in futures)
+
+
+# --- 自适应模拟次数 ---
+def wilson_interval(successes, n, z=1.96):
+    # Wilson 区间：成功率接近 0 / 1 时也不会塌成一个点
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, float(center - half)), min(1.0, float(center + half))
+
+
+def iter_adaptive(params, start_gold, target_copies, tolerance, min_batch=500, max_batch=None, max_trials=200000, z=1.96, rng=None):
+    """逐批产出模拟结果，成功率置信区间半宽 <= tolerance 时停止；max_batch 限制单批大小。"""
+    rng = np.random.default_rng(rng)
+    n = successes = 0
+    while n < max_trials:
+        # 按当前估计算出还差多少次，至少再跑 min_batch 次 (第一批没有估计)
+        needed = 0
+        if n > 0:
+            p = (successes + 1) / (n + 2)
+            needed = int(np.ceil(z * z * p * (1 - p) / tolerance ** 2)) - n
+        batch = int(min(max(needed, min_batch), max_batch or max_trials, max_trials - n))
+        result = simulate_batch(params, start_gold, target_copies, batch, rng=rng)
+        yield result
+        n += batch
+        successes += int(result["success"].sum())
+        low, high = wilson_interval(successes, n, z)
+        if (high - low) / 2 <= tolerance:
+            break
+
+
+def simulate_adaptive(params, start_gold, target_copies, tolerance, min_batch=500, max_trials=200000, z=1.96, rng=None):
+    """分批模拟，成功率置信区间半宽 <= tolerance 时停止。
+
+    返回的结果与 simulate_batch 相同，attrs 里带置信区间。
+    """
+    results = TrialResults.concat(iter_adaptive(params, start_gold, target_copies, tolerance, min_batch,
+                                                max_trials=max_trials, z=z, rng=rng))
+    results.attrs["ci"] = wilson_interval(int(results["success"].sum()), len(results), z)
+    return results
+
+
+# --- 精确解：马尔可夫链 ---
+# 剩余目标卡 = 初始剩余 - 已买张数，卡池同理；花费 = 初始金币 - 当前金币，
+# 刷新次数对所有状态相同 (决定天选格子)，所以状态只需 (金币, 已买张数)。
+def solve_exact(params, start_gold, target_copies):
+    """精确计算成功率和资金消耗分布，零方差。
+
+    返回与模拟引擎同列的 TrialResults，每行是一种结局，prob 列为其概率。
+    """
+    key = (
+        params["target_cost"], params["prob_cost_hit"], params["prob_hl_cost_hit"],
+        params["has_hl_mechanic"], params["has_headliner"],
+        params["start_remaining_target"], params["start_current_pool"],
+        start_gold, target_copies,
+    )
+    return _solve_exact_cached(*key).copy()
+
+
+@lru_cache(maxsize=256)
+def _solve_exact_cached(target_cost, prob_cost_hit, prob_hl_cost_hit, has_hl_mechanic, has_headliner,
+                        start_remaining_target, start_current_pool, start_gold, target_copies):
+    params = {"has_hl_mechanic": has_hl_mechanic, "has_headliner": has_headliner}
+    hl_price = target_cost * 3
+
+    # 每个已买张数下，命中费率后是目标卡的概率
+    copies_axis = np.arange(start_remaining_target + 1)
+    remaining = start_remaining_target - copies_axis
+    real_time_prob = remaining / np.maximum(start_current_pool - copies_axis, 1)
+    gold_axis = np.arange(start_gold + 1)[:, None]
+
+    normal_buy = prob_cost_hit * real_time_prob * (gold_axis >= target_cost)
+    hl_buy = prob_hl_cost_hit * real_time_prob * (remaining >= 3) * (gold_axis >= hl_price)
+
+    # dist[金币, 已买张数] = 仍在 D 牌的概率质量；outcome 记录结束时的状态
+    dist = np.zeros((start_gold + 1, start_remaining_target + 1))
+    outcome = np.zeros_like(dist)
+    if start_gold >= 2:
+        dist[start_gold, 0] = 1.0
+    else:
+        outcome[start_gold, 0] = 1.0
+
+    def buy(dist, buy_prob, price, copies):
+        # 买下的概率质量：金币 g -> g - price，张数 c -> c + copies
+        if price >= dist.shape[0]:
+            return dist
+        moved = dist * buy_prob
+        dist = dist - moved
+        dist[:dist.shape[0] - price, copies:] += moved[price:, :dist.shape[1] - copies]
+        return dist
+
+    rolls_count = 0
+    while dist.any():
+        # 扣除刷新费用
+        dist = np.vstack([dist[2:], np.zeros((2, dist.shape[1]))])
+        rolls_count += 1
+
+        hl_active = headliner_slot_active(params, rolls_count)
+        normal_slots = 4 if hl_active else 5
+        if prob_cost_hit > 0:
+            for _ in range(normal_slots):
+                dist = buy(dist, normal_buy, target_cost, 1)
+        if hl_active and prob_hl_cost_hit > 0 and start_remaining_target >= 3:
+            dist = buy(dist, hl_buy, hl_price, 3)
+
+        # 搜齐了或者没钱 D 了 → 结束
+        finished = np.zeros_like(dist, dtype=bool)
+        finished[:2, :] = True
+        finished[:, target_copies:] = True
+        outcome += np.where(finished, dist, 0.0)
+        dist = np.where(finished, 0.0, dist)
+
+    gold_idx, copies_idx = np.nonzero(outcome)
+    return TrialResults({
+        "success": copies_idx >= target_copies,
+        "cost": (start_gold - gold_idx).astype(np.min_scalar_type(start_gold)),
+        "final_copies": copies_idx.astype(np.min_scalar_type(start_remaining_target)),
+        "prob": outcome[gold_idx, copies_idx],
+    })
+
+
+# --- 结果汇总 (蒙特卡洛 / 精确解通用) ---
+def summarize_result(results):
+    """计算成功率、成功时的平均花费，以及按花费聚合的成功概率 (画分布图用)。
+
+    cost_values / cost_probs：成功时花费为 cost_values[i] 的概率为 cost_probs[i]，
+    长度只和金币数有关，与模拟次数无关。
+    """
+    success = results["success"]
+    if "prob" in results:
+        weights = results["prob"][success]
+    elif "weight" in results:
+        # 重要性抽样：似然比 / 次数 (成功率无偏)
+        weights = results["weight"][success] / len(results)
+    else:
+        weights = None  # 普通蒙特卡洛：直接计数，最后除以次数
+    cost_probs = np.bincount(results["cost"][success], weights=weights)
+    if weights is None:
+        cost_probs = cost_probs / len(results)
+    cost_values = np.nonzero(cost_probs)[0]
+    cost_probs = cost_probs[cost_values]
+
+    success_rate = float(cost_probs.sum())
+    avg_cost = float(np.dot(cost_values, cost_probs) / success_rate) if success_rate > 0 else 0
+    # 蒙特卡洛结果附带 95% 置信区间，精确解没有误差
+    ci = None
+    if "prob" not in results:
+        ci = results.attrs.get("ci") or wilson_interval(int(success.sum()), len(results))
+    return {
+        "success_rate": success_rate,
+        "avg_cost": avg_cost,
+        "cost_values": cost_values,
+        "cost_probs": cost_probs,
+        "ci": ci,
+        "num_trials": None if "prob" in results else len(results),
+    }
+
+
+# --- 逐次循环引擎 (最初的实现，保留作对照) ---
+def simulate_loop(params, start_gold, target_copies, num_trials, rand, progress=None):
+    """逐个 trial 模拟；rand() 返回 [0, 1) 均匀随机数，progress(已完成比例) 可选。"""
+    target_cost = params["target_cost"]
+    prob_cost_hit = params["prob_cost_hit"]
+    prob_hl_cost_hit = params["prob_hl_cost_hit"]
+    start_remaining_target = params["start_remaining_target"]
+    start_current_pool = params["start_current_pool"]
+
+    # 结果直接写进定长数组，不再每个 trial 建一个 dict
+    cost_dtype, copies_dtype = _result_dtypes(params, start_gold)
+    out_cost = np.zeros(num_trials, dtype=cost_dtype)
+    out_copies = np.zeros(num_trials, dtype=copies_dtype)
+    
+    for i in range(num_trials):
+        if progress and i % max(num_trials // 10, 1) == 0:
+            progress(i / num_trials)
+            
+        copies_found = 0
+        cost_spent = 0
+        current_gold = start_gold # 使用传入的初始金币
+        
+        current_remaining_target = start_remaining_target
+        current_pool = start_current_pool
+        rolls_count = 0
+        
+        # ✅ 修复：循环条件增加“买得起卡”的判断
+        # 如果还没搜到卡，至少要有2块钱D牌；如果搜到了，还要有钱买
+        while current_gold >= 2: 
+            
+            # 扣除刷新费用
+            current_gold -= 2
+            cost_spent += 2
+            rolls_count += 1
+            
+            # --- 商店生成逻辑 ---
+            headliner_slot_active = False
+            
+            # 天选逻辑判断
+            if params["has_hl_mechanic"]:
+                if params["has_headliner"]:
+                    if rolls_count % 4 == 0:
+                        headliner_slot_active = True
+                else:
+                    headliner_slot_active = True
+            
+            normal_slots = 4 if headliner_slot_active else 5
+            
+            # 1. 遍历普通格子
+            for _ in range(normal_slots):
+                if rand() < prob_cost_hit:
+                    # 命中费率，判断是否是目标卡
+                    real_time_prob = current_remaining_target / max(current_pool, 1)
+                    if rand() < real_time_prob:
+                        # ✅ 修复：判断是否有钱买卡
+                        if current_gold >= target_cost:
+                            copies_found += 1
+                            current_remaining_target -= 1
+                            current_pool -= 1
+                            current_gold -= target_cost # ✅ 修复：扣除买卡金币
+                            cost_spent += target_cost
+                        else:
+                            # 没钱买卡了，这次模拟实际上已经失败（或者只能看着卡流泪）
+                            # 为了简化模型，这里视为没买到，但循环继续（因为可能还有2块钱D牌）
+                            pass
+            
+            # 2. 遍历天选格子 (S10)
+            if headliner_slot_active:
+                if rand() < prob_hl_cost_hit:
+                    # 天选卡需卡池剩余 >= 3
+                    if current_remaining_target >= 3:
+                        real_time_prob = current_remaining_target / max(current_pool, 1)
+                        if rand() < real_time_prob:
+                            # 天选卡价格 = 3 * 单卡价格
+                            hl_price = target_cost * 3
+                            if current_gold >= hl_price:
+                                copies_found += 3 
+                                current_remaining_target -= 3
+                                current_pool -= 3
+                                current_gold -= hl_price # ✅ 修复：扣除天选金币
+                                cost_spent += hl_price
+                            
+            if copies_found >= target_copies:
+                break
+        
+        # 记录花费和搜到几张 (是否成功由张数推出)
+        out_cost[i] = cost_spent
+        out_copies[i] = copies_found
+    
+    return TrialResults({"success": out_copies >= target_copies, "cost": out_cost, "final_copies": out_copies})
+
+
+# --- 统一入口：按引擎分发 (app / 命令行共用) ---
+def run_simulation(season_data, level, target_cost, start_gold, target_copies, target_taken, other_taken, num_trials, locked_types_count=0, has_headliner=False, engine="loop", seed=None, tolerance=None, workers=1, executor=None, progress=None):
+    """返回 TrialResults，输入不合法时返回错误码字符串。
+
+    parallel 引擎需要传入 executor (进程池)；progress(已完成比例) 用于逐次循环引擎汇报进度。
+    """
+    params = prepare_params(season_data, level, target_cost, target_taken, other_taken, locked_types_count, has_headliner)
+    if isinstance(params, str):
+        return params
+
+    # NumPy 批量引擎：所有 trial 同步推进
+    if engine == "numpy":
+        # 自适应：分批跑到置信区间够窄为止
+        if tolerance:
+            return simulate_adaptive(params, start_gold, target_copies, tolerance, rng=seed)
+        return simulate_batch(params, start_gold, target_copies, num_trials, rng=seed)
+    # 多进程并行：每个子进程一条独立随机流，同 seed + 进程数可复现
+    if engine == "parallel":
+        return simulate_parallel(params, start_gold, target_copies, num_trials, executor, workers, seed=seed)
+    # 稀有事件：重要性抽样
+    if engine == "rare":
+        return simulate_rare(params, start_gold, target_copies, num_trials, rng=seed)
+    # 精确解：马尔可夫链，与模拟次数无关
+    if engine == "exact":
+        return solve_exact(params, start_gold, target_copies)
+
+    # 传了种子就用独立的随机源，保证可复现
+    rand = random.random if seed is None else random.Random(seed).random
+    return simulate_loop(params, start_gold, target_copies, num_trials, rand, progress)
+
+
+
+# --- 分批流式入口：后台任务逐批汇报、随时可取消 ---
+STREAM_BATCH_SECONDS = 0.1  # 每批目标耗时，页面刷新和取消的延迟都在这个量级，与总次数无关
+FIRST_BATCH = {"numpy": 5000, "parallel": 5000, "loop": 500}  # 第一批的大小，也是给了种子时的固定批大小
+
+
+def iter_simulation(season_data, level, target_cost, start_gold, target_copies, target_taken, other_taken, num_trials, locked_types_count=0, has_headliner=False, engine="numpy", seed=None, tolerance=None, workers=1, executor=None, batch_seconds=STREAM_BATCH_SECONDS):
+    """分批版 run_simulation：返回逐批产出 TrialResults 的生成器，输入不合法时返回错误码字符串。
+
+    所有批次合并起来就是完整结果。给了 seed 时批大小固定 (结果可复现)，
+    否则按实测速度调整批大小，让每批大约 batch_seconds 秒。
+    """
+    params = prepare_params(season_data, level, target_cost, target_taken, other_taken, locked_types_count, has_headliner)
+    if isinstance(params, str):
+        return params
+    return _iter_batches(params, start_gold, target_copies, num_trials, engine, seed, tolerance, workers, executor, batch_seconds)
+
+
+def _iter_batches(params, start_gold, target_copies, num_trials, engine, seed, tolerance, workers, executor, batch_seconds):
+    # 精确解与次数无关；重要性抽样要先整体选定放大倍数，两者都一次算完
+    if engine == "exact":
+        yield solve_exact(params, start_gold, target_copies)
+        return
+    if engine == "rare":
+        yield simulate_rare(params, start_gold, target_copies, num_trials, rng=seed)
+        return
+
+    root = np.random.SeedSequence(seed)
+    size = FIRST_BATCH.get(engine, FIRST_BATCH["numpy"])
+    if engine == "numpy" and tolerance:
+        yield from iter_adaptive(params, start_gold, target_copies, tolerance, max_batch=size * 10, rng=root.spawn(1)[0])
+        return
+    if engine == "parallel":
+        # 同时在算的批不超过 workers 个 (进程池可以更大、被多个请求共用)，按提交顺序产出；
+        # 批大小和种子与 workers 无关，所以进程数不影响结果。生成器被关闭 (取消) 时撤掉还没开始的批
+        sizes = [min(size, num_trials - start) for start in range(0, num_trials, size)]
+        pending = deque()
+        try:
+            for n, seed_seq in zip(sizes, root.spawn(len(sizes))):
+                pending.append(executor.submit(_simulate_chunk, params, start_gold, target_copies, n, seed_seq))
+                if len(pending) >= max(workers, 1):
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+        return
+
+    done = 0
+    while done < num_trials:
+        n = min(size, num_trials - done)
+        seed_seq = root.spawn(1)[0]
+        start = time.perf_counter()
+        if engine == "numpy":
+            batch = simulate_batch(params, start_gold, target_copies, n, rng=np.random.default_rng(seed_seq))
+        else:
+            rand = random.Random(int(seed_seq.generate_state(1)[0])).random
+            batch = simulate_loop(params, start_gold, target_copies, n, rand)
+        elapsed = time.perf_counter() - start
+        yield batch
+        done += n
+        if seed is None and elapsed > 0:
+            # 按这一批的速度估计下一批，变化幅度限制在 4 倍以内
+            size = int(min(max(n * batch_seconds / elapsed, n / 4, 100), n * 4))
@@ -0,0 +1,5 @@
+# 测试直接导入仓库根目录下的模块 (与 app.py 同级的平铺结构)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
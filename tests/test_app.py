@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IDLE_RUN = """
+import sys
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=180)
+at.run()
+assert not at.exception, at.exception
+print(sorted(m for m in ("pandas", "matplotlib", "openai") if m in sys.modules))
+"""
+
+
+def test_idle_run_skips_heavy_imports():
+    # 单独起一个进程：同一进程里别的测试可能已经导入过 pandas
+    env = {**os.environ, "TFT_PERF_LOG": "", "PYTHONPATH": ROOT}
+    out = subprocess.run(
+        [sys.executable, "-c", IDLE_RUN, os.path.join(ROOT, "app.py")],
+        capture_output=True, text=True, env=env, timeout=300, check=True,
+    )
+    assert out.stdout.strip().splitlines()[-1] == "[]"
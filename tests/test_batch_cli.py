@@ -0,0 +1,56 @@
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from batch_cli import MAX_GOLD, MAX_TRIALS, run_scenario
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def _widget(elements, label):
+    return next(w for w in elements if w.label == label)
+
+
+def _percent(text):
+    return float(text.rstrip("%")) / 100
+
+
+def test_cli_matches_app_defaults(monkeypatch):
+    # 同一个局面：页面默认输入 (精确计算) 和命令行只填同样字段，成功率应当一致
+    monkeypatch.setenv("TFT_PERF_LOG", "")
+    at = AppTest.from_file(APP_PATH, default_timeout=180)
+    at.run()
+    _widget(at.radio, "模拟引擎").set_value("精确计算 (马尔可夫链)")
+    at.run()
+    next(b for b in at.button if "开始模拟" in b.label).click()
+    at.run()
+    assert not at.exception
+    app_rate = _percent(_widget(at.metric, "🎯 成功概率").value)
+
+    scenario = {
+        "season": _widget(at.selectbox, "选择赛季").value,
+        "level": _widget(at.slider, "当前等级").value,
+        "gold": _widget(at.number_input, "金币").value,
+        "target_cost": _widget(at.selectbox, "几费卡").value,
+        "target_copies": _widget(at.selectbox, "缺几张").value,
+        "target_taken": _widget(at.number_input, "外面有几张我要的卡？").value,
+        "other_taken": _widget(at.number_input, "外面拿了多少张**其他同费**卡？").value,
+    }
+    result = run_scenario(0, scenario, {"engine": "exact", "num_trials": 1000, "tolerance": None, "seed": None})
+    assert "error" not in result
+    # 页面显示保留一位小数
+    assert result["success_rate"] == pytest.approx(app_rate, abs=0.0006)
+
+
+@pytest.mark.parametrize("field, value, code", [
+    ("gold", MAX_GOLD + 1, "ERROR_GOLD_LIMIT"),
+    ("gold", 100000, "ERROR_GOLD_LIMIT"),
+    ("num_trials", MAX_TRIALS + 1, "ERROR_TRIALS_LIMIT"),
+    ("num_trials", 10**9, "ERROR_TRIALS_LIMIT"),
+])
+def test_rejects_oversized_scenarios(field, value, code):
+    # 超出上限直接报错，不会真的去算 (否则精确计算会卡住、大批次会撑爆内存)
+    scenario = {"season": "S16", "level": 8, "gold": 50, "target_cost": 4, "target_copies": 3, field: value}
+    result = run_scenario(0, scenario, {"engine": "exact", "num_trials": 1000, "tolerance": None, "seed": None})
+    assert result["error"] == code
@@ -0,0 +1,43 @@
+import logging
+
+import pytest
+
+import instrumentation
+from instrumentation import PERF_LOGGER_NAME, RunTimer, get_perf_logger
+
+
+@pytest.fixture
+def fresh_logger():
+    # 日志器每个进程只配置一次，测试前后都恢复成未配置状态
+    logger = logging.getLogger(PERF_LOGGER_NAME)
+
+    def reset():
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+        logger._tft_configured = False
+
+    reset()
+    yield logger
+    reset()
+
+
+def test_unwritable_log_path_does_not_break_runs(fresh_logger, tmp_path, monkeypatch):
+    monkeypatch.setenv("TFT_PERF_LOG", str(tmp_path / "missing" / "perf.jsonl"))
+    assert get_perf_logger() is fresh_logger
+    assert fresh_logger._tft_configured
+    assert not any(isinstance(h, logging.FileHandler) for h in fresh_logger.handlers)
+    # 之后每次计算照常记录，不再重试打开文件
+    timer = RunTimer(engine="exact")
+    with timer.stage("simulate"):
+        pass
+    assert timer.log()["engine"] == "exact"
+
+
+def test_log_written_as_json_lines(fresh_logger, tmp_path, monkeypatch):
+    path = tmp_path / "perf.jsonl"
+    monkeypatch.setenv("TFT_PERF_LOG", str(path))
+    instrumentation.log_event("rerun", ms=1.5)
+    for handler in fresh_logger.handlers:
+        handler.flush()
+    assert '"event": "rerun"' in path.read_text(encoding="utf-8")
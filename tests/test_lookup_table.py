@@ -0,0 +1,46 @@
+import pytest
+
+import lookup_table
+from lookup_table import ScenarioTable, build_table
+from season_config import SEASON_CONFIG, resolve_season
+from simulator import prepare_params, solve_exact, summarize_result
+
+SEASON_NAME = resolve_season("S10")
+SEASON = {SEASON_NAME: SEASON_CONFIG[SEASON_NAME]}
+
+
+@pytest.fixture(scope="module")
+def table(tmp_path_factory):
+    # 只建一个等级，几秒就能建完整张表 (其余维度与正式表相同)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(lookup_table, "LEVELS", [8])
+        path = str(tmp_path_factory.mktemp("lut") / "table.bin")
+        build_table(path, season_config=SEASON, verbose=False)
+        yield ScenarioTable(path, season_config=SEASON)
+
+
+@pytest.mark.parametrize("target_cost, gold, target_copies, target_taken, other_taken, has_headliner", [
+    (4, 50, 3, 0, 10, False),
+    (3, 30, 2, 2, 0, True),
+    (5, 120, 4, 1, 25, False),
+    (2, 200, 9, 4, 60, True),
+    (1, 0, 1, 0, 0, False),
+])
+def test_lookup_matches_exact(table, target_cost, gold, target_copies, target_taken, other_taken, has_headliner):
+    season_data = SEASON[SEASON_NAME]
+    locked = season_data.get("DEFAULT_LOCKED", {}).get(target_cost, 0)
+    hit = table.lookup(SEASON_NAME, 8, target_cost, gold, target_copies, target_taken, other_taken, locked, has_headliner)
+    params = prepare_params(season_data, 8, target_cost, target_taken, other_taken, locked, has_headliner)
+    exact = summarize_result(solve_exact(params, gold, target_copies))
+    assert hit is not None
+    # 成功率存成 float32，花费取整到金币
+    assert hit[0] == pytest.approx(exact["success_rate"], abs=1e-6)
+    if exact["success_rate"] > 0:
+        assert abs(hit[1] - exact["avg_cost"]) <= 0.5
+
+
+def test_lookup_outside_grid_misses(table):
+    assert table.lookup(SEASON_NAME, 7, 4, 50, 3, 0, 10) is None  # 没建的等级
+    assert table.lookup(SEASON_NAME, 8, 4, 50, 3, 0, 12) is None  # 不在步长上
+    assert table.lookup(SEASON_NAME, 8, 4, lookup_table.MAX_GOLD + 1, 3, 0, 10) is None
+    assert table.lookup("S99", 8, 4, 50, 3, 0, 10) is None
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from multi_target import prepare_targets, run_joint, simulate_joint, standalone_success
+from season_config import SEASON_CONFIG, resolve_season
+from simulator import prepare_params, simulate_batch, solve_exact, summarize_result
+
+SEASON = SEASON_CONFIG[resolve_season("S16")]
+
+
+@pytest.mark.parametrize("level, cost, copies, gold, other_taken, has_headliner", [
+    (8, 4, 3, 50, 10, False),
+    (7, 3, 3, 40, 0, True),
+    (9, 5, 2, 80, 0, False),
+])
+def test_single_target_matches_simulate_batch(level, cost, copies, gold, other_taken, has_headliner):
+    locked = SEASON.get("DEFAULT_LOCKED", {}).get(cost, 0)
+    params = prepare_params(SEASON, level, cost, 0, other_taken, locked, has_headliner)
+    batch = simulate_batch(params, gold, copies, 20000, rng=5)
+    joint_params = prepare_targets(SEASON, level, [{"cost": cost, "copies": copies}], {cost: other_taken}, None, has_headliner)
+    joint = simulate_joint(joint_params, gold, 20000, rng=5)
+
+    # 同种子成败逐个一致
+    np.testing.assert_array_equal(joint["success"], batch["success"])
+    # 花费：凑齐后不再多买，所以只在 simulate_batch 多买了的 trial 上更低
+    batch_cost, joint_cost = batch["cost"].astype(int), joint["cost"].astype(int)
+    batch_found, joint_found = batch["final_copies"].astype(int), joint["copies_0"].astype(int)
+    same = batch_found == joint_found
+    np.testing.assert_array_equal(joint_cost[same], batch_cost[same])
+    assert (joint_cost[~same] < batch_cost[~same]).all()
+    assert (joint_found <= batch_found).all()
+
+
+def test_shared_gold_is_no_better_than_each_target_alone():
+    targets = [{"cost": 4, "copies": 3}, {"cost": 4, "copies": 2}, {"cost": 3, "copies": 2}]
+    report = run_joint(SEASON, 8, 60, targets, num_trials=20000, seed=1)
+    standalone = standalone_success(SEASON, 8, 60, targets)
+    assert report["success_rate"] <= min(standalone)
+    for target, alone in zip(report["targets"], standalone):
+        # 单个目标在共用金币时的命中率不会 (显著) 高于独占金币的精确值
+        assert target["hit_rate"] <= alone + 0.01
+
+
+@pytest.mark.parametrize("season, level, cost, copies, gold, has_headliner", [
+    ("S16", 8, 4, 3, 50, False),
+    ("S10", 8, 4, 3, 60, False),
+    ("S10", 7, 3, 2, 40, True),
+])
+def test_single_target_matches_exact(season, level, cost, copies, gold, has_headliner):
+    season_data = SEASON_CONFIG[resolve_season(season)]
+    locked = season_data.get("DEFAULT_LOCKED", {}).get(cost, 0)
+    exact = summarize_result(solve_exact(prepare_params(season_data, level, cost, 0, 0, locked, has_headliner), gold, copies))
+    n = 50000
+    report = run_joint(season_data, level, gold, [{"cost": cost, "copies": copies}], num_trials=n,
+                       has_headliner=has_headliner, seed=4)
+    rate = exact["success_rate"]
+    assert abs(report["success_rate"] - rate) <= 4 * np.sqrt(rate * (1 - rate) / n)
+    assert report["avg_cost"] == pytest.approx(exact["avg_cost"], rel=0.02)
+    assert report["targets"][0]["standalone_success"] == pytest.approx(rate)
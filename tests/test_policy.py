@@ -0,0 +1,38 @@
+import pytest
+
+from policy import describe_action, recommend_action
+from season_config import SEASON_CONFIG
+from simulator import prepare_params, solve_exact, summarize_result
+
+S16 = "S16 (英雄联盟传奇)"
+LOCKED_4 = SEASON_CONFIG[S16]["DEFAULT_LOCKED"][4]
+
+
+@pytest.mark.parametrize("gold,copies", [(30, 1), (50, 3), (80, 4)])
+def test_single_round_roll_matches_exact(gold, copies):
+    # 只剩一回合时“现在 D”就是 D 到没钱为止，与马尔可夫链精确解一致
+    rec = recommend_action(S16, 8, gold, 4, copies, 0, 10, LOCKED_4, horizon=1)
+    params = prepare_params(SEASON_CONFIG[S16], 8, 4, 0, 10, LOCKED_4)
+    exact = summarize_result(solve_exact(params, gold, copies))["success_rate"]
+    assert rec["action_probs"]["roll"] == pytest.approx(exact, abs=1e-9)
+
+
+def test_waiting_has_a_cost():
+    # 不计等待代价时存钱吃利息不差于现在 D；计入风险后同一局面应当现在 D
+    free = recommend_action(S16, 8, 50, 4, 2, 0, 10, LOCKED_4, horizon=3, wait_risk=0.0)
+    risky = recommend_action(S16, 8, 50, 4, 2, 0, 10, LOCKED_4, horizon=3, wait_risk=0.15)
+    assert free["action"] == "save"
+    assert risky["action"] == "roll"
+    assert risky["action_probs"]["save"] < free["action_probs"]["save"]
+
+
+def test_ties_prefer_not_spending():
+    # 搜齐概率都是 0 (钱不够) 时不应该因为浮点误差推荐 D 牌
+    rec = recommend_action(S16, 8, 4, 4, 3, 0, 10, LOCKED_4, horizon=2)
+    assert rec["action"] == "save"
+
+
+def test_single_round_description_has_no_interest():
+    rec = recommend_action(S16, 8, 60, 4, 2, 0, 10, LOCKED_4, horizon=1)
+    assert rec["roll_to"] is not None and rec["roll_to"] >= 2
+    assert "利息" not in describe_action(rec, 8, 60)
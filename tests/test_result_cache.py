@@ -0,0 +1,18 @@
+from result_cache import ResultCache, make_cache_key
+
+ARGS = ("S16", "fp", 8, 4, 50, 3, 0, 10, 13, False)
+
+
+def test_exact_key_ignores_trials():
+    assert make_cache_key(*ARGS, 1000, "exact") == make_cache_key(*ARGS, 100000, "exact")
+    assert make_cache_key(*ARGS, 1000, "numpy") != make_cache_key(*ARGS, 100000, "numpy")
+    assert make_cache_key(*ARGS, 1000, "numpy") != make_cache_key(*ARGS, "adaptive±0.01", "numpy")
+
+
+def test_entries_survive_restart(tmp_path):
+    key = make_cache_key(*ARGS, 1000, "exact")
+    ResultCache(path=str(tmp_path)).put(key, {"success_rate": 0.4})
+    cache = ResultCache(path=str(tmp_path))
+    assert cache.get(key) == {"success_rate": 0.4}
+    assert cache.get(make_cache_key(*ARGS, 1000, "numpy")) is None
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,28 @@
+import pytest
+
+from sim_server import SimulationService
+
+
+@pytest.fixture
+def service():
+    svc = SimulationService(workers=1, defaults={"engine": "exact"})
+    yield svc
+    svc.shutdown()
+
+
+def test_invalid_request_never_reaches_pool(service):
+    # 超过上限的请求直接 400，不占进程池，也不留下在途 key
+    status, result = service.simulate({"season": "S16", "level": 8, "gold": 100000, "target_cost": 4, "target_copies": 3})
+    assert status == 400
+    assert result["error"] == "ERROR_GOLD_LIMIT"
+    stats = service.stats()
+    assert stats["computed"] == 0
+    assert stats["in_flight"] == 0
+    assert stats["errors"] == 1
+
+
+def test_valid_request_is_computed(service):
+    status, result = service.simulate({"season": "S16", "level": 8, "gold": 50, "target_cost": 4, "target_copies": 3})
+    assert status == 200
+    assert 0 < result["success_rate"] < 1
+    assert service.stats()["computed"] == 1
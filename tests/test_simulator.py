@@ -0,0 +1,158 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from season_config import SEASON_CONFIG, resolve_season
+from simulator import (
+    TrialResults, compare_scenarios, headliner_slot_active, iter_simulation, prepare_params, simulate_adaptive, simulate_batch, simulate_loop,
+    simulate_rare, solve_exact, summarize_result,
+)
+
+SCENARIO = (SEASON_CONFIG[resolve_season("S16")], 8, 4, 50, 3, 0, 10)
+
+# (赛季, 等级, 费用, 金币, 缺几张, 场外同名, 场外同费, 有天选)：覆盖两个赛季、天选格子和场上已有天选
+CASES = [
+    ("S16", 8, 4, 50, 3, 0, 10, False),
+    ("S16", 7, 3, 30, 2, 2, 0, False),
+    ("S10", 8, 4, 60, 3, 0, 0, False),
+    ("S10", 7, 3, 40, 2, 0, 5, True),
+]
+
+
+def make_params(season, level, cost, target_taken=0, other_taken=0, has_headliner=False):
+    season_data = SEASON_CONFIG[resolve_season(season)]
+    locked = season_data.get("DEFAULT_LOCKED", {}).get(cost, 0)
+    return prepare_params(season_data, level, cost, target_taken, other_taken, locked, has_headliner)
+
+
+def assert_within_ci(estimate, exact, n, sigmas=4):
+    # 蒙特卡洛估计与精确值之差不超过 sigmas 个标准误 (种子固定，结果确定)
+    assert abs(estimate - exact) <= sigmas * np.sqrt(max(exact * (1 - exact), 1e-4) / n)
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    """记录同时在途 (已提交未完成) 的任务数峰值。"""
+
+    def __init__(self, max_workers):
+        super().__init__(max_workers)
+        self.outstanding = 0
+        self.peak = 0
+
+    def submit(self, fn, *args, **kwargs):
+        self.outstanding += 1
+        self.peak = max(self.peak, self.outstanding)
+        future = super().submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda f: self._done())
+        return future
+
+    def _done(self):
+        self.outstanding -= 1
+
+
+@pytest.mark.parametrize("workers", [1, 2, 3])
+def test_parallel_stream_limits_in_flight_batches(workers):
+    # 池子按 CPU 核数开；每次调用只同时占用 workers 个，结果与 workers 无关
+    with CountingExecutor(max_workers=8) as pool:
+        batches = list(iter_simulation(*SCENARIO, 40000, engine="parallel", seed=7, workers=workers, executor=pool))
+        assert pool.peak <= workers
+    with CountingExecutor(max_workers=8) as pool:
+        reference = list(iter_simulation(*SCENARIO, 40000, engine="parallel", seed=7, workers=8, executor=pool))
+    merged, expected = TrialResults.concat(batches), TrialResults.concat(reference)
+    assert len(merged) == 40000
+    np.testing.assert_array_equal(merged["success"], expected["success"])
+    np.testing.assert_array_equal(merged["cost"], expected["cost"])
+
+
+@pytest.mark.parametrize("season, cost", [("S16", 1), ("S16", 4), ("S10", 3), ("S10", 5)])
+def test_exact_single_roll_matches_closed_form(season, cost):
+    # 只够刷一次、买一张：每个普通格子命中概率相同，至少命中一次即成功 (天选格子买不起)
+    params = make_params(season, 8, cost)
+    slots = 4 if headliner_slot_active(params, 1) else 5
+    q = params["prob_cost_hit"] * params["start_remaining_target"] / params["start_current_pool"]
+    summary = summarize_result(solve_exact(params, 2 + cost, 1))
+    assert summary["success_rate"] == pytest.approx(1 - (1 - q) ** slots)
+    assert summary["avg_cost"] == pytest.approx(2 + cost)
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_exact_matches_loop_engine(case):
+    season, level, cost, gold, copies, taken, other, has_headliner = case
+    params = make_params(season, level, cost, taken, other, has_headliner)
+    exact = summarize_result(solve_exact(params, gold, copies))
+    n = 20000
+    loop = summarize_result(simulate_loop(params, gold, copies, n, random.Random(3).random))
+    assert_within_ci(loop["success_rate"], exact["success_rate"], n)
+    assert loop["avg_cost"] == pytest.approx(exact["avg_cost"], rel=0.03)
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_numpy_batch_matches_exact(case):
+    season, level, cost, gold, copies, taken, other, has_headliner = case
+    params = make_params(season, level, cost, taken, other, has_headliner)
+    exact = summarize_result(solve_exact(params, gold, copies))
+    n = 50000
+    batch = summarize_result(simulate_batch(params, gold, copies, n, rng=11))
+    assert_within_ci(batch["success_rate"], exact["success_rate"], n)
+    assert batch["avg_cost"] == pytest.approx(exact["avg_cost"], rel=0.02)
+
+
+@pytest.mark.parametrize("tolerance", [0.02, 0.005])
+@pytest.mark.parametrize("case", CASES)
+def test_adaptive_stops_within_tolerance(case, tolerance):
+    season, level, cost, gold, copies, taken, other, has_headliner = case
+    params = make_params(season, level, cost, taken, other, has_headliner)
+    exact = summarize_result(solve_exact(params, gold, copies))["success_rate"]
+    result = summarize_result(simulate_adaptive(params, gold, copies, tolerance, rng=5))
+    low, high = result["ci"]
+    # 停下时区间半宽已达标，且 (固定种子下) 覆盖精确值
+    assert (high - low) / 2 <= tolerance
+    assert low <= exact <= high
+
+
+def test_adaptive_stops_early_on_certain_outcomes():
+    # 金币远远够用：成功率接近 100%，方差小，几批就该停，不会跑满上限
+    params = make_params("S16", 9, 1)
+    exact = summarize_result(solve_exact(params, 200, 1))["success_rate"]
+    result = summarize_result(simulate_adaptive(params, 200, 1, 0.01, rng=5))
+    assert result["num_trials"] <= 2000
+    assert result["ci"][0] <= exact <= result["ci"][1]
+
+
+def test_compare_scenarios_matches_exact():
+    # 现在 D / 多存 10 块再 D / 先升 9 级再 D：配对差值的区间应覆盖精确差值，且方差明显小于独立抽样
+    base = make_params("S16", 8, 4, 0, 10)
+    level_up = make_params("S16", 9, 4, 0, 10)
+    scenarios = [("现在 D", base, 50, 3), ("多存 10 块", base, 60, 3), ("先升级", level_up, 50, 3)]
+    n = 20000
+    table = compare_scenarios(scenarios, n, seed=9)
+    exact = [summarize_result(solve_exact(params, gold, copies))["success_rate"] for _, params, gold, copies in scenarios]
+    for row, rate in zip(table.itertuples(), exact):
+        assert_within_ci(row.success_rate, rate, n)
+        assert row.diff_ci_low <= rate - exact[0] <= row.diff_ci_high
+    assert table["diff"].iloc[0] == 0
+    assert (table["variance_reduction"].iloc[1:] > 2).all()
+
+
+@pytest.mark.parametrize("case", [
+    ("S16", 7, 5, 30, 2, 0, 0, False),  # ~1.7e-3
+    ("S16", 6, 4, 20, 3, 0, 20, False),  # ~1e-4
+    ("S16", 8, 5, 20, 3, 0, 0, False),  # ~4.5e-6
+])
+def test_rare_matches_exact(case):
+    # 普通蒙特卡洛 2 万次几乎一次都搜不到；重要性抽样的相对误差应在几个百分点以内
+    season, level, cost, gold, copies, taken, other, has_headliner = case
+    params = make_params(season, level, cost, taken, other, has_headliner)
+    exact = summarize_result(solve_exact(params, gold, copies))["success_rate"]
+    result = summarize_result(simulate_rare(params, gold, copies, 20000, rng=3))
+    assert result["success_rate"] == pytest.approx(exact, rel=0.05)
+    low, high = result["ci"]
+    assert (high - low) / 2 <= 0.05 * exact
+
+
+def test_rare_impossible_stays_zero():
+    params = make_params("S16", 7, 4)
+    result = summarize_result(simulate_rare(params, 12, 3, 2000, rng=3))
+    assert result["success_rate"] == 0
+    assert summarize_result(solve_exact(params, 12, 3))["success_rate"] == 0